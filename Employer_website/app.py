@@ -1,20 +1,29 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
 from flask import Flask, render_template, request, redirect, jsonify
-import psycopg2
 from psycopg2 import sql
+from psycopg2.extras import execute_values
+
+# The shared modules (db.py, ...) live one level up, next to chatbot.py
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # shared pooled Postgres access
+import schedule_store  # shared new_schedule / changed_schedule publishing
+import schema  # one-time creation of the fixed tables
+import employee_import  # CSV/JSON bulk onboarding
+import optimization  # weekly schedule optimizer (solver / greedy)
+import rag_index  # chatbot's cached document chunks
+import shift_intervals  # start/end times of each shift
+import week_schedule  # calendar weeks
 
 app = Flask(__name__)
 
-# --------------------------------------------------------
-# SHARED DB CONNECTION
-# --------------------------------------------------------
-def get_db_connection():
-    return psycopg2.connect(
-        dbname="postgres",
-        user="postgres",
-        password="sql123",
-        host="localhost",
-        port="5432"
-    )
+@app.before_request
+def init_schema():
+    # Creates limits, candidate_credentials, ... on the first request only
+    schema.ensure_schema()
 
 # --------------------------------------------------------
 # ADDED FROM tables.py
@@ -24,39 +33,38 @@ def create_dynamic_table(organization, roles):
     Dynamically creates (or recreates) a table named "<organization>_employees"
     with Employee_ID as a VARCHAR(50) PRIMARY KEY, plus columns for each role in 'roles'.
     """
-    conn = get_db_connection()
-    cur = conn.cursor()
-
-    table_name = f"{organization.lower()}_employees"
-
-    # 1) Drop table if it already exists
-    drop_query = sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(table_name))
-    cur.execute(drop_query)
-
-    # Employee_ID stored as string, consistent with your existing code.
-    default_columns = [
-        ("Employee_ID", "VARCHAR(50) PRIMARY KEY"),
-        ("Employee_name", "VARCHAR(100)"),
-        ("Designation", "VARCHAR(100)"),
-        ("Role", "VARCHAR(100)")
-    ]
-
-    # Create columns for each skill role
-    dynamic_columns = [(role.replace(' ', '_'), "INT") for role in roles]
-
-    # 2) Create table with default + dynamic columns
-    create_query = sql.SQL("CREATE TABLE {} ({})").format(
-        sql.Identifier(table_name),
-        sql.SQL(", ").join(
-            sql.SQL("{} {}").format(sql.Identifier(col), sql.SQL(dtype))
-            for col, dtype in default_columns + dynamic_columns
+    with db.cursor() as cur:
+        table_name = f"{organization.lower()}_employees"
+
+        # 1) Drop table if it already exists
+        drop_query = sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(table_name))
+        cur.execute(drop_query)
+
+        # Employee_ID stored as string, consistent with your existing code.
+        default_columns = [
+            ("Employee_ID", "VARCHAR(50) PRIMARY KEY"),
+            ("Employee_name", "VARCHAR(100)"),
+            ("Designation", "VARCHAR(100)"),
+            ("Role", "VARCHAR(100)")
+        ]
+
+        # Create columns for each skill role
+        dynamic_columns = [(role.replace(' ', '_'), "INT") for role in roles]
+
+        # 2) Create table with default + dynamic columns
+        create_query = sql.SQL("CREATE TABLE {} ({})").format(
+            sql.Identifier(table_name),
+            sql.SQL(", ").join(
+                sql.SQL("{} {}").format(sql.Identifier(col), sql.SQL(dtype))
+                for col, dtype in default_columns + dynamic_columns
+            )
         )
-    )
 
-    cur.execute(create_query)
-    conn.commit()
-    cur.close()
-    conn.close()
+        cur.execute(create_query)
+
+        # 3) Indexes for the paginated employee listing, and the ID sequence
+        schema.create_employee_indexes(cur, table_name)
+        schema.create_employee_id_sequence(cur, table_name)
 
 
 @app.route('/create_roles_table', methods=['POST'])
@@ -73,20 +81,18 @@ def create_roles_table():
         create_dynamic_table(organization, roles)
 
         # 2. Clean up related tables
-        conn = get_db_connection()
-        cur = conn.cursor()
-
-        # Clear all related tables
-        cur.execute("DELETE FROM candidate_credentials;")
-        cur.execute("DELETE FROM preferences;")
-        cur.execute("DELETE FROM new_schedule;")
-        cur.execute("DELETE FROM limits;")
-        cur.execute("DELETE FROM changed_schedule;")
-
-
-        conn.commit()
-        cur.close()
-        conn.close()
+        with db.cursor() as cur:
+            # Clear all related tables
+            cur.execute("DELETE FROM candidate_credentials;")
+            cur.execute("DELETE FROM preferences;")
+            cur.execute("DELETE FROM new_schedule;")
+            cur.execute("DELETE FROM limits;")
+            cur.execute("DELETE FROM changed_schedule;")
+            cur.execute("DELETE FROM shifts;")
+            # New role columns + empty schedule: chatbot processes rebuild their index
+            db.notify(cur)
+            # ...and every portal process reloads its cached role columns
+            schema.invalidate_employee_columns(cur)
 
         return jsonify({
             "message": f"Table '{organization.lower()}_employees' created successfully with columns: {', '.join(roles)}. Related tables cleared."
@@ -105,96 +111,87 @@ def dashboard():
 @app.route('/add_employee')
 def add_employee():
     """
-    Show a form for adding a new employee and display the employees from 'school_employees'
-    in ascending numeric order by Employee_ID (even though it's stored as VARCHAR).
+    Show a form for adding a new employee. The table of existing employees
+    (ascending numeric Employee_ID) is loaded page by page from /api/employees.
     """
-    conn = get_db_connection()
-    cur = conn.cursor()
-
-    # Fetch dynamic (role skill) columns from school_employees
-    cur.execute("""
-        SELECT column_name 
-        FROM information_schema.columns
-        WHERE table_name='school_employees' 
-          AND ordinal_position > 4
-        ORDER BY ordinal_position
-    """)
-    roles = [col[0] for col in cur.fetchall()]
+    # Dynamic (role skill) columns and all column names, from the schema cache
+    meta = schema.employee_columns()
+    roles = meta["roles"]
+    columns = meta["columns"]
 
-    # Fetch all employees, sorted numerically by casting Employee_ID to int
-    cur.execute('SELECT * FROM school_employees ORDER BY CAST("Employee_ID" AS int) ASC')
-    employees = cur.fetchall()
-
-    # Fetch all column names for display
-    cur.execute("""
-        SELECT column_name 
-        FROM information_schema.columns
-        WHERE table_name='school_employees'
-        ORDER BY ordinal_position
-    """)
-    columns = [col[0] for col in cur.fetchall()]
-
-    cur.close()
-    conn.close()
-
-    return render_template('add_employee.html', roles=roles, employees=employees, columns=columns)
+    return render_template('add_employee.html', roles=roles, columns=columns, page_size=PAGE_SIZE)
 
 @app.route('/submit_employee', methods=['POST'])
 def submit_employee():
     """
-    Inserts a new row into school_employees, generating the next integer Employee_ID
-    by taking MAX(CAST(Employee_ID AS int)) + 1, then storing it as a string.
-    This ensures strictly sequential IDs (1, 2, 3...) and avoids null constraints.
+    Inserts a new row into school_employees. Employee_ID comes from the
+    column default (the table's ID sequence, stored as a string), so
+    concurrent submissions never collide.
     """
     data = request.form
     employee_name = data['Employee_name']
     designation = data['Designation']
     role_selected = data['Role']
 
-    conn = get_db_connection()
-    cur = conn.cursor()
-
-    # 1) Fetch dynamic columns (skip the first 4: Employee_ID, Employee_name, Designation, Role)
-    cur.execute("""
-        SELECT column_name 
-        FROM information_schema.columns
-        WHERE table_name='school_employees'
-          AND ordinal_position > 4
-        ORDER BY ordinal_position
-    """)
-    columns = [col[0] for col in cur.fetchall()]
-
-    # 2) Generate the new Employee_ID by casting the existing ones to int, then +1
-    cur.execute('SELECT MAX(CAST("Employee_ID" AS int)) FROM school_employees')
-    last_id = cur.fetchone()[0]
-    if last_id is None:
-        last_id = 0
-    new_id_int = last_id + 1
-    new_id_str = str(new_id_int)  # store as string in DB
-
-    # 3) Prepare the columns & values for INSERT (including Employee_ID)
-    insert_columns = ['Employee_ID', 'Employee_name', 'Designation', 'Role'] + columns
-    insert_values = [new_id_str, employee_name, designation, role_selected]
-
-    # 4) Append skill ratings
-    for col in columns:
-        insert_values.append(int(data.get(col, 0)))
-
-    # 5) Insert row
-    query = sql.SQL('INSERT INTO school_employees ({}) VALUES ({})').format(
-        sql.SQL(', ').join(map(sql.Identifier, insert_columns)),
-        sql.SQL(', ').join(sql.Placeholder() * len(insert_values))
-    )
-    cur.execute(query, insert_values)
+    # 1) Dynamic columns (everything after Employee_ID, Employee_name, Designation, Role)
+    columns = schema.employee_columns()["roles"]
+
+    with db.cursor() as cur:
+        # 2) Prepare the columns & values for INSERT (Employee_ID is the default)
+        insert_columns = ['Employee_name', 'Designation', 'Role'] + columns
+        insert_values = [employee_name, designation, role_selected]
 
-    conn.commit()
-    cur.close()
-    conn.close()
+        # 3) Append skill ratings
+        for col in columns:
+            insert_values.append(int(data.get(col, 0)))
+
+        # 4) Insert row
+        query = sql.SQL('INSERT INTO school_employees ({}) VALUES ({})').format(
+            sql.SQL(', ').join(map(sql.Identifier, insert_columns)),
+            sql.SQL(', ').join(sql.Placeholder() * len(insert_values))
+        )
+        cur.execute(query, insert_values)
+        db.notify(cur)
 
     # Return to the page that shows the new employee in the table
     return redirect('/add_employee')
 
 
+@app.route('/import_employees', methods=['POST'])
+def import_employees():
+    """
+    Bulk onboarding: a CSV/JSON upload of employees with their skill ratings
+    (see employee_import.py for the format). Valid rows get consecutive IDs
+    and are loaded with one COPY; invalid rows are reported by line number.
+    With ?atomic=1 nothing is imported if any row is invalid.
+    """
+    roles = schema.employee_columns()["roles"]
+    atomic = request.args.get('atomic', '').lower() in ('1', 'true', 'yes')
+
+    try:
+        rows, errors = employee_import.validate_records(employee_import.read_upload(request), roles)
+    except employee_import.UploadError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    result = {
+        "imported": 0,
+        "error_count": len(errors),
+        "errors": errors[:employee_import.MAX_REPORTED_ERRORS],
+    }
+    if not rows or (atomic and errors):
+        result["success"] = False
+        return jsonify(result), 400
+
+    try:
+        with db.cursor() as cur:
+            first_id, last_id = employee_import.copy_employees(cur, rows, roles)
+            db.notify(cur)
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+    result.update(success=not errors, imported=len(rows), first_id=first_id, last_id=last_id)
+    return jsonify(result), 200
+
 # JSON endpoint to get existing data for a specific employee
 @app.route('/employee_data/<int:emp_id>', methods=['GET'])
 def get_employee_data(emp_id):
@@ -203,24 +200,13 @@ def get_employee_data(emp_id):
     we must convert the incoming integer to string before querying.
     So if you hit /employee_data/3, we query 'WHERE "Employee_ID" = "3"'
     """
-    conn = get_db_connection()
-    cur = conn.cursor()
+    # All column names, in table order, from the schema cache
+    columns = schema.employee_columns()["columns"]
 
-    emp_id_str = str(emp_id)
-    cur.execute('SELECT * FROM school_employees WHERE "Employee_ID" = %s', (emp_id_str,))
-    row = cur.fetchone()
-
-    # Get all column names
-    cur.execute("""
-        SELECT column_name 
-        FROM information_schema.columns
-        WHERE table_name='school_employees'
-        ORDER BY ordinal_position
-    """)
-    columns = [col[0] for col in cur.fetchall()]
-
-    cur.close()
-    conn.close()
+    with db.cursor() as cur:
+        emp_id_str = str(emp_id)
+        cur.execute('SELECT * FROM school_employees WHERE "Employee_ID" = %s', (emp_id_str,))
+        row = cur.fetchone()
 
     if not row:
         return jsonify({"error": "Employee not found"}), 404
@@ -247,29 +233,128 @@ def update_employee():
     if not updated_ratings:
         return jsonify({"error": "No ratings provided"}), 400
 
-    conn = get_db_connection()
-    cur = conn.cursor()
+    with db.cursor() as cur:
+        set_clauses = []
+        values = []
+        for role, rating in updated_ratings.items():
+            set_clauses.append(sql.SQL('{} = %s').format(sql.Identifier(role)))
+            values.append(rating)
+
+        # WHERE "Employee_ID" = %s but employee_id is a string in DB, so:
+        update_query = (
+            sql.SQL('UPDATE school_employees SET ') +
+            sql.SQL(', ').join(set_clauses) +
+            sql.SQL(' WHERE "Employee_ID" = %s')
+        )
+        values.append(employee_id)  # the string ID
 
-    set_clauses = []
-    values = []
-    for role, rating in updated_ratings.items():
-        set_clauses.append(sql.SQL('{} = %s').format(sql.Identifier(role)))
-        values.append(rating)
+        cur.execute(update_query, values)
+        db.notify(cur)
+
+    return jsonify({"message": "Employee skill ratings updated successfully"}), 200
 
-    # WHERE "Employee_ID" = %s but employee_id is a string in DB, so:
-    update_query = (
-        sql.SQL('UPDATE school_employees SET ') +
-        sql.SQL(', ').join(set_clauses) +
-        sql.SQL(' WHERE "Employee_ID" = %s')
+def validate_ratings(entry, roles):
+    """Return (employee_id, {role: rating}, [error messages]) for one bulk entry."""
+    errors = []
+    ratings = {}
+    if not isinstance(entry, dict):
+        return None, ratings, ["not an object"]
+    employee_id = str(entry.get('Employee_ID') or "").strip()
+    if not employee_id:
+        errors.append("Employee_ID is required")
+    given = entry.get('ratings')
+    if not isinstance(given, dict) or not given:
+        errors.append("No ratings provided")
+        given = {}
+    for role, rating in given.items():
+        if role not in roles:
+            errors.append(f"Unknown role '{role}'")
+            continue
+        try:
+            rating = int(rating)
+        except (TypeError, ValueError):
+            errors.append(f"{role} rating '{rating}' is not an integer")
+            continue
+        if rating < 0:
+            errors.append(f"{role} rating must be >= 0")
+            continue
+        ratings[role] = rating
+    return employee_id, ratings, errors
+
+def employee_id_order(employee_id):
+    """Sort key for the VARCHAR Employee_IDs in numeric order ("9" before "10")."""
+    return len(employee_id), employee_id
+
+@app.route('/update_employees_bulk', methods=['POST'])
+def update_employees_bulk():
+    """
+    Bulk variant of /update_employee for skill reviews: one batched UPDATE
+    for many employees, in one transaction. JSON input like:
+      { "employees": [ {"Employee_ID": "3", "ratings": {"Server": 8}}, ... ] }
+    Each employee may rate a different subset of roles; the others keep
+    their value. Invalid entries are reported and skipped (with ?atomic=1
+    nothing is updated).
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not data.get('employees'):
+        return jsonify({"success": False, "error": "No employees provided"}), 400
+    if not isinstance(data['employees'], list):
+        return jsonify({"success": False, "error": "employees must be a list"}), 400
+    roles = schema.employee_columns()["roles"]
+    atomic = request.args.get('atomic', '').lower() in ('1', 'true', 'yes')
+
+    updates = {}
+    errors = []
+    for position, entry in enumerate(data['employees']):
+        employee_id, ratings, problems = validate_ratings(entry, roles)
+        if problems:
+            errors.append({"index": position, "Employee_ID": employee_id, "errors": problems})
+        else:
+            # Repeated IDs are merged, later ratings win
+            updates.setdefault(employee_id, {}).update(ratings)
+
+    result = {"updated": [], "not_found": [], "errors": errors}
+    if not updates or (atomic and errors):
+        result["success"] = False
+        return jsonify(result), 400
+
+    # One VALUES row per employee over the union of rated roles; a role the
+    # employee wasn't rated on is NULL and keeps its current value
+    rated = [role for role in roles if any(role in r for r in updates.values())]
+    assignments = sql.SQL(', ').join(
+        sql.SQL('{col} = COALESCE(v.{col}, e.{col})').format(col=sql.Identifier(role))
+        for role in rated
+    )
+    query = sql.SQL("""
+        UPDATE school_employees AS e
+           SET {assignments}
+          FROM (VALUES %s) AS v({columns})
+         WHERE e."Employee_ID" = v."Employee_ID"
+        RETURNING e."Employee_ID"
+    """).format(
+        assignments=assignments,
+        columns=sql.SQL(', ').join(map(sql.Identifier, ["Employee_ID"] + rated)),
     )
-    values.append(employee_id)  # the string ID
+    template = "(%s::varchar, " + ", ".join(["%s::int"] * len(rated)) + ")"
+    rows = [(eid, *(ratings.get(role) for role in rated)) for eid, ratings in updates.items()]
 
-    cur.execute(update_query, values)
-    conn.commit()
-    cur.close()
-    conn.close()
+    try:
+        with db.cursor() as cur:
+            updated = execute_values(cur, query.as_string(cur), rows,
+                                     template=template, page_size=len(rows), fetch=True)
+            # One notification for the whole batch, so the chatbot's
+            # replacement index reloads once
+            db.notify(cur)
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
 
-    return jsonify({"message": "Employee skill ratings updated successfully"}), 200
+    updated_ids = {row[0] for row in updated}
+    result.update(
+        success=not errors,
+        updated=sorted(updated_ids, key=employee_id_order),
+        not_found=sorted(set(updates) - updated_ids, key=employee_id_order),
+    )
+    return jsonify(result), 200
 
 # --------------------------------------------------------
 # CANDIDATE CREDENTIALS
@@ -277,39 +362,12 @@ def update_employee():
 @app.route('/select_candidates')
 def select_candidates():
     """
-    Show a page with all employees from school_employees,
+    Show a page with the employees from school_employees,
     plus fields to update Email & Phone in candidate_credentials,
     and display the updated candidate_credentials below.
+    Both tables are loaded page by page from /api/employees and /api/candidates.
     """
-    conn = get_db_connection()
-    cur = conn.cursor()
-
-    # Make sure candidate_credentials exists
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS candidate_credentials (
-            employee_id INT PRIMARY KEY,
-            employee_name VARCHAR(100),
-            email VARCHAR(100),
-            phone VARCHAR(20)
-        );
-    """)
-
-    # Since Employee_ID is stored as string, but we want them in numeric order:
-    cur.execute('SELECT "Employee_ID", "Employee_name" FROM school_employees ORDER BY CAST("Employee_ID" AS int) ASC')
-    employees = cur.fetchall()
-
-    # Grab existing candidate creds
-    cur.execute("SELECT employee_id, employee_name, email, phone FROM candidate_credentials ORDER BY employee_id ASC")
-    cred_rows = cur.fetchall()
-
-    cur.close()
-    conn.close()
-
-    return render_template(
-        'select_candidates.html',
-        employees=employees,
-        cred_rows=cred_rows
-    )
+    return render_template('select_candidates.html', page_size=PAGE_SIZE)
 
 @app.route('/update_candidate', methods=['POST'])
 def update_candidate():
@@ -325,36 +383,109 @@ def update_candidate():
     if not employee_id or not employee_name:
         return "Missing employee info", 400
 
-    conn = get_db_connection()
-    cur = conn.cursor()
-
-    # Make sure candidate_credentials exists
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS candidate_credentials (
-            employee_id INT PRIMARY KEY,
-            employee_name VARCHAR(100),
-            email VARCHAR(100),
-            phone VARCHAR(20)
-        );
-    """)
-
-    upsert_query = """
-    INSERT INTO candidate_credentials (employee_id, employee_name, email, phone)
-    VALUES (%s, %s, %s, %s)
-    ON CONFLICT (employee_id)
-    DO UPDATE SET
-      employee_name = EXCLUDED.employee_name,
-      email = EXCLUDED.email,
-      phone = EXCLUDED.phone
-    """
-    cur.execute(upsert_query, (employee_id, employee_name, email, phone))
-
-    conn.commit()
-    cur.close()
-    conn.close()
+    with db.cursor() as cur:
+        upsert_query = """
+        INSERT INTO candidate_credentials (employee_id, employee_name, email, phone)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT (employee_id)
+        DO UPDATE SET
+          employee_name = EXCLUDED.employee_name,
+          email = EXCLUDED.email,
+          phone = EXCLUDED.phone
+        """
+        cur.execute(upsert_query, (employee_id, employee_name, email, phone))
 
     return redirect('/select_candidates')
 
+# --------------------------------------------------------
+# PAGINATED LISTINGS (JSON)
+# --------------------------------------------------------
+# Keyset pagination: each page returns "next_after" (the last ID on it) and
+# the client asks for ?after=<that ID>. Every page is an index range scan,
+# however far in, and rows are read through a server-side cursor.
+PAGE_SIZE = int(os.environ.get("LIST_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = 500
+
+def page_params():
+    """(after, limit) from the query string; raises ValueError on bad input."""
+    after = request.args.get('after', type=int)
+    limit = request.args.get('limit', PAGE_SIZE, type=int)
+    if limit is None or limit < 1:
+        raise ValueError("limit must be a positive integer")
+    return after, min(limit, MAX_PAGE_SIZE)
+
+def fetch_page(query, params, limit):
+    """Run a keyset query (LIMIT limit + 1) and return (rows, has_more)."""
+    with db.server_cursor(itersize=limit + 1) as cur:
+        cur.execute(query, params)
+        rows = cur.fetchmany(limit + 1)
+    return rows[:limit], len(rows) > limit
+
+@app.route('/api/employees')
+def list_employees():
+    """
+    One page of school_employees in numeric Employee_ID order.
+      GET /api/employees?after=120&limit=50&role=Teacher&designation=Senior
+    Returns {"columns": [...], "employees": [[...], ...], "next_after": id or null}
+    """
+    try:
+        after, limit = page_params()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    id_num = sql.SQL('CAST("Employee_ID" AS INT)')
+    conditions = []
+    params = []
+    if after is not None:
+        conditions.append(id_num + sql.SQL(" > %s"))
+        params.append(after)
+    for arg, column in (('role', 'Role'), ('designation', 'Designation')):
+        value = request.args.get(arg)
+        if value:
+            conditions.append(sql.SQL("{} = %s").format(sql.Identifier(column)))
+            params.append(value)
+
+    query = sql.SQL("SELECT * FROM school_employees {} ORDER BY {} LIMIT {}").format(
+        sql.SQL("WHERE ") + sql.SQL(" AND ").join(conditions) if conditions else sql.SQL(""),
+        id_num,
+        sql.Literal(limit + 1),
+    )
+    rows, has_more = fetch_page(query, params, limit)
+
+    return jsonify({
+        "columns": schema.employee_columns()["columns"],
+        "employees": [list(row) for row in rows],
+        "next_after": int(rows[-1][0]) if has_more else None,
+    }), 200
+
+@app.route('/api/candidates')
+def list_candidates():
+    """
+    One page of candidate_credentials in employee_id order.
+      GET /api/candidates?after=120&limit=50
+    Returns {"candidates": [{employee_id, employee_name, email, phone}, ...], "next_after": id or null}
+    """
+    try:
+        after, limit = page_params()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    rows, has_more = fetch_page("""
+        SELECT employee_id, employee_name, email, phone
+          FROM candidate_credentials
+         WHERE employee_id > %s
+         ORDER BY employee_id
+         LIMIT %s
+    """, (after if after is not None else -2147483648, limit + 1), limit)
+
+    return jsonify({
+        "candidates": [
+            {"employee_id": r[0], "employee_name": r[1], "email": r[2], "phone": r[3]}
+            for r in rows
+        ],
+        "next_after": rows[-1][0] if has_more else None,
+    }), 200
+
 # --------------------------------------------------------
 # FILE UPLOAD
 # --------------------------------------------------------
@@ -366,8 +497,14 @@ def upload_pdf():
     if file.filename == '':
         return "No selected file", 400
 
-    save_path = "C:/Users/sivad/Documents/Chatbot/RAG/Document.pdf"
-    file.save(save_path)
+    # The file the chatbot answers from (rag_index.DOC_PATH, env RAG_DOC_PATH)
+    file.save(rag_index.DOC_PATH)
+
+    # Drop the saved chunks, then tell the chatbot process: it reloads the
+    # document and clears its cached answers on its next question
+    rag_index.invalidate_document(rag_index.DOC_PATH)
+    with db.cursor() as cur:
+        rag_index.announce_document(cur)
 
     return redirect('/')  # or return a message if preferred
 
@@ -377,118 +514,300 @@ def upload_pdf():
 @app.route('/set_limits')
 def set_limits():
     """
-    1) Create the limits table ONLY if it doesn't exist.
-    2) Insert any missing employees from school_employees (no dropping).
-    3) Show the updated table with preserved data.
-    """
-    conn = get_db_connection()
-    cur = conn.cursor()
-
-    # 1) Create if not exists, so we keep existing data
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS limits (
-            employee_id INTEGER PRIMARY KEY,
-            employee_name VARCHAR(100) UNIQUE NOT NULL,
-            designation VARCHAR(100),
-            min_hours INT DEFAULT 0,
-            max_hours INT DEFAULT 0
-        );
-    """)
-
-    # 2) Insert missing employees (without overwriting existing records)
-    cur.execute('SELECT "Employee_ID", "Employee_name", "Designation" FROM school_employees')
-    employees = cur.fetchall()
-
-    for emp_id, emp_name, designation in employees:
+    1) Insert any missing employees from school_employees (no dropping),
+       in one set-based statement. The limits table itself is created
+       once by schema.ensure_schema().
+    2) Show the updated table with preserved data.
+    """
+    with db.cursor() as cur:
+        # 1) Insert missing employees (without overwriting existing records).
+        #    No conflict target: an employee already present by ID or by
+        #    name is skipped instead of failing the whole statement.
         cur.execute("""
             INSERT INTO limits (employee_id, employee_name, designation)
-            VALUES (%s, %s, %s)
-            ON CONFLICT (employee_name) DO NOTHING
-        """, (emp_id, emp_name, designation))
-
-    conn.commit()
-
-    # 3) Fetch all data from 'limits', including any custom min/max hours
-    cur.execute("""
-        SELECT employee_name, designation, min_hours, max_hours, employee_id
-        FROM limits
-        ORDER BY employee_id
-    """)
-    limit_rows = cur.fetchall()
+            SELECT CAST("Employee_ID" AS INT), "Employee_name", "Designation"
+              FROM school_employees
+            ON CONFLICT DO NOTHING
+        """)
 
-    cur.close()
-    conn.close()
+        # 2) Fetch all data from 'limits', including any custom min/max hours
+        cur.execute("""
+            SELECT employee_name, designation, min_hours, max_hours, employee_id
+            FROM limits
+            ORDER BY employee_id
+        """)
+        limit_rows = cur.fetchall()
 
     return render_template('limits.html', limit_rows=limit_rows)
 
 
+def validate_limits(entry):
+    """
+    Return ((employee_id, min_hours, max_hours), None) for one limits entry,
+    or (None, error message). Shared by /update_limits and /update_limits_bulk.
+    """
+    if not isinstance(entry, dict):
+        return None, "expected an object with employee_id, min_hours and max_hours"
+    emp_id = entry.get('employee_id')
+    if emp_id is None or str(emp_id).strip() == "":
+        return None, "Missing employee ID"
+    try:
+        emp_id = int(emp_id)
+        min_val = int(entry.get('min_hours'))
+        max_val = int(entry.get('max_hours'))
+    except (TypeError, ValueError):
+        return None, "Min/Max/ID must be integers"
+    if min_val < 0:
+        return None, "min_hours must be >= 0"
+    if min_val > max_val:
+        return None, "min_hours can't exceed max_hours"
+    return (emp_id, min_val, max_val), None
+
 @app.route('/update_limits', methods=['POST'])
 def update_limits():
     data = request.get_json()
     if not data:
         return jsonify({"success": False, "error": "No data provided"}), 400
 
-    emp_name = data.get('employee_name')
-    min_h = data.get('min_hours')
-    max_h = data.get('max_hours')
-    emp_id = data.get('employee_id')
+    values, error = validate_limits(data)
+    if error:
+        return jsonify({"success": False, "error": error}), 400
+    emp_id, min_val, max_val = values
 
-    if emp_id is None or str(emp_id).strip() == "":
-        return jsonify({"success": False, "error": "Missing employee ID"}), 400
+    try:
+        with db.cursor() as cur:
+            cur.execute("""
+                UPDATE limits
+                   SET min_hours = %s,
+                       max_hours = %s
+                 WHERE employee_id = %s
+            """, (min_val, max_val, emp_id))
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+    # Return the new values so the frontend can display them instantly
+    return jsonify({"success": True, "new_min": min_val, "new_max": max_val}), 200
+
+@app.route('/update_limits_bulk', methods=['POST'])
+def update_limits_bulk():
+    """
+    Bulk variant of /update_limits: one batched UPDATE for many employees.
+    JSON input like:
+      { "limits": [ {"employee_id": 3, "min_hours": 20, "max_hours": 40}, ... ] }
+    Returns the IDs that were updated and any that don't exist in limits.
+    """
+    data = request.get_json()
+    if not isinstance(data, dict) or not data.get('limits'):
+        return jsonify({"success": False, "error": "No limits provided"}), 400
+    if not isinstance(data['limits'], list):
+        return jsonify({"success": False, "error": "limits must be a list"}), 400
+
+    values = {}
+    for position, item in enumerate(data['limits']):
+        entry, error = validate_limits(item)
+        if error:
+            return jsonify({"success": False, "error": f"Entry {position}: {error}"}), 400
+        values[entry[0]] = entry
+
+    try:
+        with db.cursor() as cur:
+            updated = execute_values(cur, """
+                UPDATE limits AS l
+                   SET min_hours = v.min_hours,
+                       max_hours = v.max_hours
+                  FROM (VALUES %s) AS v(employee_id, min_hours, max_hours)
+                 WHERE l.employee_id = v.employee_id
+                RETURNING l.employee_id
+            """, list(values.values()), page_size=len(values), fetch=True)
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+    updated_ids = sorted(row[0] for row in updated)
+    missing = sorted(set(values) - set(updated_ids))
+    return jsonify({"success": True, "updated": updated_ids, "not_found": missing}), 200
+
+@app.route('/update_coverage', methods=['POST'])
+def update_coverage():
+    """
+    Sets the minimum number of employees per day and role that the schedule
+    optimizer must staff. JSON input like:
+      { "requirements": [ {"day": "mon", "role": "Teacher", "required": 3}, ... ] }
+    """
+    data = request.get_json()
+    if not data or not data.get('requirements'):
+        return jsonify({"success": False, "error": "No requirements provided"}), 400
+
+    required_by = {}  # (day, role) -> required; one upsert can't touch a row twice
+    for item in data['requirements']:
+        if not isinstance(item, dict):
+            return jsonify({"success": False, "error": f"Invalid requirement: {item}"}), 400
+        day = str(item.get('day', '')).lower()[:3]
+        if day not in ("mon", "tue", "wed", "thu", "fri", "sat", "sun"):
+            return jsonify({"success": False, "error": f"Invalid day: {item.get('day')}"}), 400
+        role = item.get('role')
+        if not isinstance(role, str) or not role.strip():
+            return jsonify({"success": False, "error": f"Invalid role: {role}"}), 400
+        try:
+            required = int(item.get('required'))
+        except (TypeError, ValueError):
+            return jsonify({"success": False, "error": "required must be an integer"}), 400
+        required_by[(day, role.strip())] = required
+
+    try:
+        with db.cursor() as cur:
+            execute_values(cur, """
+                INSERT INTO coverage_requirements (day, role, required)
+                VALUES %s
+                ON CONFLICT (day, role) DO UPDATE SET required = EXCLUDED.required
+            """, [(day, role, required) for (day, role), required in required_by.items()],
+                page_size=len(required_by))
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+    return jsonify({"success": True, "updated": len(required_by)}), 200
+
+@app.route('/optimize_schedule', methods=['POST'])
+def run_optimizer():
+    """
+    Re-runs the schedule optimizer. JSON input (all optional) like:
+      { "incremental": true, "method": "solver", "weeks": 4 }
+    If the coverage can't be met nothing is published and the conflicts are
+    returned in "reasons"; employees whose limits fit no whole number of
+    days are scheduled anyway and listed in "adjusted".
+    """
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({"success": False, "error": "Expected a JSON object"}), 400
+    method = data.get('method')
+    if method not in (None, "solver", "greedy", "greedy_scalar"):
+        return jsonify({"success": False, "error": f"Unknown method: {method}"}), 400
+    weeks = data.get('weeks')
+    if weeks is not None and (not isinstance(weeks, int) or weeks < 1):
+        return jsonify({"success": False, "error": "weeks must be a positive integer"}), 400
 
     try:
-        emp_id = int(emp_id)  # ensure integer
-        min_val = int(min_h)
-        max_val = int(max_h)
+        result = optimization.optimize_schedule(
+            method=method, incremental=bool(data.get('incremental')), weeks=weeks)
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+    if result["status"] == "infeasible":
+        return jsonify({
+            "success": False,
+            "error": "No schedule satisfies the limits and coverage",
+            "reasons": result["reasons"],
+        }), 400
+    return jsonify({"success": True, **result}), 200
+
+# --------------------------------------------------------
+# SHIFTS (start/end times; split and partial shifts)
+# --------------------------------------------------------
+def parse_time(value):
+    """ISO date-time ("2026-10-19T07:00") from a request, or None."""
+    try:
+        return datetime.fromisoformat(str(value))
     except ValueError:
-        return jsonify({"success": False, "error": "Min/Max/ID must be integers"}), 400
+        return None
 
-    conn = get_db_connection()
-    cur = conn.cursor()
+@app.route('/shifts')
+def list_shifts():
+    """
+    Shifts and real hours per employee for one week:
+      GET /shifts?week=2026-10-19   (any date of the week; default this week)
+    """
+    day = parse_time(request.args.get('week')) if request.args.get('week') else datetime.now()
+    if day is None:
+        return jsonify({"success": False, "error": "week must be a date (YYYY-MM-DD)"}), 400
+    week = week_schedule.week_of(day.date())
+    try:
+        with db.cursor() as cur:
+            shifts = shift_intervals.on_shift(cur, week, week + timedelta(days=7))
+            hours = shift_intervals.week_hours(cur, week)
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+    return jsonify({
+        "success": True,
+        "week": week.isoformat(),
+        "shifts": [{"shift_id": shift_id, "employee_id": eid,
+                    "starts_at": start.isoformat(), "ends_at": end.isoformat()}
+                   for shift_id, eid, start, end in shifts],
+        "hours": hours,
+    }), 200
+
+@app.route('/add_shift', methods=['POST'])
+def add_shift():
+    """
+    Books one shift, e.g. half of a split shift. JSON input like:
+      { "employee_id": 7, "starts_at": "2026-10-19T07:00", "ends_at": "2026-10-19T11:00" }
+    Rejected (400) if it overlaps another shift of the employee, leaves less
+    than MIN_REST_HOURS of rest or goes over their max_hours.
+    """
+    data = request.get_json() or {}
+    starts_at, ends_at = parse_time(data.get('starts_at')), parse_time(data.get('ends_at'))
+    if starts_at is None or ends_at is None:
+        return jsonify({"success": False, "error": "starts_at and ends_at must be ISO date-times"}), 400
+    try:
+        employee_id = int(data.get('employee_id'))
+    except (TypeError, ValueError):
+        return jsonify({"success": False, "error": "employee_id must be an integer"}), 400
 
     try:
-        cur.execute("""
-            UPDATE limits
-               SET min_hours = %s,
-                   max_hours = %s
-             WHERE employee_id = %s
-        """, (min_val, max_val, emp_id))
-        conn.commit()
+        with db.cursor() as cur:
+            shift_id = shift_intervals.add_shift(cur, employee_id, starts_at, ends_at)
+    except shift_intervals.ShiftConflict as e:
+        return jsonify({"success": False, "error": str(e)}), 400
     except Exception as e:
-        conn.rollback()
-        cur.close()
-        conn.close()
         return jsonify({"success": False, "error": str(e)}), 500
+    return jsonify({"success": True, "shift_id": shift_id}), 200
 
-    cur.close()
-    conn.close()
+@app.route('/remove_shift', methods=['POST'])
+def remove_shift():
+    """Deletes one shift. JSON input like: { "shift_id": 42 }"""
+    data = request.get_json() or {}
+    try:
+        with db.cursor() as cur:
+            removed = shift_intervals.remove_shift(cur, int(data.get('shift_id')))
+    except (TypeError, ValueError):
+        return jsonify({"success": False, "error": "shift_id must be an integer"}), 400
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+    if not removed:
+        return jsonify({"success": False, "error": "Shift not found"}), 404
+    return jsonify({"success": True}), 200
 
-    # Return the new values so the frontend can display them instantly
-    return jsonify({"success": True, "new_min": min_val, "new_max": max_val}), 200
+@app.route('/coverage_at')
+def coverage_at():
+    """
+    Who is on shift in a time window, and the fewest people on shift at any
+    moment of it (0 = a gap):
+      GET /coverage_at?from=2026-10-19T07:00&to=2026-10-19T19:00&role=Teacher
+    """
+    start, end = parse_time(request.args.get('from')), parse_time(request.args.get('to'))
+    if start is None or end is None or end <= start:
+        return jsonify({"success": False, "error": "from and to must be ISO date-times, from < to"}), 400
+    role = request.args.get('role')
+    try:
+        with db.cursor() as cur:
+            shifts = shift_intervals.on_shift(cur, start, end, role)
+            lowest = shift_intervals.headcount(cur, start, end, role)
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+    return jsonify({
+        "success": True,
+        "employees": sorted({eid for _, eid, _, _ in shifts}),
+        "min_headcount": lowest,
+    }), 200
 
 def sync_new_to_changed_schedule():
     """
     Copies all rows from new_schedule to changed_schedule (overwrites existing data).
+    Same publishing path as the optimizer (schedule_store).
     """
-    conn = get_db_connection()
-    cur = conn.cursor()
     try:
-        # Clear existing records in changed_schedule
-        cur.execute("DELETE FROM changed_schedule;")
-
-        # Copy fresh data from new_schedule
-        cur.execute("""
-            INSERT INTO changed_schedule
-            SELECT * FROM new_schedule;
-        """)
-
-        conn.commit()
+        with db.cursor() as cur:
+            schedule_store.sync_new_to_changed(cur)
     except Exception as e:
         print("Error syncing new_schedule to changed_schedule:", e)
-        conn.rollback()
-    finally:
-        cur.close()
-        conn.close()
 
 # --------------------------------------------------------
 # PAY (PLACEHOLDER)
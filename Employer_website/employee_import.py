@@ -0,0 +1,165 @@
+"""
+Bulk employee import for /import_employees.
+
+Accepts a CSV upload (header row: Employee_name, Designation, Role, then any
+of the role columns) or JSON (a list of objects with the same keys, or
+{"employees": [...]}; ratings may also be nested under "ratings").
+
+    records = read_upload(request)               # streamed, one record at a time
+    rows, errors = validate_records(records, roles)
+    with db.cursor() as cur:
+        first_id, last_id = copy_employees(cur, rows, roles)
+
+Every row is checked against the current role columns, and a bad row is
+reported with its line number instead of failing the whole upload. IDs are
+reserved for the whole batch at once and the rows go in with one COPY.
+"""
+import csv
+import io
+import json
+
+from psycopg2 import sql
+
+import schema
+
+BASE_FIELDS = ["Employee_name", "Designation", "Role"]
+MAX_TEXT_LENGTH = 100  # VARCHAR(100) in create_dynamic_table
+MAX_REPORTED_ERRORS = 200
+
+
+class UploadError(Exception):
+    """The upload as a whole can't be read (bad format, unknown columns...)."""
+
+
+def read_upload(request):
+    """
+    Iterator of (line_number, record) pairs from the request: a multipart
+    file field "file" (.csv or .json) or a JSON body.
+    """
+    upload = request.files.get('file')
+    if upload is not None:
+        name = (upload.filename or "").lower()
+        if name.endswith(".json") or upload.mimetype == "application/json":
+            try:
+                return _json_records(json.load(upload.stream))
+            except ValueError as e:
+                raise UploadError(f"Invalid JSON file: {e}")
+        return _csv_records(upload.stream)
+    if request.is_json:
+        return _json_records(request.get_json(silent=True))
+    raise UploadError("Upload a CSV/JSON file as 'file' or send a JSON body.")
+
+
+def _csv_records(stream):
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+    try:
+        if reader.fieldnames is None:
+            raise UploadError("The CSV file is empty.")
+        # Line 0 carries the header so it is checked before any row
+        yield 0, {"fields": [name.strip() for name in reader.fieldnames]}
+        for record in reader:
+            # Values beyond the header end up under the key None
+            yield reader.line_num, {(key.strip() if key else key): value for key, value in record.items()}
+    except UnicodeDecodeError:
+        raise UploadError(f"The CSV file is not UTF-8 text (after line {reader.line_num}).")
+
+
+def _json_records(payload):
+    if isinstance(payload, dict):
+        payload = payload.get("employees")
+    if not isinstance(payload, list):
+        raise UploadError('JSON must be a list of employees or {"employees": [...]}.')
+    for number, record in enumerate(payload, start=1):
+        if isinstance(record, dict) and isinstance(record.get("ratings"), dict):
+            record = {**record, **record["ratings"]}
+            del record["ratings"]
+        yield number, record
+
+
+def check_fields(fields, roles):
+    """Reject a CSV header with columns that are neither base fields nor roles."""
+    unknown = [f for f in fields if f not in BASE_FIELDS and f not in roles]
+    if unknown:
+        raise UploadError(f"Unknown column(s): {', '.join(unknown)}. "
+                          f"Expected {', '.join(BASE_FIELDS)} and role columns: {', '.join(roles)}.")
+    missing = [f for f in BASE_FIELDS if f not in fields]
+    if missing:
+        raise UploadError(f"Missing column(s): {', '.join(missing)}.")
+
+
+def validate_record(record, roles):
+    """Return (row values without Employee_ID, [error messages])."""
+    errors = []
+    values = []
+    if None in record:
+        errors.append("more values than header columns")
+    unknown = [k for k in record if k is not None and k not in BASE_FIELDS and k not in roles]
+    if unknown:
+        errors.append(f"unknown field(s): {', '.join(map(str, unknown))}")
+    for field in BASE_FIELDS:
+        value = str(record.get(field) or "").strip()
+        if not value:
+            errors.append(f"{field} is required")
+        elif len(value) > MAX_TEXT_LENGTH:
+            errors.append(f"{field} is longer than {MAX_TEXT_LENGTH} characters")
+        values.append(value)
+
+    if values[2] and values[2] not in roles:
+        errors.append(f"Role '{values[2]}' is not one of: {', '.join(roles)}")
+
+    for role in roles:
+        raw = record.get(role)
+        if raw is None or str(raw).strip() == "":
+            values.append(0)  # same default as the single-employee form
+            continue
+        try:
+            rating = int(str(raw).strip())
+        except ValueError:
+            errors.append(f"{role} rating '{raw}' is not an integer")
+            continue
+        if rating < 0:
+            errors.append(f"{role} rating must be >= 0")
+        values.append(rating)
+    return values, errors
+
+
+def validate_records(records, roles):
+    """
+    Validate every record. Returns (valid rows, errors) where each error is
+    {"line": n, "errors": [...]}. Raises UploadError for a bad CSV header.
+    """
+    rows, errors = [], []
+    for line, record in records:
+        if line == 0:
+            check_fields(record["fields"], roles)
+            continue
+        if not isinstance(record, dict):
+            errors.append({"line": line, "errors": ["not an object"]})
+            continue
+        values, problems = validate_record(record, roles)
+        if problems:
+            errors.append({"line": line, "errors": problems})
+        else:
+            rows.append(values)
+    return rows, errors
+
+
+def copy_employees(cur, rows, roles):
+    """
+    Reserve Employee_IDs for `rows` from the table's ID sequence and load
+    them with one COPY. Returns (first_id, last_id).
+    """
+    ids = schema.allocate_employee_ids(cur, len(rows))
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for employee_id, values in zip(ids, rows):
+        writer.writerow([str(employee_id)] + values)
+    buffer.seek(0)
+
+    columns = ["Employee_ID"] + BASE_FIELDS + list(roles)
+    copy = sql.SQL("COPY school_employees ({}) FROM STDIN WITH (FORMAT csv)").format(
+        sql.SQL(", ").join(map(sql.Identifier, columns))
+    )
+    cur.copy_expert(copy.as_string(cur), buffer)
+    return ids[0], ids[-1]
@@ -1,56 +1,31 @@
-import psycopg2
+import os
+import sys
 
-def get_db_connection():
-    """Helper to connect to Postgres."""
-    return psycopg2.connect(
-        dbname="postgres",
-        user="postgres",
-        password="sql123",
-        host="localhost",
-        port="5432"
-    )
+import numpy as np
 
-def optimize_schedule():
-    """
-    1. Read from limits table: employee_id, employee_name, min_hours, max_hours
-    2. Read from preferences table: mon..sun (0/1)
-    3. For each employee, keep or remove days to respect min/max hours.
-       One day = 10 hours.
-    4. Write final 0/1 schedule to new_schedule.
-    """
+# The shared modules (db.py, ...) live one level up, next to chatbot.py
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-    DAYS = ["mon","tue","wed","thu","fri","sat","sun"]
-    HOURS_PER_DAY = 10
+import db  # shared pooled Postgres access
+import schedule_store  # bulk new_schedule / changed_schedule publishing
+import schema  # one-time creation of the fixed tables
+import shift_intervals  # start/end times behind each scheduled day
+import solver  # constraint-based schedule solver
+import week_schedule  # 7-bit week_mask per employee
 
-    conn = get_db_connection()
-    cur = conn.cursor()
+DAYS = ["mon","tue","wed","thu","fri","sat","sun"]
+# A scheduled day is one default shift (DEFAULT_SHIFT_HOURS, default 10)
+HOURS_PER_DAY = shift_intervals.SHIFT_HOURS
 
-    # 1) Read from limits
-    cur.execute("""
-        SELECT employee_id, employee_name, designation, min_hours, max_hours
-          FROM limits
-         ORDER BY employee_id
-    """)
-    limit_rows = cur.fetchall()
-    # store in a dict:  emp_id -> { "name":..., "min":..., "max":... }
-    emp_limits = {}
-    for row in limit_rows:
-        eid, ename, designation, min_h, max_h = row
-        emp_limits[eid] = {
-            "name": ename,
-            "min": min_h,
-            "max": max_h
-        }
-
-    # 2) Read from preferences table
-    #    Each row has: employee_id, employee_name, mon..sun (ints 0/1)
-    cur.execute("""
-        SELECT employee_id, employee_name, mon, tue, wed, thu, fri, sat, sun
-          FROM preferences
-         ORDER BY employee_id
-    """)
-    pref_rows = cur.fetchall()
+# "solver" (constraint solver, default), "greedy" (per-employee trimming on
+# NumPy matrices) or "greedy_scalar" (the same trimming, one employee at a time)
+SCHEDULE_METHOD = os.environ.get("SCHEDULE_METHOD", "solver")
 
+def greedy_schedule(pref_rows, emp_limits):
+    """
+    Original per-employee pass: keep preferred days, drop the last ones
+    while over max_hours. Ignores min_hours and coverage.
+    """
     # We'll store final optimized schedule in a dictionary,
     # keyed by employee_id => {"name":..., "days": {"mon":0/1, ...}}
     final_schedule = {}
@@ -72,7 +47,7 @@ def optimize_schedule():
 
         # convert the 0/1 availability into a *tentative* schedule
         #  if day_map[day]==1 => we plan to schedule them that day
-        # each scheduled day is 10 hours
+        # each scheduled day is one default shift of HOURS_PER_DAY hours
         scheduled_days = [d for d in DAYS if day_map[d] == 1]
         total_pref_hours = len(scheduled_days) * HOURS_PER_DAY
 
@@ -107,70 +82,270 @@ def optimize_schedule():
             "days": final_days
         }
 
-    # 3) Write final schedule to new_schedule table
-    #    First create new_schedule if not exists
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS new_schedule (
-            employee_id INT PRIMARY KEY,
-            employee_name VARCHAR(100),
-            mon VARCHAR(50),
-            tue VARCHAR(50),
-            wed VARCHAR(50),
-            thu VARCHAR(50),
-            fri VARCHAR(50),
-            sat VARCHAR(50),
-            sun VARCHAR(50)
-        );
-    """)
-
-    # optional: clear out the table each time, or do an upsert
-    cur.execute("TRUNCATE TABLE new_schedule;")
-
-    for eid, data in final_schedule.items():
-        ename = data["name"]
-        day_vals = data["days"]  # {mon:0/1, tue:0/1, ...}
-        # insert as strings "0" or "1"
-        cur.execute("""
-            INSERT INTO new_schedule (employee_id, employee_name, mon, tue, wed, thu, fri, sat, sun)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, (
-            eid,
-            ename,
-            str(day_vals["mon"]),
-            str(day_vals["tue"]),
-            str(day_vals["wed"]),
-            str(day_vals["thu"]),
-            str(day_vals["fri"]),
-            str(day_vals["sat"]),
-            str(day_vals["sun"])
-        ))
-
-                # --- Sync to changed_schedule ---
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS changed_schedule (
-                employee_id INT PRIMARY KEY,
-                employee_name VARCHAR(100),
-                mon VARCHAR(50),
-                tue VARCHAR(50),
-                wed VARCHAR(50),
-                thu VARCHAR(50),
-                fri VARCHAR(50),
-                sat VARCHAR(50),
-                sun VARCHAR(50)
-            );
-        """)
-        cur.execute("TRUNCATE TABLE changed_schedule;")
-        cur.execute("""
-            INSERT INTO changed_schedule (employee_id, employee_name, mon, tue, wed, thu, fri, sat, sun)
-            SELECT employee_id, employee_name, mon, tue, wed, thu, fri, sat, sun
-            FROM new_schedule
-        """)
-
-    conn.commit()
-    cur.close()
-    conn.close()
-
-    print("Optimization complete. 'new_schedule' table updated.")
+    return final_schedule
+
+def schedule_rows(final_schedule):
+    """
+    new_schedule rows (employee_id, employee_name, week_mask)
+    for a {employee_id: {"name":..., "days": {...}}} schedule.
+    """
+    return [
+        (eid, data["name"], week_schedule.flags_mask(data["days"][d] for d in DAYS))
+        for eid, data in final_schedule.items()
+    ]
+
+def vectorized_schedule(pref_rows, emp_limits):
+    """
+    greedy_schedule() computed on employee x day matrices: the hour clamping
+    runs as array operations over the whole roster instead of per employee.
+
+    Dropping the last preferred days while over max_hours is the same as
+    keeping a preferred day only while the running count of preferred
+    days is <= max_hours // HOURS_PER_DAY.
+
+    Returns (rows, coverage): the same rows as
+    schedule_rows(greedy_schedule(...)), built straight from the matrix,
+    and coverage = {day: employees scheduled}.
+    """
+    # One row per employee like the dict in greedy_schedule: first
+    # position, last preferences row wins
+    latest = {}
+    for row in pref_rows:
+        if row[0] in emp_limits:
+            latest[row[0]] = row
+    if not latest:
+        return [], dict.fromkeys(DAYS, 0)
+
+    table = np.array(list(latest.values()), dtype=object)
+    preferred = table[:, 2:] == 1
+    # Float, like the hours greedy_schedule compares against
+    max_hours = np.array([emp_limits[eid]["max"] for eid in latest], dtype=np.float64)
+    max_days = np.maximum(max_hours // HOURS_PER_DAY, 0).astype(np.int64)
+
+    scheduled = preferred & (np.cumsum(preferred, axis=1) <= max_days[:, None])
+    coverage = dict(zip(DAYS, scheduled.sum(axis=0).tolist()))
+
+    # Bit i of week_mask = day i
+    masks = (scheduled.astype(np.int64) @ (1 << np.arange(len(DAYS)))).tolist()
+    rows = list(zip(latest, table[:, 1].tolist(), masks))
+    return rows, coverage
+
+def load_solver_inputs(cur, pref_rows, emp_limits):
+    """
+    Employees (with role and rating in that role) and the coverage
+    requirements, in the shape solver.solve() expects.
+    """
+    cur.execute("SELECT * FROM school_employees")
+    columns = [desc[0] for desc in cur.description]
+    roles = {}
+    for row in cur.fetchall():
+        record = dict(zip(columns, row))
+        role = record["Role"]
+        roles[int(record["Employee_ID"])] = (role, record.get(role))
+
+    employees = []
+    for row in pref_rows:
+        eid = row[0]
+        if eid not in emp_limits:
+            continue
+        role, skill = roles.get(eid, (None, 0))
+        employees.append({
+            "id": eid,
+            "name": row[1],
+            "role": role,
+            "skill": skill,
+            "min": emp_limits[eid]["min"],
+            "max": emp_limits[eid]["max"],
+            "prefs": list(row[2:]),
+        })
+
+    # Minimum headcount per (day, role); days/roles without a row need nobody
+    cur.execute("SELECT day, role, required FROM coverage_requirements")
+    coverage = {(day, role): required for day, role, required in cur.fetchall()}
+    return employees, coverage
+
+def load_limits_and_preferences(cur, employee_ids=None):
+    """
+    (emp_limits, pref_rows) for every employee, or only for employee_ids.
+    """
+    only = "" if employee_ids is None else "WHERE employee_id = ANY(%(ids)s)"
+    params = {"ids": list(employee_ids or [])}
+
+    # 1) Read from limits
+    cur.execute(f"""
+        SELECT employee_id, employee_name, designation, min_hours, max_hours
+          FROM limits
+          {only}
+         ORDER BY employee_id
+    """, params)
+    limit_rows = cur.fetchall()
+    # store in a dict:  emp_id -> { "name":..., "min":..., "max":... }
+    emp_limits = {}
+    for row in limit_rows:
+        eid, ename, designation, min_h, max_h = row
+        emp_limits[eid] = {
+            "name": ename,
+            "min": min_h,
+            "max": max_h
+        }
+
+    # 2) Read from preferences table
+    #    Each row has: employee_id, employee_name, mon..sun (ints 0/1)
+    cur.execute(f"""
+        SELECT employee_id, employee_name, mon, tue, wed, thu, fri, sat, sun
+          FROM preferences
+          {only}
+         ORDER BY employee_id
+    """, params)
+    pref_rows = cur.fetchall()
+    return emp_limits, pref_rows
+
+def residual_coverage(cur, coverage, dirty_ids, week):
+    """
+    Coverage still needed from the dirty employees once everyone else keeps
+    their current new_schedule days in `week`.
+    """
+    staffed_sums = ", ".join(f"SUM((s.week_mask >> {i}) & 1)" for i in range(len(DAYS)))
+    cur.execute(f"""
+        SELECT e."Role", {staffed_sums}
+          FROM new_schedule s
+          JOIN school_employees e ON e."Employee_ID" = CAST(s.employee_id AS VARCHAR)
+         WHERE s.week_start = %s AND s.employee_id <> ALL(%s)
+         GROUP BY e."Role"
+    """, (week, list(dirty_ids)))
+    staffed = {}
+    for role, *per_day in cur.fetchall():
+        for day, total in zip(DAYS, per_day):
+            staffed[(day, role)] = total or 0
+    return {
+        cell: max(required - staffed.get(cell, 0), 0)
+        for cell, required in coverage.items()
+    }
+
+def build_rows(cur, method, pref_rows, emp_limits, dirty_ids=None, week=None):
+    """
+    Schedule rows for the given inputs with the chosen method. With
+    dirty_ids the solver only has to cover what the other employees leave
+    open in `week`.
+    Returns (rows, status, adjusted), adjusted being the solver's messages
+    for employees whose limits fit no whole number of days; raises
+    solver.ScheduleInfeasible.
+    """
+    if method == "greedy":
+        rows, _ = vectorized_schedule(pref_rows, emp_limits)
+        return rows, "greedy", []
+    if method == "greedy_scalar":
+        return schedule_rows(greedy_schedule(pref_rows, emp_limits)), "greedy", []
+
+    employees, coverage = load_solver_inputs(cur, pref_rows, emp_limits)
+    if dirty_ids is not None:
+        coverage = residual_coverage(cur, coverage, dirty_ids, week)
+    result = solver.solve(employees, HOURS_PER_DAY, coverage)
+    return schedule_rows(result["schedule"]), result["status"], result["adjusted"]
+
+def optimize_schedule(method=None, incremental=False, start=None, weeks=None):
+    """
+    1. Read from limits table: employee_id, employee_name, min_hours, max_hours
+    2. Read from preferences table: mon..sun (0/1)
+    3. Build the schedule, one day = one default shift of HOURS_PER_DAY
+       hours (DEFAULT_SHIFT_HOURS):
+       - "solver": jointly meet min/max hours, preferences and the
+         coverage_requirements per day and role (see solver.py)
+       - "greedy": keep preferred days, trim each employee to max hours
+         ("greedy_scalar" runs the same rule one employee at a time)
+    4. Write the final schedule (one week_mask per employee) to new_schedule,
+       for every calendar week of the horizon: `weeks` weeks (default
+       SCHEDULE_HORIZON_WEEKS) from the week of `start` (default today).
+       The inputs are weekly, so one full solve serves every week. Earlier
+       weeks are history and are not touched. Days that change in
+       changed_schedule get (or lose) their default shift in the shifts
+       table; split and partial shifts booked by hand on days the
+       optimizer leaves alone are kept.
+
+    With incremental=True only the employees whose preferences or limits
+    changed since the last run (schedule_dirty) are re-solved and only
+    their rows are written. The solver keeps everyone else's days fixed and
+    falls back to the full solve for a week whose remaining coverage can't
+    be met that way, or that has no schedule yet.
+
+    Returns {"status": ..., "reasons": [...], "adjusted": [...],
+    "coverage": {day: employees} of the first week, "changes": {week_start:
+    {table: rows/cells changed}}}. An infeasible solve leaves new_schedule
+    untouched and lists the conflicting coverage in "reasons". "adjusted"
+    lists employees scheduled below their min_hours because their limits
+    fit no whole number of days; the rest of the schedule is still published.
+    """
+    method = method or SCHEDULE_METHOD
+    schema.ensure_schema()
+    plan = week_schedule.horizon_weeks(start, weeks)
+
+    with db.cursor() as cur:
+        # Claim the dirty set first: changes made while we solve stay
+        # marked for the next run instead of being lost
+        dirty_ids = schedule_store.claim_dirty(cur)
+
+        scheduled = set()
+        if incremental:
+            if not dirty_ids:
+                print("Nothing to re-optimize: no preferences or limits changed.")
+                return {"status": "unchanged", "reasons": [], "adjusted": [],
+                        "coverage": schedule_store.day_totals(cur, week=plan[0]), "changes": {}}
+            scheduled = schedule_store.scheduled_weeks(cur, "new_schedule", plan)
+            dirty_limits, dirty_prefs = load_limits_and_preferences(cur, dirty_ids)
+
+        full = None  # (rows, status, adjusted) of the full solve, shared by every week
+        reports = {}
+        adjusted = []
+        for week in plan:
+            report = None
+            if week in scheduled:
+                try:
+                    rows, status, week_adjusted = build_rows(
+                        cur, method, dirty_prefs, dirty_limits, dirty_ids, week)
+                    adjusted += [reason for reason in week_adjusted if reason not in adjusted]
+                    report = schedule_store.apply_rows(cur, rows, dirty_ids, week=week)
+                except solver.ScheduleInfeasible:
+                    print(f"Week of {week}: incremental solve infeasible with the other "
+                          "employees fixed; using the full solve.")
+
+            if report is None:
+                if full is None:
+                    emp_limits, pref_rows = load_limits_and_preferences(cur)
+                    try:
+                        full = build_rows(cur, method, pref_rows, emp_limits)
+                    except solver.ScheduleInfeasible as e:
+                        print("[Optimizer Error] No schedule satisfies the limits and coverage:")
+                        for reason in e.reasons:
+                            print("  -", reason)
+                        # Nothing published: keep the claimed employees marked dirty
+                        cur.connection.rollback()
+                        return {"status": "infeasible", "reasons": e.reasons, "adjusted": [],
+                                "coverage": {}, "changes": {}}
+                    adjusted += [reason for reason in full[2] if reason not in adjusted]
+                rows, status, _ = full
+                # 3) Publish: diff against the live tables and write only the
+                #    changed cells; chatbot edits the optimizer didn't touch survive
+                report = schedule_store.publish_schedule(cur, rows, week=week)
+
+            reports[week.isoformat()] = report
+            print(f"Week of {week}: " + "; ".join(
+                f"{table} {counts['rows']} row(s) / {counts['cells']} cell(s) changed "
+                f"({counts['inserted']} inserted, {counts['updated']} updated, {counts['deleted']} deleted)"
+                for table, counts in report.items()
+            ))
+        if incremental:
+            print(f"Re-optimized {len(dirty_ids)} changed employee(s).")
+        if adjusted:
+            print("[Optimizer Warning] Limits that fit no whole number of days were adjusted:")
+            for reason in adjusted:
+                print("  -", reason)
+        coverage_totals = schedule_store.day_totals(cur, week=plan[0])
+
+    print(f"Optimization complete. 'new_schedule' updated for {len(plan)} week(s) from {plan[0]}.")
+    print("Employees per day:", ", ".join(f"{d} {coverage_totals[d]}" for d in DAYS))
+    return {"status": status, "reasons": [], "adjusted": adjusted,
+            "coverage": coverage_totals, "changes": reports}
 
 if __name__ == "__main__":
-    optimize_schedule()
+    # python optimization.py --incremental  -> only re-solve changed employees
+    optimize_schedule(incremental="--incremental" in sys.argv)
@@ -0,0 +1,199 @@
+"""
+In-process availability index for replacement lookups.
+
+Replacing the per-leave JOIN of school_employees x changed_schedule, the index
+holds:
+- one availability bitset per weekday (bit = employee's slot; set = free that day)
+  plus the matching "working" bitset,
+- for every role column, all employees sorted by their rating in that role.
+
+best_free(role, day) walks the role's skill-sorted list and returns the first
+employee whose bit is set, which is almost always one of the first few entries,
+so a lookup doesn't scale with headcount.
+
+There is one index per calendar week (changed_schedule keeps a row per
+employee and week), built on first use. It also answers the chatbot's "who
+is this message about" lookup (find_name) from the week's scheduled names.
+
+The chatbot updates the index itself after each schedule write (set_shift);
+writes from other processes (optimizer, employer portal) arrive as a
+db.SCHEDULE_CHANNEL notification and trigger a reload on the next lookup.
+"""
+import threading
+
+import db
+from week_schedule import DAYS, DAY_BITS, current_week
+
+# Weeks kept in memory; the least recently built is dropped first
+MAX_CACHED_WEEKS = 16
+
+# school_employees columns before the dynamic role columns
+BASE_COLUMNS = 4
+
+
+class AvailabilityIndex:
+    def __init__(self):
+        self.slots = {}           # employee_id (int) -> bit position
+        self.names = {}           # employee_id -> name
+        self.free = dict.fromkeys(DAYS, 0)
+        self.working = dict.fromkeys(DAYS, 0)
+        self.by_skill = {}        # role column -> [employee_id, ...] best first
+        self.scheduled = []       # employee_ids with a changed_schedule row
+        self._name_lookup = None  # built on first find_name()
+
+    @classmethod
+    def load(cls, cur, week=None):
+        index = cls()
+
+        cur.execute("SELECT * FROM school_employees")
+        columns = [desc[0] for desc in cur.description]
+        role_columns = columns[BASE_COLUMNS:]
+        employees = cur.fetchall()
+
+        for row in employees:
+            emp_id = int(row[0])
+            index.slots[emp_id] = len(index.slots)
+            index.names[emp_id] = row[1]
+
+        for offset, role in enumerate(role_columns, start=BASE_COLUMNS):
+            ranked = [(row[offset], int(row[0])) for row in employees]
+            # Highest rating first (unrated last), then lowest ID for stable ties
+            ranked.sort(key=lambda item: (item[0] is None, -(item[0] or 0), item[1]))
+            index.by_skill[role] = [emp_id for _, emp_id in ranked]
+
+        cur.execute("SELECT employee_id, week_mask FROM changed_schedule WHERE week_start = %s",
+                    (week or current_week(),))
+        for emp_id, week_mask in cur.fetchall():
+            slot = index.slots.get(int(emp_id))
+            if slot is None:
+                continue
+            index.scheduled.append(int(emp_id))
+            bit = 1 << slot
+            for day in DAYS:
+                if week_mask & DAY_BITS[day]:
+                    index.working[day] |= bit
+                else:
+                    index.free[day] |= bit
+        return index
+
+    def find_name(self, words):
+        """
+        Name of the scheduled employee whose full name, or else unique first
+        name, appears in `words` (a message's lowercased words), or None.
+        Dictionary lookups per word, so it doesn't scale with headcount.
+        """
+        if self._name_lookup is None:
+            self._name_lookup = self._build_name_lookup()
+        full, first, lengths = self._name_lookup
+
+        for length in lengths:
+            for start in range(len(words) - length + 1):
+                name = full.get(" ".join(words[start:start + length]))
+                if name:
+                    return name
+
+        hits = [name for word in dict.fromkeys(words) for name in first.get(word, ())]
+        return hits[0] if len(hits) == 1 else None
+
+    def _build_name_lookup(self):
+        full = {}   # "maria gonzalez" -> name
+        first = {}  # "maria" -> [name, ...]
+        for emp_id in self.scheduled:
+            name = self.names.get(emp_id)
+            if not name:
+                continue
+            words = name.lower().split()
+            full.setdefault(" ".join(words), name)
+            first.setdefault(words[0], []).append(name)
+        # Longest names first, so "maria gonzalez lopez" beats "maria gonzalez"
+        lengths = sorted({key.count(" ") + 1 for key in full}, reverse=True)
+        return full, first, lengths
+
+    def is_free(self, emp_id, day):
+        slot = self.slots.get(emp_id)
+        return slot is not None and bool(self.free[day] >> slot & 1)
+
+    def is_working(self, emp_id, day):
+        slot = self.slots.get(emp_id)
+        return slot is not None and bool(self.working[day] >> slot & 1)
+
+    def free_by_skill(self, role, day, exclude=None):
+        """Employee IDs free on `day`, highest rating in `role` first."""
+        free_bits = self.free[day]
+        for emp_id in self.by_skill.get(role, ()):
+            if emp_id != exclude and free_bits >> self.slots[emp_id] & 1:
+                yield emp_id
+
+    def working_by_skill(self, role, day, exclude=None):
+        """Employee IDs working on `day`, lowest rating in `role` first."""
+        working_bits = self.working[day]
+        for emp_id in reversed(self.by_skill.get(role, ())):
+            if emp_id != exclude and working_bits >> self.slots[emp_id] & 1:
+                yield emp_id
+
+    def best_free(self, role, day, exclude=None):
+        """(employee_id, name) of the highest-rated employee free on `day`, or None."""
+        emp_id = next(self.free_by_skill(role, day, exclude), None)
+        return None if emp_id is None else (emp_id, self.names[emp_id])
+
+    def least_skilled_working(self, role, day, exclude=None):
+        """(employee_id, name) of the lowest-rated employee working on `day`, or None."""
+        emp_id = next(self.working_by_skill(role, day, exclude), None)
+        return None if emp_id is None else (emp_id, self.names[emp_id])
+
+    def set_shift(self, emp_id, day, working):
+        """Mirror a committed changed_schedule write (day's bit set or cleared)."""
+        slot = self.slots.get(emp_id)
+        if slot is None:
+            return
+        bit = 1 << slot
+        if working:
+            self.working[day] |= bit
+            self.free[day] &= ~bit
+        else:
+            self.free[day] |= bit
+            self.working[day] &= ~bit
+
+
+_indexes = {}  # week_start -> AvailabilityIndex, in build order
+_lock = threading.Lock()
+_listener = db.Listener()
+
+
+def get_index(week=None):
+    """
+    Return the process-wide index for `week` (default: the current week),
+    (re)loading it first if it was never built or another process has
+    changed the schedule or employees since.
+    """
+    week = week or current_week()
+    with _lock:
+        if _listener.changed():
+            _indexes.clear()
+        index = _indexes.get(week)
+        if index is None:
+            with db.cursor() as cur:
+                index = AvailabilityIndex.load(cur, week)
+            if len(_indexes) >= MAX_CACHED_WEEKS:
+                del _indexes[next(iter(_indexes))]
+            _indexes[week] = index
+        return index
+
+
+def record_shift_changes(changes, week=None):
+    """
+    Apply committed writes to the cached index of `week`: changes is an
+    iterable of (employee_id, day, working) tuples.
+    """
+    with _lock:
+        index = _indexes.get(week or current_week())
+        if index is None:
+            return
+        for emp_id, day, working in changes:
+            index.set_shift(int(emp_id), day, working)
+
+
+def invalidate():
+    """Force a reload on the next lookup (e.g. after a bulk change in this process)."""
+    with _lock:
+        _indexes.clear()
@@ -0,0 +1,314 @@
+"""
+Benchmark suite for the scheduling hot paths.
+
+For every organization size it builds a synthetic organization -- a
+school_employees table with --roles role columns, created by the portal's
+create_dynamic_table(), random ratings, preferences and limits, and
+coverage requirements per day and role -- and times:
+
+    optimize_full          optimization.optimize_schedule() over --weeks weeks
+    optimize_incremental   the same with incremental=True, after 1% of the
+                           employees' limits changed
+    leave                  chatbot.process_leave_request()
+    swap                   chatbot.process_swap_request()
+    schedule_query         chatbot.check_schedule_query(), for one day and
+                           for the whole week
+
+    python benchmarks/schedule_bench.py --sizes 10,1000,50000 --output results.jsonl
+    python benchmarks/schedule_bench.py --embedded /tmp/bench-pg
+
+It REPLACES school_employees, limits, preferences, coverage_requirements
+and the schedules; only run it against a scratch database (DB_* settings,
+see db.py). --embedded DIR instead starts a throwaway Postgres in DIR
+through the optional pgserver package (pip install pgserver).
+
+Each (size, benchmark) pair becomes one JSON object with timings in
+milliseconds and the run's metadata (commit, time, settings), written as
+JSON Lines. --output appends to a file, so one file can collect runs over
+time for regression tracking; without it results go to stdout and
+everything else the code prints goes to stderr.
+"""
+import argparse
+import contextlib
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from psycopg2.extras import execute_values
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "Employer_website"))
+
+DEFAULT_SIZES = "10,100,1000,10000,50000"
+ROLE_NAMES = ["Teacher", "Clerk", "Janitor", "Counselor", "Librarian", "Nurse", "Coach", "Cook"]
+DAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+DAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+# Share of a role's employees required on shift each day
+COVERAGE_SHARE = 0.2
+# Share of employees whose limits change before an incremental run
+DIRTY_SHARE = 0.01
+
+# The repo's modules read the DB_* settings when imported, so they are
+# imported in main(), after --embedded has set them
+db = schema = app = employee_import = optimization = chatbot = availability_index = week_schedule = None
+
+
+def start_embedded(directory):
+    """Start (or reuse) a local Postgres in `directory` and point DB_* at it."""
+    try:
+        import pgserver
+    except ImportError:
+        sys.exit("--embedded needs the pgserver package: pip install pgserver")
+    server = pgserver.get_server(directory)
+    # The server listens on a Unix socket in `directory`
+    os.environ.update({"DB_HOST": directory, "DB_USER": "postgres", "DB_PASSWORD": "", "DB_NAME": "postgres"})
+    return server
+
+
+def import_modules():
+    global db, schema, app, employee_import, optimization, chatbot, availability_index, week_schedule
+    import db
+    import schema
+    import app
+    import employee_import
+    import optimization
+    import chatbot
+    import availability_index
+    import week_schedule
+
+
+def role_names(count):
+    return [ROLE_NAMES[i] if i < len(ROLE_NAMES) else f"Role_{i + 1}" for i in range(count)]
+
+
+def employee_name(i):
+    """'Worker Baaa'-style names: letters only, so the chatbot's name matcher finds them."""
+    letters = ""
+    for _ in range(4):
+        i, digit = divmod(i, 26)
+        letters = chr(ord("a") + digit) + letters
+    return f"Worker {letters.capitalize()}"
+
+
+# ---------------------------
+# Synthetic organization
+# ---------------------------
+
+def seed(employees, roles, rng):
+    """
+    Recreate school_employees like /create_roles_table does and fill it,
+    limits, preferences and coverage_requirements. Returns the names.
+    """
+    schema.ensure_schema()
+    app.create_dynamic_table("school", roles)
+    names = [employee_name(i) for i in range(employees)]
+    with db.cursor() as cur:
+        # Not part of schema.py: the chatbot only ever updates it
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS preferences (
+                employee_id INT PRIMARY KEY,
+                employee_name VARCHAR(100),
+                mon INT, tue INT, wed INT, thu INT, fri INT, sat INT, sun INT
+            )
+        """)
+        cur.execute("""
+            TRUNCATE candidate_credentials, preferences, limits, coverage_requirements,
+                     schedule_dirty, new_schedule, changed_schedule, shifts
+        """)
+
+        employee_roles = [rng.choice(roles) for _ in names]
+        rows = [[name, "Staff", role, *(rng.randint(0, 10) for _ in roles)]
+                for name, role in zip(names, employee_roles)]
+        first, _ = employee_import.copy_employees(cur, rows, roles)
+        ids = range(first, first + employees)
+
+        limits = []
+        for emp_id, name in zip(ids, names):
+            min_hours = rng.choice([0, 10, 20])
+            limits.append((emp_id, name, "Staff", min_hours, min_hours + rng.choice([20, 30, 40])))
+        execute_values(cur, "INSERT INTO limits VALUES %s", limits, page_size=1000)
+        execute_values(
+            cur, "INSERT INTO preferences VALUES %s",
+            [(emp_id, name, *(int(rng.random() < 0.5) for _ in DAYS)) for emp_id, name in zip(ids, names)],
+            page_size=1000)
+
+        headcount = {role: employee_roles.count(role) for role in roles}
+        cur.executemany(
+            "INSERT INTO coverage_requirements (day, role, required) VALUES (%s, %s, %s)",
+            [(day, role, int(headcount[role] * COVERAGE_SHARE)) for day in DAYS for role in roles])
+        db.notify(cur)
+        schema.invalidate_employee_columns(cur)
+    availability_index.invalidate()
+    return names
+
+
+# ---------------------------
+# Timing
+# ---------------------------
+
+def timed(calls):
+    """Run each zero-argument callable once; returns the durations in seconds."""
+    samples = []
+    for call in calls:
+        start = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def summary(samples):
+    ordered = sorted(samples)
+    ms = [s * 1000 for s in ordered]
+    return {
+        "runs": len(ms),
+        "median_ms": round(statistics.median(ms), 3),
+        "p95_ms": round(ms[math.ceil(len(ms) * 0.95) - 1], 3),
+        "min_ms": round(ms[0], 3),
+        "max_ms": round(ms[-1], 3),
+        "mean_ms": round(statistics.fmean(ms), 3),
+    }
+
+
+def mark_dirty(ids, rng):
+    """Touch the limits of DIRTY_SHARE of the employees; the triggers mark them dirty."""
+    sample = rng.sample(ids, max(1, int(len(ids) * DIRTY_SHARE)))
+    with db.cursor() as cur:
+        cur.execute("UPDATE limits SET max_hours = max_hours WHERE employee_id = ANY(%s)", (sample,))
+
+
+def plan_requests(names, runs, rng):
+    """
+    Up to `runs` leave requests (name, weekday) for days the employee works
+    and swaps (name, from, to) to a free day of the same week, so the
+    timings are of requests the chatbot acts on, not early rejections.
+    """
+    dates = {day: week_schedule.upcoming(day) for day in DAYS}
+    weeks = {day: week_schedule.week_of(on) for day, on in dates.items()}
+    with db.cursor() as cur:
+        cur.execute("""
+            SELECT employee_name, week_start, week_mask
+              FROM changed_schedule
+             WHERE week_start = ANY(%s)
+        """, (list(set(weeks.values())),))
+        masks = {(name, week): mask for name, week, mask in cur.fetchall()}
+
+    leaves, swaps = [], []
+    for _ in range(runs * 20):
+        if len(leaves) >= runs and len(swaps) >= runs:
+            break
+        name = rng.choice(names)
+        works = {day: bool(masks.get((name, weeks[day]), 0) & week_schedule.DAY_BITS[day]) for day in DAYS}
+        working = [day for day in DAYS if works[day]]
+        if not working:
+            continue
+        day = rng.choice(working)
+        if len(leaves) < runs:
+            leaves.append((name, day))
+        free = [other for other in DAYS if not works[other] and weeks[other] == weeks[day]]
+        if free and len(swaps) < runs:
+            swaps.append((name, day, rng.choice(free)))
+    return leaves, swaps
+
+
+def run_size(employees, args, rng):
+    """[(benchmark, samples)] for one organization size."""
+    roles = role_names(args.roles)
+    names = seed(employees, roles, rng)
+    with db.cursor() as cur:
+        cur.execute("SELECT employee_id FROM limits")
+        ids = [row[0] for row in cur.fetchall()]
+
+    results = [("optimize_full", timed(
+        [lambda: optimization.optimize_schedule(weeks=args.weeks)] * args.optimize_runs))]
+
+    incremental = []
+    for _ in range(args.optimize_runs):
+        mark_dirty(ids, rng)
+        incremental += timed([lambda: optimization.optimize_schedule(incremental=True, weeks=args.weeks)])
+    results.append(("optimize_incremental", incremental))
+
+    def pick():
+        return rng.choice(names)
+
+    leaves, _ = plan_requests(names, args.runs, rng)
+    results.append(("leave", timed(
+        [lambda leave=leave: chatbot.process_leave_request(*leave) for leave in leaves])))
+    # Planned after the leaves, which changed the schedule
+    _, swaps = plan_requests(names, args.runs, rng)
+    results.append(("swap", timed(
+        [lambda swap=swap: chatbot.process_swap_request(*swap) for swap in swaps])))
+    results.append(("schedule_query_day", timed(
+        [lambda text=f"Does {pick()} work on {rng.choice(DAY_NAMES)}?": chatbot.check_schedule_query(text)
+         for _ in range(args.runs)])))
+    results.append(("schedule_query_week", timed(
+        [lambda text=f"Which days does {pick()} work this week?": chatbot.check_schedule_query(text)
+         for _ in range(args.runs)])))
+    return results
+
+
+def metadata(args):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "database": "embedded" if args.embedded else os.environ.get("DB_HOST", "localhost"),
+        "schedule_method": optimization.SCHEDULE_METHOD,
+        "roles": args.roles,
+        "weeks": args.weeks,
+        "random_seed": args.random_seed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated employee counts")
+    parser.add_argument("--roles", type=int, default=3, help="role columns per organization")
+    parser.add_argument("--runs", type=int, default=20, help="calls per chatbot benchmark")
+    parser.add_argument("--optimize-runs", type=int, default=3, help="calls per optimizer benchmark")
+    parser.add_argument("--weeks", type=int, default=2, help="weeks of the horizon to optimize")
+    parser.add_argument("--random-seed", type=int, default=1)
+    parser.add_argument("--embedded", metavar="DIR", help="run against a throwaway Postgres in DIR")
+    parser.add_argument("--output", help="append JSON Lines results to this file (default: stdout)")
+    args = parser.parse_args()
+
+    # Kept referenced for the whole run; it stops when the script exits
+    server = start_embedded(args.embedded) if args.embedded else None
+    # Import-time warnings would otherwise land among the results
+    with contextlib.redirect_stdout(sys.stderr):
+        import_modules()
+
+    results = open(args.output, "a") if args.output else sys.stdout
+    meta = metadata(args)
+    rng = random.Random(args.random_seed)
+    try:
+        for employees in (int(size) for size in args.sizes.split(",")):
+            # Progress and the optimizer's report go to stderr, results to `results`
+            with contextlib.redirect_stdout(sys.stderr):
+                print(f"== {employees} employees", flush=True)
+                measured = run_size(employees, args, rng)
+            for benchmark, samples in measured:
+                record = {"benchmark": benchmark, "employees": employees, **summary(samples), **meta}
+                results.write(json.dumps(record) + "\n")
+                results.flush()
+                print(f"{employees:>6} {benchmark:<22} median {record['median_ms']:>10.2f} ms  "
+                      f"p95 {record['p95_ms']:>10.2f} ms", file=sys.stderr)
+    finally:
+        if args.output:
+            results.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Concurrency stress test for shift_assignment (leave and swap requests).
+
+Fires random leave/swap requests for days of next week from many
+threads at once and then checks changed_schedule: every request moves
+shifts between employees without creating or losing any, so the number of
+people working each day and the hours staffed each day (shifts table) must
+be exactly what they were before. A double-booked replacement or a lost
+update shows up as a changed day total.
+
+    python benchmarks/stress_assignments.py --seed --employees 500 --threads 16 --requests 2000
+
+--seed REPLACES school_employees and changed_schedule with synthetic data;
+only use it against a scratch database. Without it the current data is used.
+Set DB_POOL_MAX to at least --threads.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from datetime import timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+import schedule_store
+import shift_assignment
+import shift_intervals
+import week_schedule
+
+ROLES = ["Teacher", "Clerk", "Janitor"]
+
+
+def seed(employees, week, rng):
+    """Synthetic employees (one rating per role) and a random live schedule, with default shifts, for `week`."""
+    with db.cursor() as cur:
+        cur.execute("DROP TABLE IF EXISTS school_employees")
+        role_columns = ", ".join(f'"{role}" INT' for role in ROLES)
+        cur.execute(f"""
+            CREATE TABLE school_employees (
+                "Employee_ID" VARCHAR(50) PRIMARY KEY,
+                "Employee_name" VARCHAR(100),
+                "Designation" VARCHAR(100),
+                "Role" VARCHAR(100),
+                {role_columns}
+            )
+        """)
+        cur.executemany(
+            "INSERT INTO school_employees VALUES (%s, %s, %s, %s" + ", %s" * len(ROLES) + ")",
+            [(str(i), f"emp{i}", "Staff", rng.choice(ROLES), *(rng.randint(0, 10) for _ in ROLES))
+             for i in range(1, employees + 1)]
+        )
+        schedule_store.ensure_schedule_tables(cur)
+        shift_intervals.ensure_shifts_table(cur)
+        cur.execute("DELETE FROM changed_schedule WHERE week_start = %s", (week,))
+        cur.execute("DELETE FROM shifts WHERE starts_at >= %s AND starts_at < %s",
+                    (week, week + timedelta(weeks=1)))
+        masks = {i: rng.randrange(1 << len(schedule_store.DAYS)) for i in range(1, employees + 1)}
+        cur.executemany(
+            f"INSERT INTO changed_schedule (week_start, {schedule_store.COLUMN_LIST}) VALUES (%s, %s, %s, %s)",
+            [(week, i, f"emp{i}", mask) for i, mask in masks.items()]
+        )
+        shift_intervals.sync_masks(cur, week, {}, masks)
+        db.notify(cur)
+
+
+def employee_names(week):
+    with db.cursor() as cur:
+        cur.execute("SELECT employee_name FROM changed_schedule WHERE week_start = %s", (week,))
+        return [row[0] for row in cur.fetchall()]
+
+
+def worker(names, week, requests, swap_ratio, rng, stats, lock):
+    days = schedule_store.DAYS
+    for _ in range(requests):
+        name = rng.choice(names)
+        start = time.perf_counter()
+        try:
+            if rng.random() < swap_ratio:
+                from_day, to_day = rng.sample(days, 2)
+                shift_assignment.swap(name, week_schedule.date_in_week(week, from_day), to_day)
+            else:
+                shift_assignment.leave(name, week_schedule.date_in_week(week, rng.choice(days)))
+            outcome = "applied"
+        except shift_assignment.AssignmentError:
+            outcome = "rejected"
+        except shift_assignment.RetriesExhausted:
+            outcome = "gave_up"
+        elapsed = time.perf_counter() - start
+        with lock:
+            stats[outcome] += 1
+            stats["latencies"].append(elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--seed", action="store_true", help="replace the tables with synthetic data")
+    parser.add_argument("--employees", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=2000, help="total, split across threads")
+    parser.add_argument("--swap-ratio", type=float, default=0.5)
+    parser.add_argument("--random-seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.random_seed)
+    # Next week: every day of it is still in the future
+    week = week_schedule.horizon_weeks(count=2)[1]
+    if args.seed:
+        seed(args.employees, week, rng)
+    names = employee_names(week)
+
+    with db.cursor() as cur:
+        before = schedule_store.day_totals(cur, "changed_schedule", week)
+        hours_before = shift_intervals.day_hours(cur, week)
+
+    stats = {"applied": 0, "rejected": 0, "gave_up": 0, "latencies": []}
+    lock = threading.Lock()
+    per_thread = args.requests // args.threads
+    threads = [
+        threading.Thread(target=worker, args=(names, week, per_thread, args.swap_ratio,
+                                              random.Random(rng.random()), stats, lock))
+        for _ in range(args.threads)
+    ]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    with db.cursor() as cur:
+        after = schedule_store.day_totals(cur, "changed_schedule", week)
+        hours_after = shift_intervals.day_hours(cur, week)
+
+    latencies = sorted(stats["latencies"])
+    total = len(latencies)
+    print(f"{total} requests from {args.threads} threads in {elapsed:.2f}s "
+          f"({total / elapsed:.0f}/s)")
+    print(f"  applied {stats['applied']}, rejected {stats['rejected']}, "
+          f"gave up after retries {stats['gave_up']}")
+    if latencies:
+        print(f"  latency p50 {statistics.median(latencies) * 1000:.1f} ms, "
+              f"p95 {latencies[int(total * 0.95) - 1] * 1000:.1f} ms, "
+              f"max {latencies[-1] * 1000:.1f} ms")
+
+    broken = {day: (before[day], after[day]) for day in before if before[day] != after[day]}
+    broken_hours = {day: (hours_before[day], hours_after[day])
+                    for day in hours_before if hours_before[day] != hours_after[day]}
+    if broken or broken_hours:
+        print(f"FAILED: day totals changed (before, after): {broken} hours: {broken_hours}")
+        sys.exit(1)
+    print("OK: day totals and staffed hours unchanged")
+
+
+if __name__ == "__main__":
+    main()
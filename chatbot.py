@@ -1,4 +1,6 @@
-from flask import Flask, request, jsonify, render_template
+import json
+
+from flask import Flask, Response, request, jsonify, render_template, stream_with_context
 
 from flask_cors import CORS
 
@@ -8,89 +10,127 @@ CORS(app)  # <-- Enables cross-origin requests from React
 
 import os
 import re  # <-- Make sure we explicitly import re if we use regex
-import psycopg2
 
-# Gemini LLM imports
-from google import genai
-from google.genai import types
+import db  # shared pooled Postgres access
+import availability_index  # per-week cached schedule and names
+import shift_assignment  # row-locked leave/swap transactions
+import shift_intervals  # start/end times of each shift
+import week_schedule  # 7-bit week_mask per employee and calendar week
+
+# Gemini LLM access (shared clients, request coalescing, concurrency limit)
+import llm_gateway
 
 # ---------------------------
 # RAG CONSTANTS & HELPER FUNCTIONS (NEW)
 # ---------------------------
 
-# 1. Path to your reference document
-DOC_PATH = "C:/Users/sivad/Documents/Chatbot/paradise.pdf"
-
 # Optional: put your RAG model key here if different from your main chat keys
 RAG_API_KEY = "*********************"
 
 import fitz  # <-- Add this at the top of your file
 
+import rag_index  # chunked BM25 retrieval over the reference doc
+import day_parser  # local weekday parser (fast path before Gemini)
+import intent_engine  # compiled single-pass intent classifier
+import response_cache  # LRU/TTL cache for repeat Gemini answers
+
+# Path to the reference document, shared with the employer portal's upload
+DOC_PATH = rag_index.DOC_PATH
+
+RAG_MODEL = "gemini-2.0-flash-lite"
+GENERAL_MODEL = "gemini-2.5-pro-exp-03-25"
+
+# Characters of a streamed RAG answer held back to detect "No relevant info found"
+RAG_SNIFF_CHARS = 32
+
+# Shared by rag_qa and get_general_response; cleared whenever the reference doc changes
+RESPONSE_CACHE = response_cache.ResponseCache()
+
 def load_document(doc_path):
     """
     Extract text from a PDF file using PyMuPDF (fitz).
+    Only called by rag_index when the cached/saved chunks are stale.
     """
     if not os.path.exists(doc_path):
         return ""
 
     try:
-        doc = fitz.open(doc_path)
-        full_text = ""
-        for page in doc:
-            full_text += page.get_text()
-        doc.close()
-        return full_text
+        with fitz.open(doc_path) as doc:
+            return "".join(page.get_text() for page in doc)
     except Exception as e:
         print("[PDF Read Error]", str(e))
         return ""
 
 
-def rag_qa(user_query):
+def build_rag_prompt(user_query):
     """
-    Naive RAG approach:
-    1) Load the entire doc text as 'context'.
-    2) Build a prompt that includes the doc plus user query.
-    3) Call Gemini to see if it can answer from that context.
-    4) If the response is mostly useless or empty, return None to fallback.
+    Retrieve the top-k chunks of the reference doc for the query and wrap them
+    in the RAG prompt. Returns None when there is no doc or nothing relevant.
     """
-    context_text = load_document(DOC_PATH)
-    if not context_text.strip():
+    index = rag_index.get_index(DOC_PATH, load_document)
+    if index is None:
         # No doc or the doc is empty, so we can't do RAG
         return None
-    print("Extracted RAG content:\n", context_text[:1000])  # Just print first 1000 chars
 
-    # You may use the same or different API key you use for LLM calls
-    client = genai.Client(api_key=RAG_API_KEY)
+    hits = index.search(user_query, k=rag_index.TOP_K)
+    if not hits:
+        # Nothing in the document matches the question; skip the LLM call entirely
+        return None
+    context_text = "\n...\n".join(chunk for _, chunk in hits)
+    print("Retrieved RAG content:\n", context_text[:1000])  # Just print first 1000 chars
 
-    prompt = (
-        "You are a helpful AI assistant with the following reference text:\n"
+    return (
+        "You are a helpful AI assistant with the following reference excerpts:\n"
         f"---\n{context_text}\n---\n\n"
         "If the user's question can be answered using the above reference, "
         "provide the best possible answer. Otherwise, respond with 'No relevant info found'.\n\n"
         f"User's question: {user_query}\nAnswer:"
     )
 
+
+def watch_document():
+    """
+    Current version of the reference document. A new version -- a changed
+    file, or an upload the portal announced -- drops every cached answer.
+    """
+    doc_version = rag_index.document_version(DOC_PATH)
+    RESPONSE_CACHE.watch_version(doc_version)
+    return doc_version
+
+
+def rag_cache_key(user_query):
+    return response_cache.make_key(user_query, RAG_MODEL, watch_document())
+
+
+def is_useless_rag_answer(answer):
+    # Model says "No relevant info found" or the answer is too short to be useful
+    return "no relevant info" in answer.lower() or len(answer) < 10
+
+
+def rag_qa(user_query):
+    """
+    Retrieval-augmented answer:
+    1) Get the chunked BM25 index of the reference doc (cached in memory,
+       rebuilt only when the document file changes).
+    2) Retrieve only the top-k chunks relevant to the user query.
+    3) Call Gemini with just those chunks as 'context'.
+    4) If nothing relevant is retrieved or the response is mostly useless, return None to fallback.
+    Answers (including "nothing relevant") are cached per question and document version.
+    """
+    cache_key = rag_cache_key(user_query)
+    hit, cached_answer = RESPONSE_CACHE.get(cache_key)
+    if hit:
+        return cached_answer
+
+    prompt = build_rag_prompt(user_query)
+    if prompt is None:
+        return None
+
     try:
-        contents = [
-            types.Content(
-                role="user",
-                parts=[types.Part.from_text(text=prompt)]
-            )
-        ]
-
-        response_text = ""
-        for chunk in client.models.generate_content_stream(
-            model="gemini-2.0-flash-lite",
-            contents=contents,
-            config=types.GenerateContentConfig(response_mime_type="text/plain")
-        ):
-            response_text += chunk.text
-
-        answer = response_text.strip()
-        
-        # If model says "No relevant info found" or is too short, return None so fallback
-        if "no relevant info" in answer.lower() or len(answer) < 10:
-            return None
+        answer = "".join(llm_gateway.stream(RAG_API_KEY, RAG_MODEL, prompt)).strip()
+        if is_useless_rag_answer(answer):
+            answer = None
+        RESPONSE_CACHE.set(cache_key, answer)
         return answer
     
     except Exception as e:
@@ -98,11 +138,57 @@ def rag_qa(user_query):
         return None
 
 
+def rag_qa_stream(user_query):
+    """
+    Streaming variant of rag_qa: yields answer text as Gemini produces it.
+    Yields nothing at all when the document has no relevant answer, so the
+    caller can fall back to the general response.
+
+    The first RAG_SNIFF_CHARS characters are held back until we know the
+    model isn't about to say "No relevant info found".
+    """
+    cache_key = rag_cache_key(user_query)
+    hit, cached_answer = RESPONSE_CACHE.get(cache_key)
+    if hit:
+        if cached_answer:
+            yield cached_answer
+        return
+
+    prompt = build_rag_prompt(user_query)
+    if prompt is None:
+        return
+
+    parts = []
+    streaming = False
+    try:
+        for piece in llm_gateway.stream(RAG_API_KEY, RAG_MODEL, prompt):
+            parts.append(piece)
+            if streaming:
+                yield piece
+                continue
+            held_back = "".join(parts)
+            if len(held_back.strip()) >= RAG_SNIFF_CHARS:
+                if "no relevant info" in held_back.lower():
+                    break
+                streaming = True
+                yield held_back.lstrip()
+    except Exception as e:
+        print("[RAG Error]", str(e))
+        return
+
+    answer = "".join(parts).strip()
+    if not streaming:
+        if is_useless_rag_answer(answer):
+            answer = None
+        else:
+            yield answer
+    RESPONSE_CACHE.set(cache_key, answer)
+
+
 # ---------------------------
 # Gemini-powered day parser
 # ---------------------------
 def parse_day_from_gemini(user_input):
-    client = genai.Client(api_key="***********")
     prompt = (
         f"The user said:\n\"{user_input}\"\n\n"
         "Which day of the week are they referring to for a leave? "
@@ -110,20 +196,7 @@ def parse_day_from_gemini(user_input):
     )
 
     try:
-        contents = [
-            types.Content(
-                role="user",
-                parts=[types.Part.from_text(text=prompt)]
-            )
-        ]
-
-        response_text = ""
-        for chunk in client.models.generate_content_stream(
-            model="gemini-2.0-flash-lite",
-            contents=contents,
-            config=types.GenerateContentConfig(response_mime_type="text/plain")
-        ):
-            response_text += chunk.text
+        response_text = llm_gateway.generate("***********", "gemini-2.0-flash-lite", prompt)
 
         response_text = response_text.strip().lower()
         day_map = {
@@ -141,106 +214,143 @@ def parse_day_from_gemini(user_input):
         return None
 
 
+GENERAL_SYSTEM_PROMPT = (
+    "You are a helpful, polite, and smart assistant for a restaurant called Paradise Restaurant.\n"
+    "You are not a generic AI model. You are the official chatbot assistant for Paradise Restaurant.\n"
+    "You help employees with:\n"
+    "- Approving leave requests\n"
+    "- Handling shift swap requests\n"
+    "- Answering general queries\n"
+    "- Providing technical support\n\n"
+    "If someone asks who you are, say: 'I'm a chatbot assisting on behalf of Paradise Restaurant.'\n"
+    "If someone asks what you can do, reply with: 'I can approve leave requests, help with shift swaps, answer general questions, and provide technical support.'\n"
+    "Always sound confident and supportive. If someone asks if you can approve leave or swap shifts, say yes and guide them.\n"
+    "Avoid mentioning that you're a language model, AI, or developed by Google.\n"
+)
+
+GENERAL_API_KEY = "*********************"
+
+GENERAL_ERROR_MESSAGE = "Sorry, I'm having trouble answering that right now."
+
+
 def get_general_response(user_input):
     """
     Uses Gemini to generate a general response using a custom assistant persona.
+    Repeat questions are answered from RESPONSE_CACHE.
     """
+    watch_document()
+    cache_key = response_cache.make_key(user_input, GENERAL_MODEL)
+    hit, cached_answer = RESPONSE_CACHE.get(cache_key)
+    if hit:
+        return cached_answer
+
     try:
-        client = genai.Client(api_key="*********************")
-
-        system_prompt = (
-            "You are a helpful, polite, and smart assistant for a restaurant called Paradise Restaurant.\n"
-            "You are not a generic AI model. You are the official chatbot assistant for Paradise Restaurant.\n"
-            "You help employees with:\n"
-            "- Approving leave requests\n"
-            "- Handling shift swap requests\n"
-            "- Answering general queries\n"
-            "- Providing technical support\n\n"
-            "If someone asks who you are, say: 'I'm a chatbot assisting on behalf of Paradise Restaurant.'\n"
-            "If someone asks what you can do, reply with: 'I can approve leave requests, help with shift swaps, answer general questions, and provide technical support.'\n"
-            "Always sound confident and supportive. If someone asks if you can approve leave or swap shifts, say yes and guide them.\n"
-            "Avoid mentioning that you're a language model, AI, or developed by Google.\n"
-        )
-
-        full_prompt = system_prompt + "\n\nUser: " + user_input
-
-        contents = [
-            types.Content(
-                role="user",
-                parts=[types.Part.from_text(text=full_prompt)]
-            )
-        ]
-
-        response_text = ""
-        for chunk in client.models.generate_content_stream(
-            model="gemini-2.5-pro-exp-03-25",
-            contents=contents,
-            config=types.GenerateContentConfig(response_mime_type="text/plain")
-        ):
-            response_text += chunk.text
-
-        return response_text.strip()
+        full_prompt = GENERAL_SYSTEM_PROMPT + "\n\nUser: " + user_input
+        answer = "".join(llm_gateway.stream(GENERAL_API_KEY, GENERAL_MODEL, full_prompt)).strip()
+        RESPONSE_CACHE.set(cache_key, answer)
+        return answer
 
     except Exception as e:
         print("[Chatbot Error]", str(e))
-        return "Sorry, I'm having trouble answering that right now."
+        return GENERAL_ERROR_MESSAGE
 
 
-def check_schedule_query(user_text, default_employee="Maria Gonzalez"):
+def get_general_response_stream(user_input):
+    """Streaming variant of get_general_response: yields text as it arrives."""
+    watch_document()
+    cache_key = response_cache.make_key(user_input, GENERAL_MODEL)
+    hit, cached_answer = RESPONSE_CACHE.get(cache_key)
+    if hit:
+        yield cached_answer
+        return
+
+    parts = []
     try:
-        client = genai.Client(api_key="************")
-
-        prompt = (
-            f"You are a schedule analyzer for Paradise Restaurant.\n"
-            f"From the user input, extract:\n"
-            f"1. employee name (if mentioned, else assume default '{default_employee}')\n"
-            f"2. specific day of the week (e.g., Monday) if asked\n"
-            f"Only respond with two values separated by a line break like:\n"
-            f"{default_employee}\nWednesday"
-        )
-
-        full_prompt = prompt + "\n\nUser input:\n" + user_text
-
-        contents = [
-            types.Content(
-                role="user",
-                parts=[types.Part.from_text(text=full_prompt)]
-            )
-        ]
-
-        response_text = ""
-        for chunk in client.models.generate_content_stream(
-            model="gemini-2.0-flash",
-            contents=contents,
-            config=types.GenerateContentConfig(response_mime_type="text/plain")
-        ):
-            response_text += chunk.text
-
-        lines = response_text.strip().split("\n")
-        employee = lines[0].strip()
-        weekday = lines[1].strip().lower()[:3] if len(lines) > 1 else None
-
-        conn = psycopg2.connect(
-            dbname="postgres",
-            user="postgres",
-            password="sql123",
-            host="localhost",
-            port="5432"
-        )
-        cursor = conn.cursor()
+        full_prompt = GENERAL_SYSTEM_PROMPT + "\n\nUser: " + user_input
+        for piece in llm_gateway.stream(GENERAL_API_KEY, GENERAL_MODEL, full_prompt):
+            if not parts:
+                piece = piece.lstrip()
+            parts.append(piece)
+            yield piece
+    except Exception as e:
+        print("[Chatbot Error]", str(e))
+        if not parts:
+            yield GENERAL_ERROR_MESSAGE
+        return
 
-        if employee and not weekday:
-            cursor.execute("""
-                SELECT mon, tue, wed, thu, fri, sat, sun
-                FROM changed_schedule
-                WHERE employee_name = %s
-            """, (employee,))
-            row = cursor.fetchone()
-            conn.close()
+    RESPONSE_CACHE.set(cache_key, "".join(parts).strip())
+
+
+def parse_schedule_query_from_gemini(user_text, default_employee):
+    """
+    Ask Gemini for (employee name, 3-letter weekday or None).
+    Only used when the local parser isn't confident about the day.
+    """
+    prompt = (
+        f"You are a schedule analyzer for Paradise Restaurant.\n"
+        f"From the user input, extract:\n"
+        f"1. employee name (if mentioned, else assume default '{default_employee}')\n"
+        f"2. specific day of the week (e.g., Monday) if asked\n"
+        f"Only respond with two values separated by a line break like:\n"
+        f"{default_employee}\nWednesday"
+    )
+
+    full_prompt = prompt + "\n\nUser input:\n" + user_text
+
+    response_text = llm_gateway.generate("************", "gemini-2.0-flash", full_prompt)
+
+    lines = response_text.strip().split("\n")
+    employee = lines[0].strip()
+    weekday = lines[1].strip().lower()[:3] if len(lines) > 1 else None
+    return employee, weekday
+
+
+def find_employee_in_text(user_text):
+    """
+    Return the scheduled employee whose full name (or unique first name)
+    appears in the text, or None if no one else is mentioned. The names come
+    from the current week's availability index, which reloads when another
+    process changes the schedule.
+    """
+    words = re.findall(r"[a-z]+", user_text.lower())
+    return availability_index.get_index().find_name(words)
+
+
+def check_schedule_query(user_text, default_employee="Maria Gonzalez"):
+    try:
+        # Fast path: local day parser (a date) + name lookup; Gemini only for unclear days
+        on, confidence = day_parser.parse_day(user_text)
+        if on is None or confidence >= day_parser.CONFIDENCE_THRESHOLD:
+            employee = find_employee_in_text(user_text) or default_employee
+        else:
+            employee, weekday = parse_schedule_query_from_gemini(user_text, default_employee)
+            # Gemini names a weekday: its next date
+            on = week_schedule.upcoming(weekday) if weekday in week_schedule.DAYS else None
+
+        # A day means its week; otherwise the current week
+        weekday = None
+        if on:
+            week_start, weekday = week_schedule.on_date(on)
+        else:
+            week_start = week_schedule.current_week()
+
+        if employee:
+            with db.cursor() as cursor:
+                cursor.execute("""
+                    SELECT employee_id, week_mask
+                    FROM changed_schedule
+                    WHERE week_start = %s AND employee_name = %s
+                """, (week_start, employee))
+                row = cursor.fetchone()
+                times = []
+                if row and weekday:
+                    times = shift_intervals.on_day(cursor, row[0], on)
 
             if not row:
-                return f"I couldn't find any schedule for {employee}."
+                return f"I couldn't find any schedule for {employee} in the week of {week_start:%b %d}."
+            week = week_schedule.WeekSchedule(row[1])
 
+        if employee and not weekday:
             day_map = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
 
             # Determine if it's a negative query
@@ -248,36 +358,30 @@ def check_schedule_query(user_text, default_employee="Maria Gonzalez"):
             is_asking_for_leaves = any(neg in user_text.lower() for neg in negative_keywords)
 
             if is_asking_for_leaves:
-                leave_days = [day_map[i] for i, val in enumerate(row) if val == '0']
+                leave_days = [day_map[i] for i, works in enumerate(week.flags()) if not works]
                 if employee == default_employee:
                     return "You have leave (no shifts) on: " + ", ".join(leave_days) + "." if leave_days else "You have no leave days this week."
                 else:
                     return f"{employee} has leave (no shifts) on: " + ", ".join(leave_days) + "." if leave_days else f"{employee} has no leave days this week."
             else:
-                working_days = [day_map[i] for i, val in enumerate(row) if val == '1']
+                working_days = [day_map[i] for i, works in enumerate(week.flags()) if works]
                 if employee == default_employee:
                     return "You have shifts on: " + ", ".join(working_days) + "." if working_days else "You have no shifts this week."
                 else:
                     return f"{employee} has shifts on: " + ", ".join(working_days) + "." if working_days else f"{employee} has no shifts this week."
 
         elif employee and weekday:
-            cursor.execute(f"""
-                SELECT {weekday}
-                FROM changed_schedule
-                WHERE employee_name = %s
-            """, (employee,))
-            row = cursor.fetchone()
-            conn.close()
-
-            if not row:
-                return f"I couldn't find any schedule for {employee}."
-
-            status = "has a shift" if row[0] == '1' else "does not have a shift"
+            works = week.works(weekday)
+            # e.g. " (07:00-11:00, 16:00-20:00)" for a split shift
+            hours = ""
+            if works and times:
+                hours = " (" + ", ".join(f"{start:%H:%M}-{end:%H:%M}" for _, start, end in times) + ")"
+            status = "has a shift" if works else "does not have a shift"
             if employee == default_employee:
-                status = "You have a shift" if row[0] == '1' else "You don't have a shift"
-                return f"{status} on {weekday.capitalize()}."
+                status = "You have a shift" if works else "You don't have a shift"
+                return f"{status} on {on:%a %b %d}{hours}."
             else:
-                return f"{employee} {status} on {weekday.capitalize()}."
+                return f"{employee} {status} on {on:%a %b %d}{hours}."
 
         return "I couldn't understand the schedule query properly."
 
@@ -287,82 +391,23 @@ def check_schedule_query(user_text, default_employee="Maria Gonzalez"):
 
 
 def process_leave_request(employee_name, leave_day):
-    conn = psycopg2.connect(
-        dbname="postgres",
-        user="postgres",
-        password="sql123",
-        host="localhost",
-        port="5432"
-    )
-    cursor = conn.cursor()
-
-    leave_day = leave_day.strip().lower()
-    cursor.execute(f"""
-        SELECT {leave_day}
-        FROM changed_schedule
-        WHERE employee_name = %s
-    """, (employee_name,))
-    shift_check = cursor.fetchone()
-
-    if not shift_check:
-        conn.close()
-        return f"Error: Employee '{employee_name}' not found in changed_schedule."
-
-    requestor_shift_status = shift_check[0]
-    if requestor_shift_status == '0':
-        conn.close()
-        return f"You don't have a shift on {leave_day.capitalize()}."
-
-    cursor.execute("""
-        SELECT "Role", "Employee_ID"
-        FROM school_employees
-        WHERE "Employee_name" = %s
-    """, (employee_name,))
-    row = cursor.fetchone()
-
-    if not row:
-        conn.close()
-        return f"Error: Employee '{employee_name}' not found in school_employees."
-
-    requestor_role, requestor_id = row
-
-    query_free = f"""
-        SELECT e."Employee_ID", e."Employee_name", e."{requestor_role}" AS skill
-        FROM school_employees e
-        JOIN changed_schedule s ON e."Employee_ID" = CAST(s.employee_id AS VARCHAR)
-        WHERE s.{leave_day} = '0'
-          AND e."Employee_ID" <> %s
     """
-    cursor.execute(query_free, (requestor_id,))
-    free_employees = cursor.fetchall()
-
-    if not free_employees:
-        conn.close()
-        return f"No employees are free on {leave_day.capitalize()} to replace {employee_name}."
-
-    free_employees.sort(key=lambda x: x[2], reverse=True)
-    best_replacement_id, best_replacement_name, _ = free_employees[0]
-
-    update_requestor = f"""
-        UPDATE changed_schedule
-        SET {leave_day} = '0'
-        WHERE employee_name = %s
+    Hand employee_name's shift on leave_day to the best free employee of the
+    same role. leave_day is a date (day_parser) or a weekday name (the
+    request or Gemini), meaning its next date. Rows are locked, so concurrent
+    requests can't pick the same replacement (see shift_assignment.py).
     """
-    cursor.execute(update_requestor, (employee_name,))
-
-    update_replacement = f"""
-        UPDATE changed_schedule
-        SET {leave_day} = '1'
-        WHERE employee_id = %s
-    """
-    cursor.execute(update_replacement, (int(best_replacement_id),))
-
-    conn.commit()
-    cursor.close()
-    conn.close()
+    if isinstance(leave_day, str):
+        leave_day = leave_day.strip().lower()
+    try:
+        result = shift_assignment.leave(employee_name, leave_day)
+    except shift_assignment.AssignmentError as e:
+        return str(e)
+    except shift_assignment.RetriesExhausted:
+        return "The schedule is busy right now, please try again in a moment."
 
-    return (f"{best_replacement_name} will replace you as {requestor_role} "
-            f"on {leave_day.capitalize()}.")
+    return (f"{result['replacement_name']} will replace you as {result['role']} "
+            f"on {result['date']:%a %b %d}.")
 
 
 def process_swap_request(employee_name, from_day, to_day):
@@ -370,140 +415,19 @@ def process_swap_request(employee_name, from_day, to_day):
     Handle a swap request where employee_name wants to move their shift
     from 'from_day' to 'to_day'.
     """
+    try:
+        result = shift_assignment.swap(employee_name, from_day, to_day)
+    except shift_assignment.AssignmentError as e:
+        return str(e)
+    except shift_assignment.RetriesExhausted:
+        return "The schedule is busy right now, please try again in a moment."
 
-    conn = psycopg2.connect(
-        dbname="postgres",
-        user="postgres",
-        password="sql123",
-        host="localhost",
-        port="5432"
-    )
-    cursor = conn.cursor()
-
-    # ------------- STEP 1: Validate the request
-    cursor.execute(f"""
-        SELECT {from_day}, {to_day}
-        FROM changed_schedule
-        WHERE employee_name = %s
-    """, (employee_name,))
-    current_shifts = cursor.fetchone()
-
-    if not current_shifts:
-        conn.close()
-        return f"Error: Employee '{employee_name}' not found in changed_schedule."
-
-    has_shift_from = (current_shifts[0] == '1')
-    has_shift_to = (current_shifts[1] == '1')
-
-    if not has_shift_from:
-        conn.close()
-        return f"You do not have a shift on {from_day.capitalize()} to swap from."
-
-    if has_shift_to:
-        conn.close()
-        return f"You already have a shift on {to_day.capitalize()} — no need to swap."
-
-    # ------------- STEP 2: Find a replacement for FROM day
-    cursor.execute("""
-        SELECT "Role", "Employee_ID"
-        FROM school_employees
-        WHERE "Employee_name" = %s
-    """, (employee_name,))
-    row = cursor.fetchone()
-    if not row:
-        conn.close()
-        return f"Error: Employee '{employee_name}' not found in school_employees."
-    requestor_role, requestor_id = row
-
-    cursor.execute(f'''
-        SELECT e."Employee_ID", e."Employee_name", e."{requestor_role}" AS skill
-        FROM school_employees e
-        JOIN changed_schedule s ON e."Employee_ID" = CAST(s.employee_id AS VARCHAR)
-        WHERE s.{from_day} = '0'
-          AND e."Employee_ID" <> %s
-        ORDER BY skill DESC
-    ''', (requestor_id,))
-    free_candidates = cursor.fetchall()
-    if not free_candidates:
-        conn.close()
-        return f"No one is free on {from_day.capitalize()} to replace you."
-
-    best_replacement_id, best_replacement_name, _ = free_candidates[0]
-
-    # ------------- STEP 3: Find the person to give up TO day
-    cursor.execute(f'''
-        SELECT e."Employee_ID", e."Employee_name", e."{requestor_role}" AS skill
-        FROM school_employees e
-        JOIN changed_schedule s ON e."Employee_ID" = CAST(s.employee_id AS VARCHAR)
-        WHERE s.{to_day} = '1'
-          AND e."Employee_ID" <> %s
-        ORDER BY skill ASC
-    ''', (requestor_id,))
-    to_day_candidates = cursor.fetchall()
-    if not to_day_candidates:
-        conn.close()
-        return (f"No one currently works on {to_day.capitalize()} for your role. "
-                "So there is no shift to 'take over' there.")
-
-    least_skilled_id, least_skilled_name, _ = to_day_candidates[0]
-
-    # ------------- STEP 4: Update the schedule table
-    cursor.execute(f'''
-        UPDATE changed_schedule
-        SET {from_day} = '0'
-        WHERE employee_name = %s
-    ''', (employee_name,))
-
-    cursor.execute(f'''
-        UPDATE changed_schedule
-        SET {from_day} = '1'
-        WHERE employee_id = %s
-    ''', (best_replacement_id,))
-
-    cursor.execute(f'''
-        UPDATE changed_schedule
-        SET {to_day} = '0'
-        WHERE employee_id = %s
-    ''', (least_skilled_id,))
-
-    cursor.execute(f'''
-        UPDATE changed_schedule
-        SET {to_day} = '1'
-        WHERE employee_name = %s
-    ''', (employee_name,))
-
-    conn.commit()
-    cursor.close()
-    conn.close()
-
-    # ------------- STEP 5: Return a friendly confirmation
     return (
-        f"Your shift on {from_day.capitalize()} will be taken by {best_replacement_name}, "
-        f"and you will take {least_skilled_name}'s shift on {to_day.capitalize()}."
+        f"Your shift on {result['from_date']:%a %b %d} will be taken by {result['replacement_name']}, "
+        f"and you will take {result['giver_name']}'s shift on {result['to_date']:%a %b %d}."
     )
 
 
-# ----------------------------------------------------
-# <<< NEW FOR PREFERENCES >>>  (1) Multiple-day parser
-# ----------------------------------------------------
-def parse_multiple_days(user_text):
-    """
-    Look for all days (Monday, Tuesday, etc.) in the user text.
-    Returns a list of short codes, e.g. ['mon','tue','thu'].
-    """
-    day_map = {
-        "monday": "mon", "tuesday": "tue", "wednesday": "wed",
-        "thursday": "thu", "friday": "fri", "saturday": "sat", "sunday": "sun"
-    }
-    user_text = user_text.lower()
-    found_days = []
-    for full_day, short_day in day_map.items():
-        if full_day in user_text:
-            found_days.append(short_day)
-    # remove duplicates if any
-    return list(set(found_days))
-
-
 # ----------------------------------------------------
 # <<< NEW FOR PREFERENCES >>>  (2) Update table
 # ----------------------------------------------------
@@ -512,170 +436,114 @@ def update_preferences(employee_name, days_list):
     Sets all days=0 for that employee in 'preferences' table,
     then sets the specified days=1.
     """
-    conn = psycopg2.connect(
-        dbname="postgres",
-        user="postgres",
-        password="sql123",
-        host="localhost",
-        port="5432"
-    )
-    cursor = conn.cursor()
-
-    # First set all days to 0
-    all_days = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
-    set_zero_clause = ", ".join([f"{d} = 0" for d in all_days])
-    cursor.execute(f"""
-        UPDATE preferences
-        SET {set_zero_clause}
-        WHERE employee_name = %s
-    """, (employee_name,))
-
-    # Now set the user-specified days to 1
-    for d in days_list:
+    with db.cursor() as cursor:
+        # First set all days to 0
+        all_days = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+        set_zero_clause = ", ".join([f"{d} = 0" for d in all_days])
         cursor.execute(f"""
             UPDATE preferences
-            SET {d} = 1
+            SET {set_zero_clause}
             WHERE employee_name = %s
         """, (employee_name,))
 
-    conn.commit()
-    cursor.close()
-    conn.close()
+        # Now set the user-specified days to 1
+        for d in days_list:
+            cursor.execute(f"""
+                UPDATE preferences
+                SET {d} = 1
+                WHERE employee_name = %s
+            """, (employee_name,))
+
     return "Preferences updated successfully."
 
 
 # ---------------------------
 # Flask routes
 # ---------------------------
+# Built once at startup from the (optionally configurable) intent table
+INTENT_ENGINE = intent_engine.load_engine()
+
+
 @app.route('/')
 def home():
     return render_template('chatbot.html')
 
 
-@app.route('/process_leave', methods=['POST'])
-def handle_leave():
-    try:
-        data = request.get_json() or {}
-        user_text = data.get("user_prompt", "")
-        day = data.get("day", "").strip().lower()
-        employee_name = data.get("employee_name", "Maria Gonzalez").strip()
-
-        # Step 1: Attempt day parse
-        if not day:
+def route_message(data):
+    """
+    Handle the deterministic (non-LLM-answer) paths: swap, preference, leave
+    and schedule. Returns the reply text, or None if the message should fall
+    through to the RAG / general Gemini answer.
+    """
+    user_text = data.get("user_prompt", "")
+    day = data.get("day", "").strip().lower()
+    employee_name = data.get("employee_name", "Maria Gonzalez").strip()
+
+    # Step 1: Classify intent in a single pass (ranked, with slots)
+    classification = INTENT_ENGINE.classify(user_text)
+    ranked_intents = [intent["name"] for intent in classification["intents"]]
+    slots = classification["slots"]
+
+    # Step 2: Attempt day parse. The local parser handles weekdays, "tomorrow",
+    # "next Tue", typos... and gives a date; Gemini (a weekday name) is only
+    # asked when the local result is low-confidence and this is a leave
+    # request that actually needs a day. process_leave_request takes either.
+    if not day:
+        if slots["day_confidence"] >= day_parser.CONFIDENCE_THRESHOLD:
+            day = slots["day"]
+        elif ranked_intents[:1] == ["leave"]:
             parsed_day = parse_day_from_gemini(user_text)
             if parsed_day:
                 day = parsed_day
 
-        # Step 2: Check for intent
-        lower_text = user_text.lower()
-
-        leave_keywords = [
-            "need leave", "take leave", "apply leave", "request leave",
-            "off", "day off", "leave on", "i want leave", "can i take leave",
-            "apply for leave", "want a leave", "leave request", "give me leave"
-        ]
-        schedule_keywords = [
-            "schedule", "shift", "working days", "work on", "do i work",
-            "which days", "what days", "do i have shift", "when do i work",
-            "do i have a shift", "am i working", "working on", "work friday", "shift friday"
-        ]
-        swap_keywords = [
-            "swap shift", "shift swap", "exchange shift", "switch shift", "swap from"
-        ]
-
-        # <<< NEW FOR PREFERENCES >>> Add some preference-related triggers
-        preference_keywords = [
-            "my preferences", "preference", "my availability", "i want to come",
-            "prefer to work on", "i want to work on", "like to work on"
-        ]
-
-        is_leave_request = any(kw in lower_text for kw in leave_keywords)
-        is_schedule_query = any(kw in lower_text for kw in schedule_keywords)
-        is_swap_request = any(kw in lower_text for kw in swap_keywords)
-        # <<< NEW FOR PREFERENCES >>>
-        is_preference_request = any(kw in lower_text for kw in preference_keywords)
-
-        # Step 3: Route based on intent
-
-        if is_swap_request:
-            # Attempt to parse "swap from X to Y" from text
-            match = re.search(r"swap\s+from\s+(\w+)\s+to\s+(\w+)", lower_text)
-            if match:
-                from_text = match.group(1)
-                to_text = match.group(2)
-                day_map = {
-                    "monday": "mon","tuesday": "tue","wednesday": "wed",
-                    "thursday": "thu","friday": "fri","saturday": "sat","sunday": "sun"
-                }
-                from_day = day_map.get(from_text.lower())
-                to_day = day_map.get(to_text.lower())
-                if from_day and to_day:
-                    result = process_swap_request(employee_name, from_day, to_day)
-                    return jsonify({"response": result})
-                else:
-                    return jsonify({
-                        "response": "I couldn't parse your swap request. "
-                                    "Please specify 'swap from [day] to [day]'."
-                    })
-            else:
-                return jsonify({
-                    "response": "I couldn't parse your swap request. "
-                                "Please specify 'swap from [day] to [day]'."
-                })
-
-        # 👉 Handle preferences next — BEFORE schedule check
-        elif is_preference_request:
-            pref_days = parse_multiple_days(user_text)
+    # Step 3: Route to the best-ranked intent whose slots are satisfied
+    for intent in ranked_intents:
+        if intent == "swap":
+            from_day = slots.get("swap_from")
+            to_day = slots.get("swap_to")
+            if from_day and to_day:
+                return process_swap_request(employee_name, from_day, to_day)
+            return ("I couldn't parse your swap request. "
+                    "Please specify 'swap from [day] to [day]'.")
+
+        if intent == "preference":
+            pref_days = slots["days"]
             if not pref_days:
-                return jsonify({
-                    "response": "I didn't see any days in your preference request. Please say which days you'd like to work."
-                })
+                return "I didn't see any days in your preference request. Please say which days you'd like to work."
             update_msg = update_preferences(employee_name, pref_days)
             day_map_rev = {
                 "mon": "Monday", "tue": "Tuesday", "wed": "Wednesday",
                 "thu": "Thursday", "fri": "Friday", "sat": "Saturday", "sun": "Sunday"
             }
             chosen_days = [day_map_rev[d] for d in pref_days]
-            return jsonify({
-                "response": f"{update_msg} You prefer to work on: {', '.join(chosen_days)}."
-            })
+            return f"{update_msg} You prefer to work on: {', '.join(chosen_days)}."
 
-        elif day and is_leave_request:
+        if intent == "leave" and day:
             # If the user wants leave
-            result = process_leave_request(employee_name, day)
-            return jsonify({"response": result})
+            return process_leave_request(employee_name, day)
 
-        elif is_schedule_query or day:
-            # If the user is checking schedule or mentioned a day (but not a swap)
-            schedule_response = check_schedule_query(user_text, default_employee=employee_name)
-            return jsonify({"response": schedule_response})
+        if intent == "schedule":
+            return check_schedule_query(user_text, default_employee=employee_name)
 
-        # <<< NEW FOR PREFERENCES >>>
-        elif is_preference_request:
-            # Parse multiple days
-            pref_days = parse_multiple_days(user_text)
-            if not pref_days:
-                return jsonify({
-                    "response": (
-                        "I didn't see any days in your preference request. "
-                        "Please say which days you'd like to work."
-                    )
-                })
-            # Update the preferences table
-            update_msg = update_preferences(employee_name, pref_days)
-            # Build a nice response listing chosen days
-            day_map_rev = {
-                "mon": "Monday","tue": "Tuesday","wed": "Wednesday","thu": "Thursday",
-                "fri": "Friday","sat": "Saturday","sun": "Sunday"
-            }
-            chosen_days = [day_map_rev[d] for d in pref_days]
-            return jsonify({
-                "response": f"{update_msg} You prefer to work on: {', '.join(chosen_days)}."
-            })
+    if day:
+        # Mentioned a day without any other intent: treat it as a schedule check
+        return check_schedule_query(user_text, default_employee=employee_name)
+
+    return None
+
+
+@app.route('/process_leave', methods=['POST'])
+def handle_leave():
+    try:
+        data = request.get_json() or {}
+        result = route_message(data)
+        if result is not None:
+            return jsonify({"response": result})
 
         # -------------------------
         # RAG FALLBACK STEP
         # -------------------------
+        user_text = data.get("user_prompt", "")
         rag_answer = rag_qa(user_text)
         if rag_answer:
             return jsonify({"response": rag_answer})
@@ -690,6 +558,65 @@ def handle_leave():
         return jsonify({"response": f"Internal server error: {str(e)}"}), 500
 
 
+def sse_event(payload, event=None):
+    """Format one Server-Sent Event."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(payload)}\n\n"
+
+
+@app.route('/process_leave_stream', methods=['POST'])
+def handle_leave_stream():
+    """
+    Server-Sent Events variant of /process_leave.
+
+    Deterministic paths (leave/swap/schedule/preferences) send a single
+        data: {"response": "..."}
+    event. RAG and general answers are forwarded chunk by chunk as
+        data: {"delta": "..."}
+    events as soon as Gemini produces them. Every stream ends with
+        event: done
+    """
+    data = request.get_json() or {}
+
+    def generate():
+        try:
+            result = route_message(data)
+            if result is not None:
+                yield sse_event({"response": result})
+            else:
+                user_text = data.get("user_prompt", "")
+                answered = False
+                for piece in rag_qa_stream(user_text):
+                    answered = True
+                    yield sse_event({"delta": piece})
+                if not answered:
+                    for piece in get_general_response_stream(user_text):
+                        yield sse_event({"delta": piece})
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            yield sse_event({"response": f"Internal server error: {str(e)}"}, event="error")
+        yield sse_event({}, event="done")
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.route('/cache_stats', methods=['GET'])
+def cache_stats():
+    """Hit/miss counters for the Gemini response cache."""
+    return jsonify(RESPONSE_CACHE.stats())
+
+
+@app.route('/llm_stats', methods=['GET'])
+def llm_stats():
+    """Upstream call / coalescing counters from the LLM gateway."""
+    return jsonify(llm_gateway.stats())
+
+
 # ---------------------------
 # Run on port 5003
 # ---------------------------
@@ -0,0 +1,146 @@
+"""
+Local, rule-based weekday parser used as the fast path before Gemini.
+
+parse_day("can I take leave on tue") -> (date(2026, 10, 20), 1.0)
+
+Handles full weekday names, common abbreviations, relative words ("today",
+"tomorrow", "day after tomorrow", "yesterday", "next Fri", "this Sat") and
+small typos ("wensday", "fridy"). Every result carries a confidence in
+[0, 1]; callers only fall back to the LLM when it is below
+CONFIDENCE_THRESHOLD.
+
+The day is always resolved to a calendar date: a weekday is its next
+occurrence, today included ("this Sat" too), "next Fri" skips today, and
+past references stay in the past for shift_assignment to reject.
+"""
+import datetime
+import difflib
+import re
+
+DAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+FULL_NAMES = {
+    "monday": "mon", "tuesday": "tue", "wednesday": "wed",
+    "thursday": "thu", "friday": "fri", "saturday": "sat", "sunday": "sun"
+}
+
+ABBREVIATIONS = {
+    "mon": "mon",
+    "tue": "tue", "tues": "tue",
+    "wed": "wed", "weds": "wed",
+    "thu": "thu", "thur": "thu", "thurs": "thu",
+    "fri": "fri",
+    "sat": "sat",
+    "sun": "sun",
+}
+
+# Abbreviations that are also ordinary English words/fragments ("I sat down")
+AMBIGUOUS_ABBREVIATIONS = {"mon", "sat", "sun", "wed"}
+
+# Words right before a day that make it clearly a date reference
+DAY_CONTEXT_WORDS = {"on", "next", "this", "coming", "every", "until", "till", "from", "to", "for", "by"}
+
+# Only these mark a near-miss spelling as a day ("on wensday"); "for",
+# "to", "by"... come before ordinary words too ("for money")
+TYPO_CONTEXT_WORDS = {"on", "next", "this", "coming"}
+# A typo is trusted only this close to a day name (difflib ratio)
+TYPO_MIN_RATIO = 0.85
+
+CONFIDENCE_THRESHOLD = 0.7
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def parse_day(text, today=None):
+    """
+    Return (date, confidence) for the day referred to in `text`, e.g.
+    (date(2026, 10, 23), 1.0) for "friday", or (None, 0.0) if nothing
+    day-like was found.
+
+    `today` (a date) anchors relative words; defaults to the current date.
+    """
+    today = today or datetime.date.today()
+    tokens = TOKEN_RE.findall(text.lower())
+    if not tokens:
+        return None, 0.0
+
+    joined = " ".join(tokens)
+    if "day after tomorrow" in joined:
+        return _shift(today, 2), 0.95
+    if "day before yesterday" in joined:
+        return _shift(today, -2), 0.9
+
+    found = []  # (date, confidence) in order of appearance
+    for i, token in enumerate(tokens):
+        prev = tokens[i - 1] if i else ""
+        match = _match_token(token, prev, today)
+        if match:
+            found.append(match)
+
+    if not found:
+        return None, 0.0
+
+    best_day, best_conf = max(found, key=lambda item: item[1])
+    distinct = {day for day, conf in found if conf >= CONFIDENCE_THRESHOLD}
+    if len(distinct) > 1:
+        # "leave on monday instead of friday": several days, can't tell which one is meant
+        return found[0][0], min(best_conf, 0.5)
+    return best_day, best_conf
+
+
+def _match_token(token, prev, today):
+    if token in ("today", "tonight"):
+        return _shift(today, 0), 1.0
+    if token in ("tomorrow", "tmrw", "tmr", "tomorow", "tommorow", "tommorrow"):
+        return _shift(today, 1), 0.95
+    if token == "yesterday":
+        return _shift(today, -1), 0.9
+
+    match = _match_weekday(token, prev)
+    if not match:
+        return None
+    code, confidence = match
+    return _upcoming(today, code, skip_today=(prev == "next")), confidence
+
+
+def _match_weekday(token, prev):
+    """(day code, confidence) if `token` names a weekday, else None."""
+    if token in FULL_NAMES:
+        return FULL_NAMES[token], 1.0
+
+    # Plural / possessive forms ("mondays", "fridays")
+    if token.endswith("s") and token[:-1] in FULL_NAMES:
+        return FULL_NAMES[token[:-1]], 0.95
+
+    if token in ABBREVIATIONS:
+        if prev in DAY_CONTEXT_WORDS:
+            return ABBREVIATIONS[token], 0.95
+        if token in AMBIGUOUS_ABBREVIATIONS:
+            return ABBREVIATIONS[token], 0.6
+        return ABBREVIATIONS[token], 0.9
+
+    # Typos: only worth checking for tokens long enough to look like a day name
+    if len(token) >= 5:
+        close = difflib.get_close_matches(token, FULL_NAMES.keys(), n=1, cutoff=0.7)
+        if close:
+            ratio = difflib.SequenceMatcher(None, token, close[0]).ratio()
+            if prev in TYPO_CONTEXT_WORDS and ratio >= TYPO_MIN_RATIO:
+                confidence = min(ratio, 0.9)
+            else:
+                # Otherwise a near-miss may be any word ("i want a sundae",
+                # "leave for money reasons"): leave it to the LLM
+                confidence = min(ratio - 0.1, CONFIDENCE_THRESHOLD - 0.1)
+            return FULL_NAMES[close[0]], round(confidence, 2)
+    return None
+
+
+def _shift(today, offset):
+    return today + datetime.timedelta(days=offset)
+
+
+def _upcoming(today, code, skip_today=False):
+    """Next date that is weekday `code`: today counts unless skip_today ("next fri" on a Friday)."""
+    offset = (DAYS.index(code) - today.weekday()) % 7
+    if offset == 0 and skip_today:
+        offset = 7
+    return _shift(today, offset)
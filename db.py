@@ -0,0 +1,308 @@
+"""
+Shared Postgres access layer for the chatbot, the employer portal and the optimizer.
+
+Opening a new psycopg2 connection per request costs a TCP + auth handshake that is
+usually slower than the queries themselves, so every module borrows connections
+from one bounded, thread-safe pool instead:
+
+    import db
+
+    with db.cursor() as cur:
+        cur.execute("SELECT ...")
+        rows = cur.fetchall()
+
+The block commits when it exits normally, rolls back when it raises, and always
+hands the connection back to the pool.
+
+Settings come from environment variables (defaults match the original hard-coded
+values):
+    DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT
+    DB_POOL_MIN               connections opened up front (default 1)
+    DB_POOL_MAX               hard upper bound on open connections (default 10)
+    DB_POOL_TIMEOUT           seconds to wait for a free connection (default 30)
+    DB_HEALTH_CHECK_INTERVAL  idle seconds after which a connection is pinged
+                              with SELECT 1 before reuse (default 30)
+"""
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions
+
+DB_CONFIG = {
+    "dbname": os.environ.get("DB_NAME", "postgres"),
+    "user": os.environ.get("DB_USER", "postgres"),
+    "password": os.environ.get("DB_PASSWORD", "sql123"),
+    "host": os.environ.get("DB_HOST", "localhost"),
+    "port": os.environ.get("DB_PORT", "5432"),
+}
+
+POOL_MIN_SIZE = int(os.environ.get("DB_POOL_MIN", "1"))
+POOL_MAX_SIZE = int(os.environ.get("DB_POOL_MAX", "10"))
+POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+HEALTH_CHECK_INTERVAL = float(os.environ.get("DB_HEALTH_CHECK_INTERVAL", "30"))
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes free within the timeout."""
+
+
+class PoolClosed(Exception):
+    """Raised when a connection is requested from a pool that was shut down."""
+
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of psycopg2 connections.
+
+    Up to `maxconn` connections are open at once; callers beyond that wait (up to
+    `timeout` seconds) for one to be returned instead of failing. Idle connections
+    are kept open and reused most-recently-used first, and any connection that sat
+    idle for longer than `health_check_interval` is pinged before it is handed out
+    so a database restart doesn't surface as a random query failure.
+    """
+
+    def __init__(self, minconn=POOL_MIN_SIZE, maxconn=POOL_MAX_SIZE,
+                 timeout=POOL_TIMEOUT, health_check_interval=HEALTH_CHECK_INTERVAL,
+                 **conn_kwargs):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("Pool sizes must satisfy 0 <= min <= max and max >= 1.")
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.closed = False
+        self._conn_kwargs = conn_kwargs
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._idle = deque()  # (conn, time.monotonic() when it was returned)
+        for _ in range(minconn):
+            self._idle.append((self._connect(), time.monotonic()))
+
+    def getconn(self):
+        if self.closed:
+            raise PoolClosed("Connection pool is closed.")
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(
+                f"No database connection free after {self.timeout}s "
+                f"(pool size {self.maxconn})."
+            )
+        try:
+            while True:
+                with self._lock:
+                    item = self._idle.pop() if self._idle else None
+                if item is None:
+                    return self._connect()
+                conn, last_used = item
+                if self._is_healthy(conn, last_used):
+                    return conn
+                conn.close()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn):
+        try:
+            if conn.closed or self._needs_discard(conn):
+                conn.close()
+                return
+            with self._lock:
+                if not self.closed:
+                    self._idle.append((conn, time.monotonic()))
+                    return
+            conn.close()
+        finally:
+            self._slots.release()
+
+    def closeall(self):
+        with self._lock:
+            self.closed = True
+            idle, self._idle = self._idle, deque()
+        for conn, _ in idle:
+            conn.close()
+
+    def _connect(self):
+        return psycopg2.connect(**self._conn_kwargs)
+
+    def _needs_discard(self, conn):
+        # Never hand a connection with an open or failed transaction to the next caller.
+        status = conn.info.transaction_status
+        if status == extensions.TRANSACTION_STATUS_IDLE:
+            return False
+        if status in (extensions.TRANSACTION_STATUS_INTRANS,
+                      extensions.TRANSACTION_STATUS_INERROR):
+            try:
+                conn.rollback()
+                return False
+            except psycopg2.Error:
+                return True
+        return True
+
+    def _is_healthy(self, conn, last_used):
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(**DB_CONFIG)
+    return _pool
+
+
+def close_pool():
+    """Close every pooled connection (e.g. on shutdown or in a forked worker)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+
+@contextmanager
+def connection():
+    """
+    Borrow a pooled connection for one unit of work.
+    Commits on success, rolls back on error, always returns the connection.
+    """
+    db_pool = get_pool()
+    conn = db_pool.getconn()
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        if not conn.closed:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                pass  # connection is dead; putconn() discards it
+        raise
+    finally:
+        db_pool.putconn(conn)
+
+
+@contextmanager
+def cursor():
+    """Shortcut for `with connection() as conn: with conn.cursor() as cur:`."""
+    with connection() as conn:
+        with conn.cursor() as cur:
+            yield cur
+
+
+@contextmanager
+def server_cursor(itersize=500):
+    """
+    Named (server-side) cursor: rows stay on the server and are fetched in
+    batches of `itersize`, so large listings never sit in memory at once.
+    """
+    with connection() as conn:
+        with conn.cursor(name=f"srv_{uuid.uuid4().hex}") as cur:
+            cur.itersize = itersize
+            yield cur
+
+
+# ---------------------------
+# Cross-process change notifications
+# ---------------------------
+# Writers call notify() inside their transaction; Postgres delivers the
+# message to every LISTENing process when (and only if) the transaction
+# commits. In-process caches use a Listener to learn that another process
+# (the chatbot, the employer portal, the optimizer) changed the data.
+
+SCHEDULE_CHANNEL = "schedule_changed"
+# school_employees was recreated with different role columns
+SCHEMA_CHANNEL = "schema_changed"
+# The chatbot's reference document was replaced (see rag_index.py)
+DOCUMENT_CHANNEL = "document_changed"
+
+# Identifies this process in notification payloads so it can skip its own
+PROCESS_TOKEN = uuid.uuid4().hex
+
+# Seconds before retrying a failed LISTEN connection; doubles up to the max
+LISTEN_RETRY_MIN = float(os.environ.get("DB_LISTEN_RETRY_MIN", "1"))
+LISTEN_RETRY_MAX = float(os.environ.get("DB_LISTEN_RETRY_MAX", "60"))
+
+
+def notify(cur, channel=SCHEDULE_CHANNEL):
+    """Queue a notification on `channel`, sent when cur's transaction commits."""
+    cur.execute("SELECT pg_notify(%s, %s)", (channel, PROCESS_TOKEN))
+
+
+class Listener:
+    """
+    Dedicated (non-pooled) LISTEN connection. changed() is cheap: it only reads
+    notifications already buffered on the socket, no round trip to the server.
+    """
+
+    def __init__(self, channel=SCHEDULE_CHANNEL):
+        self.channel = channel
+        self._conn = None
+        self._lock = threading.Lock()
+        self._retry_at = 0.0
+        self._retry_delay = LISTEN_RETRY_MIN
+
+    def _connect(self):
+        conn = psycopg2.connect(**DB_CONFIG)
+        try:
+            conn.set_isolation_level(extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {self.channel}")
+        except psycopg2.Error:
+            conn.close()
+            raise
+        return conn
+
+    def changed(self):
+        """
+        True if another process sent a notification since the last call.
+        Also True when the listen connection was (re)opened, because
+        notifications may have been missed while it was down.
+
+        While the database is unreachable it returns False, so callers keep
+        what they have cached, and reconnects are attempted with backoff
+        rather than on every call.
+        """
+        with self._lock:
+            if self._conn is not None and not self._conn.closed:
+                try:
+                    self._conn.poll()
+                except psycopg2.Error:
+                    self._conn.close()
+                else:
+                    notes = list(self._conn.notifies)
+                    del self._conn.notifies[:]
+                    return any(note.payload != PROCESS_TOKEN for note in notes)
+            return self._reconnect()
+
+    def _reconnect(self):
+        """Reopen the connection unless backing off; True if it is open again."""
+        if time.monotonic() < self._retry_at:
+            return False
+        try:
+            self._conn = self._connect()
+        except psycopg2.Error:
+            self._conn = None
+            self._retry_at = time.monotonic() + self._retry_delay
+            self._retry_delay = min(self._retry_delay * 2, LISTEN_RETRY_MAX)
+            return False
+        self._retry_delay = LISTEN_RETRY_MIN
+        return True
@@ -0,0 +1,171 @@
+"""
+Compiled single-pass intent classifier for the chatbot.
+
+All trigger phrases from the intent table are compiled once (at startup) into
+one alternation regex, longest phrases first, so a message is classified with a
+single scan instead of one substring loop per keyword list:
+
+    engine = load_engine()
+    result = engine.classify("can I swap from monday to friday")
+    result["intents"]  -> [{"name": "swap", "score": 2.0, "priority": 40, "matched": ["swap from"]}, ...]
+    result["slots"]    -> {"day": date(2026, 10, 19), "day_confidence": 0.5, "days": ["mon", "fri"],
+                           "swap_from": date(2026, 10, 19), "swap_to": "fri"}
+
+"day" and "swap_from" are dates (see day_parser); "swap_to" is a weekday
+of swap_from's week, which is how shift_assignment.swap reads it.
+
+The table can be replaced without code changes by pointing INTENT_TABLE_PATH at
+a JSON file with the same shape as DEFAULT_INTENT_TABLE.
+"""
+import json
+import os
+import re
+
+import day_parser
+
+# Intents are ranked by score (keyword weight x words matched, summed); the
+# higher priority only breaks ties (same order handle_leave has always used:
+# swap > preference > leave > schedule).
+DEFAULT_INTENT_TABLE = [
+    {
+        "name": "swap",
+        "priority": 40,
+        "keywords": [
+            "swap shift", "shift swap", "exchange shift", "switch shift", "swap from"
+        ],
+    },
+    {
+        "name": "preference",
+        "priority": 30,
+        "keywords": [
+            "my preferences", "preference", "my availability", "i want to come",
+            "prefer to work on", "i want to work on", "like to work on"
+        ],
+    },
+    {
+        "name": "leave",
+        "priority": 20,
+        "keywords": [
+            "need leave", "take leave", "apply leave", "request leave",
+            "off", "day off", "leave on", "i want leave", "can i take leave",
+            "apply for leave", "want a leave", "leave request", "give me leave"
+        ],
+    },
+    {
+        "name": "schedule",
+        "priority": 10,
+        "keywords": [
+            "schedule", "shift", "working days", "work on", "do i work",
+            "which days", "what days", "do i have shift", "when do i work",
+            "do i have a shift", "am i working", "working on", "work friday", "shift friday"
+        ],
+    },
+]
+
+SWAP_RE = re.compile(r"swap\s+from\s+(\w+)\s+to\s+(\w+)")
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def _keyword_pattern(keyword):
+    words = keyword.lower().split()
+    body = r"\s+".join(re.escape(word) for word in words)
+    # Longer last words may inflect ("shifts", "scheduled", "preferences");
+    # short ones must match exactly so "off" doesn't fire on "office".
+    suffix = r"\w*" if len(words[-1]) >= 5 else r"s?"
+    return rf"\b{body}{suffix}\b"
+
+
+class IntentEngine:
+    """Classifies a message against a compiled intent table in one regex pass."""
+
+    def __init__(self, table):
+        self.table = {}
+        self.keyword_intents = {}  # normalized keyword -> [(intent name, weight)]
+        for entry in table:
+            name = entry["name"]
+            self.table[name] = {
+                "priority": entry.get("priority", 0),
+                "weight": entry.get("weight", 1.0),
+            }
+            for keyword in entry.get("keywords", []):
+                key = " ".join(keyword.lower().split())
+                self.keyword_intents.setdefault(key, []).append((name, entry.get("weight", 1.0)))
+
+        # Longest first so "do i have a shift" wins over "shift" at the same position
+        keywords = sorted(self.keyword_intents, key=len, reverse=True)
+        self._keywords = keywords
+        self._regex = re.compile(
+            "|".join(f"(?P<k{i}>{_keyword_pattern(kw)})" for i, kw in enumerate(keywords))
+        ) if keywords else None
+
+    def classify(self, text):
+        """Return {"intents": [...ranked best first...], "slots": {...}} for `text`."""
+        lower_text = text.lower()
+
+        scores = {}
+        matched = {}
+        if self._regex is not None:
+            for match in self._regex.finditer(lower_text):
+                keyword = self._keywords[int(match.lastgroup[1:])]
+                # Multi-word phrases are stronger evidence than single words
+                strength = len(keyword.split())
+                for name, weight in self.keyword_intents[keyword]:
+                    scores[name] = scores.get(name, 0.0) + weight * strength
+                    matched.setdefault(name, []).append(keyword)
+
+        intents = [
+            {
+                "name": name,
+                "score": score,
+                "priority": self.table[name]["priority"],
+                "matched": matched[name],
+            }
+            for name, score in scores.items()
+        ]
+        # Score wins; priority only orders intents with equal scores
+        intents.sort(key=lambda item: (item["score"], item["priority"]), reverse=True)
+        return {"intents": intents, "slots": extract_slots(lower_text)}
+
+
+def extract_slots(lower_text):
+    """Day, all mentioned days and swap from/to days, all resolved locally."""
+    day, confidence = day_parser.parse_day(lower_text)
+    slots = {
+        "day": day,
+        "day_confidence": confidence,
+        "days": _all_full_days(lower_text),
+    }
+    swap = SWAP_RE.search(lower_text)
+    if swap:
+        slots["swap_from"] = _single_day(swap.group(1))
+        to_day = _single_day(swap.group(2))
+        slots["swap_to"] = day_parser.DAYS[to_day.weekday()] if to_day else None
+    return slots
+
+
+def _all_full_days(lower_text):
+    found = []
+    for word in WORD_RE.findall(lower_text):
+        code = day_parser.FULL_NAMES.get(word) or day_parser.FULL_NAMES.get(word[:-1])
+        if code and code not in found:
+            found.append(code)
+    return found
+
+
+def _single_day(word):
+    # "swap from sat to sun": the position already marks these words as days
+    day, confidence = day_parser.parse_day(f"on {word}")
+    return day if confidence >= day_parser.CONFIDENCE_THRESHOLD else None
+
+
+def load_intent_table(path=None):
+    """Intent table from a JSON file (INTENT_TABLE_PATH), or the built-in default."""
+    path = path or os.environ.get("INTENT_TABLE_PATH")
+    if not path:
+        return DEFAULT_INTENT_TABLE
+    with open(path, encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def load_engine(path=None):
+    return IntentEngine(load_intent_table(path))
@@ -0,0 +1,168 @@
+"""
+Process-wide gateway for every Gemini call the chatbot makes.
+
+- genai.Client objects are created once per API key and reused.
+- Identical prompts that are already in flight are coalesced ("singleflight"):
+  during a shift-change rush twenty employees asking the same thing cost one
+  upstream call, and the other nineteen get the same answer when it lands.
+- At most LLM_MAX_CONCURRENCY upstream calls run at once; extra callers wait up
+  to LLM_QUEUE_TIMEOUT seconds for a slot instead of piling onto the API quota.
+
+    text = llm_gateway.generate(api_key, "gemini-2.0-flash", prompt)
+    for piece in llm_gateway.stream(api_key, "gemini-2.0-flash", prompt):
+        ...
+"""
+import os
+import threading
+
+from google import genai
+from google.genai import types
+
+MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "8"))
+QUEUE_TIMEOUT = float(os.environ.get("LLM_QUEUE_TIMEOUT", "30"))
+WAIT_TIMEOUT = float(os.environ.get("LLM_WAIT_TIMEOUT", "120"))
+
+
+class LLMGatewayError(Exception):
+    """Raised when an upstream slot or a coalesced result isn't available in time."""
+
+
+class _AbandonedCall(LLMGatewayError):
+    """The leader of a coalesced call stopped before finishing (e.g. client disconnect)."""
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+_inflight = {}  # (model, prompt) -> _InFlight
+_inflight_lock = threading.Lock()
+
+_slots = threading.BoundedSemaphore(MAX_CONCURRENCY)
+
+_stats = {"upstream_calls": 0, "coalesced": 0, "errors": 0}
+_stats_lock = threading.Lock()
+
+
+def get_client(api_key):
+    """Return the shared genai.Client for api_key, creating it on first use."""
+    client = _clients.get(api_key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(api_key)
+            if client is None:
+                client = genai.Client(api_key=api_key)
+                _clients[api_key] = client
+    return client
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def stats():
+    with _stats_lock:
+        snapshot = dict(_stats)
+    with _inflight_lock:
+        snapshot["in_flight"] = len(_inflight)
+    snapshot["max_concurrency"] = MAX_CONCURRENCY
+    return snapshot
+
+
+def _upstream_stream(api_key, model, prompt):
+    """One real streaming call, holding a concurrency slot for its whole duration."""
+    if not _slots.acquire(timeout=QUEUE_TIMEOUT):
+        raise LLMGatewayError(f"No LLM slot free after {QUEUE_TIMEOUT}s "
+                              f"(limit {MAX_CONCURRENCY}).")
+    try:
+        _count("upstream_calls")
+        contents = [
+            types.Content(
+                role="user",
+                parts=[types.Part.from_text(text=prompt)]
+            )
+        ]
+        for chunk in get_client(api_key).models.generate_content_stream(
+            model=model,
+            contents=contents,
+            config=types.GenerateContentConfig(response_mime_type="text/plain")
+        ):
+            if chunk.text:
+                yield chunk.text
+    finally:
+        _slots.release()
+
+
+def _join(key):
+    """Return (call, is_leader): the in-flight call for key, or a new one we lead."""
+    with _inflight_lock:
+        call = _inflight.get(key)
+        if call is not None:
+            return call, False
+        call = _InFlight()
+        _inflight[key] = call
+        return call, True
+
+
+def _finish(key, call, result=None, error=None):
+    call.result = result
+    call.error = error
+    with _inflight_lock:
+        if _inflight.get(key) is call:
+            del _inflight[key]
+    call.done.set()
+
+
+def _wait(call):
+    if not call.done.wait(WAIT_TIMEOUT):
+        raise LLMGatewayError(f"Coalesced LLM call did not finish within {WAIT_TIMEOUT}s.")
+    if call.error is not None:
+        raise call.error
+    return call.result
+
+
+def stream(api_key, model, prompt):
+    """
+    Yield response text as it arrives. If the same (model, prompt) is already
+    being generated, wait for that call and yield its full result instead.
+    """
+    key = (model, prompt)
+    while True:
+        call, is_leader = _join(key)
+        if is_leader:
+            break
+        _count("coalesced")
+        try:
+            yield _wait(call)
+            return
+        except _AbandonedCall:
+            continue  # the leader went away mid-stream; take over the call ourselves
+
+    parts = []
+    finished = False
+    try:
+        for piece in _upstream_stream(api_key, model, prompt):
+            parts.append(piece)
+            yield piece
+        finished = True
+        _finish(key, call, result="".join(parts))
+    except Exception as e:
+        finished = True
+        _count("errors")
+        _finish(key, call, error=e)
+        raise
+    finally:
+        if not finished:
+            _finish(key, call, error=_AbandonedCall("Coalesced LLM call was abandoned."))
+
+
+def generate(api_key, model, prompt):
+    """Return the full response text (coalesced with identical in-flight prompts)."""
+    return "".join(stream(api_key, model, prompt))
@@ -0,0 +1,342 @@
+"""
+Chunked BM25 retrieval index for the chatbot's RAG fallback.
+
+Instead of pasting the whole handbook into every Gemini prompt, the document is
+split into overlapping chunks once, indexed with BM25 and saved next to the
+document as "<doc>.index.json". rag_qa() then only sends the top-k chunks for
+the user's question, so prompt size (and latency/cost) stays flat as the
+document grows.
+
+Loaded indexes are also kept in memory, keyed on the document's path plus its
+mtime/size (and a content hash for the saved copy), so repeat questions only cost
+an os.stat() and never re-open the PDF.
+
+The document lives at DOC_PATH (env RAG_DOC_PATH), shared by the chatbot,
+which reads it, and the employer portal, which replaces it on upload. The
+portal runs in another process, so after saving a new file it calls
+invalidate_document() (dropping the saved index) and announce_document(),
+a notification on db.DOCUMENT_CHANNEL. The chatbot's next get_index() /
+document_version() sees it, drops its in-memory indexes and reports a new
+version, which also clears its cached answers.
+While Postgres is down the caches are kept (see db.Listener.changed); the
+listen connection is retried with backoff.
+
+Ingestion can also be run by hand after replacing the document:
+    python rag_index.py path/to/document.pdf
+"""
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+import db
+
+DOC_PATH = os.environ.get("RAG_DOC_PATH", "C:/Users/sivad/Documents/Chatbot/paradise.pdf")
+
+INDEX_FORMAT_VERSION = 2
+
+CHUNK_SIZE = 800      # characters per chunk (soft limit, split on paragraph/sentence)
+CHUNK_OVERLAP = 150   # characters carried over from the previous chunk
+TOP_K = int(os.environ.get("RAG_TOP_K", "4"))
+
+# BM25 tuning constants (standard defaults)
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for",
+    "from", "how", "i", "in", "is", "it", "me", "my", "of", "on", "or", "the",
+    "to", "we", "what", "when", "where", "which", "who", "why", "will", "with",
+    "you", "your",
+}
+
+
+def tokenize(text):
+    """Lower-case word tokens with stopwords removed."""
+    return [tok for tok in TOKEN_RE.findall(text.lower()) if tok not in STOPWORDS]
+
+
+def chunk_text(text, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    """
+    Split text into ~chunk_size character chunks, breaking on paragraph or
+    sentence boundaries where possible, with `overlap` characters of context
+    repeated at the start of each following chunk.
+    """
+    pieces = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        if len(paragraph) <= chunk_size:
+            pieces.append(paragraph)
+            continue
+        # Long paragraph: fall back to sentences, then hard splits
+        for sentence in re.split(r"(?<=[.!?])\s+", paragraph):
+            while len(sentence) > chunk_size:
+                pieces.append(sentence[:chunk_size])
+                sentence = sentence[chunk_size:]
+            if sentence:
+                pieces.append(sentence)
+
+    chunks = []
+    current = []
+    current_len = 0
+    for piece in pieces:
+        if current and current_len + len(piece) + 1 > chunk_size:
+            chunk = " ".join(current)
+            chunks.append(chunk)
+            tail = chunk[-overlap:] if overlap else ""
+            current = [tail] if tail else []
+            current_len = len(tail)
+        current.append(piece)
+        current_len += len(piece) + 1
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+class BM25Index:
+    """
+    Inverted-index BM25 over a list of text chunks.
+    A search only walks the postings of the query's own terms.
+    """
+
+    def __init__(self, chunks, postings, doc_lengths, source=None):
+        self.chunks = chunks
+        self.postings = postings          # term -> [[chunk_idx, term_freq], ...]
+        self.doc_lengths = doc_lengths
+        self.source = source or {}
+        self.avg_length = (sum(doc_lengths) / len(doc_lengths)) if doc_lengths else 0.0
+
+    @classmethod
+    def build(cls, chunks, source=None):
+        postings = {}
+        doc_lengths = []
+        for idx, chunk in enumerate(chunks):
+            tokens = tokenize(chunk)
+            doc_lengths.append(len(tokens))
+            for term, freq in Counter(tokens).items():
+                postings.setdefault(term, []).append([idx, freq])
+        return cls(chunks, postings, doc_lengths, source)
+
+    def search(self, query, k=TOP_K):
+        """Return up to k (score, chunk_text) pairs, best first. Zero-score chunks are dropped."""
+        n_docs = len(self.chunks)
+        if not n_docs:
+            return []
+
+        scores = {}
+        for term in set(tokenize(query)):
+            plist = self.postings.get(term)
+            if not plist:
+                continue
+            idf = math.log(1 + (n_docs - len(plist) + 0.5) / (len(plist) + 0.5))
+            for idx, freq in plist:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[idx] / self.avg_length)
+                scores[idx] = scores.get(idx, 0.0) + idf * freq * (BM25_K1 + 1) / (freq + norm)
+
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        # Keep the chosen chunks in document order so the prompt reads naturally
+        best.sort(key=lambda item: item[0])
+        return [(score, self.chunks[idx]) for idx, score in best]
+
+    def to_dict(self):
+        return {
+            "version": INDEX_FORMAT_VERSION,
+            "source": self.source,
+            "chunks": self.chunks,
+            "postings": self.postings,
+            "doc_lengths": self.doc_lengths,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["chunks"], data["postings"], data["doc_lengths"], data.get("source"))
+
+
+def index_path_for(doc_path):
+    return doc_path + ".index.json"
+
+
+def source_fingerprint(doc_path):
+    """mtime + size of the document; cached indexes are stale once these change."""
+    stat = os.stat(doc_path)
+    return {"path": os.path.abspath(doc_path), "mtime": stat.st_mtime, "size": stat.st_size}
+
+
+def content_hash(doc_path):
+    """sha256 of the raw document bytes (far cheaper than re-extracting the PDF)."""
+    digest = hashlib.sha256()
+    with open(doc_path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_index(doc_path, index):
+    tmp_path = index_path_for(doc_path) + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump(index.to_dict(), fh)
+    os.replace(tmp_path, index_path_for(doc_path))
+
+
+def build_index(doc_path, text):
+    """Chunk `text`, build a BM25 index for it and save it next to the document."""
+    source = dict(source_fingerprint(doc_path), sha256=content_hash(doc_path))
+    index = BM25Index.build(chunk_text(text), source=source)
+    _write_index(doc_path, index)
+    return index
+
+
+def load_index(doc_path):
+    """
+    Load the saved index for doc_path, or None if it is missing or stale.
+    If only the mtime changed (e.g. the same file was uploaded again) but the
+    content hash still matches, the saved chunks are reused.
+    """
+    try:
+        with open(index_path_for(doc_path), encoding="utf-8") as fh:
+            data = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != INDEX_FORMAT_VERSION:
+        return None
+
+    saved = data.get("source") or {}
+    current = source_fingerprint(doc_path)
+    if all(saved.get(key) == value for key, value in current.items()):
+        return BM25Index.from_dict(data)
+
+    if saved.get("size") != current["size"] or saved.get("sha256") != content_hash(doc_path):
+        return None
+    index = BM25Index.from_dict(data)
+    index.source = dict(current, sha256=saved["sha256"])
+    try:
+        _write_index(doc_path, index)
+    except OSError:
+        pass
+    return index
+
+
+def load_or_build_index(doc_path, load_text):
+    """
+    Return a fresh index for doc_path. `load_text(doc_path)` is only called
+    (i.e. the PDF is only opened) when the saved index is missing or stale.
+    Returns None if the document doesn't exist or has no text.
+    """
+    if not os.path.exists(doc_path):
+        return None
+    index = load_index(doc_path)
+    if index is not None:
+        return index
+    text = load_text(doc_path)
+    if not text.strip():
+        return None
+    try:
+        return build_index(doc_path, text)
+    except OSError as e:
+        # Read-only location: still answer from an in-memory index
+        print("[RAG Index Error]", str(e))
+        return BM25Index.build(chunk_text(text), source=source_fingerprint(doc_path))
+
+
+# ---------------------------
+# In-memory document cache
+# ---------------------------
+_cache = {}  # abs path -> ((mtime, size), BM25Index or None)
+_cache_lock = threading.Lock()
+# Bumped whenever another process announces a replaced document
+_generation = 0
+_listener = db.Listener(db.DOCUMENT_CHANNEL)
+
+
+def _check_announcements():
+    """Drop the in-memory indexes if another process replaced a document."""
+    global _generation
+    if _listener.changed():
+        with _cache_lock:
+            _cache.clear()
+            _generation += 1
+
+
+def get_index(doc_path, load_text):
+    """
+    Cached load_or_build_index(): while the document's mtime and size are
+    unchanged, the same in-memory index is returned without touching the PDF
+    or the saved index file.
+    """
+    _check_announcements()
+    key = os.path.abspath(doc_path)
+    try:
+        stat = os.stat(doc_path)
+    except OSError:
+        with _cache_lock:
+            _cache.pop(key, None)
+        return None
+    stamp = (stat.st_mtime, stat.st_size)
+
+    with _cache_lock:
+        cached = _cache.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    index = load_or_build_index(doc_path, load_text)
+    with _cache_lock:
+        _cache[key] = (stamp, index)
+    return index
+
+
+def document_version(doc_path):
+    """
+    Opaque version string that changes whenever the document is replaced,
+    here or announced by another process (None if it doesn't exist). Costs
+    a single os.stat().
+    """
+    _check_announcements()
+    try:
+        stat = os.stat(doc_path)
+    except OSError:
+        return None
+    return f"{_generation}:{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def invalidate_document(doc_path=None):
+    """
+    Drop cached chunks for doc_path (or for every document if None) and
+    delete the saved index so the next question re-ingests the new file.
+    """
+    with _cache_lock:
+        if doc_path is None:
+            paths = list(_cache)
+            _cache.clear()
+        else:
+            paths = [os.path.abspath(doc_path)]
+            _cache.pop(paths[0], None)
+    for path in paths:
+        try:
+            os.remove(index_path_for(path))
+        except OSError:
+            pass
+
+
+def announce_document(cur):
+    """Tell the other processes (the chatbot) the document was replaced; sent on commit."""
+    db.notify(cur, db.DOCUMENT_CHANNEL)
+
+
+if __name__ == "__main__":
+    import sys
+
+    import fitz
+
+    def _extract(path):
+        with fitz.open(path) as doc:
+            return "".join(page.get_text() for page in doc)
+
+    for path in sys.argv[1:]:
+        built = build_index(path, _extract(path))
+        print(f"Indexed {path}: {len(built.chunks)} chunks, {len(built.postings)} terms")
@@ -0,0 +1,92 @@
+"""
+Bounded LRU + TTL cache for chatbot answers.
+
+Staff ask the same few questions all day; a repeat answer comes from here in
+microseconds instead of a full Gemini streaming call. Keys combine the
+normalized question, the model name and the reference document's version, so
+an answer generated from an old handbook is never served for a new one.
+
+Settings (environment variables):
+    RESPONSE_CACHE_SIZE  max cached answers (default 512)
+    RESPONSE_CACHE_TTL   seconds an answer stays valid (default 3600)
+"""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", "512"))
+CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", "3600"))
+
+_PUNCT_RE = re.compile(r"[^\w\s']")
+
+
+def normalize_query(text):
+    """'  What are the Opening hours?? ' -> 'what are the opening hours'"""
+    return " ".join(_PUNCT_RE.sub(" ", text.lower()).split())
+
+
+def make_key(query, model, doc_version=None):
+    return (normalize_query(query), model, doc_version)
+
+
+class ResponseCache:
+    """Thread-safe LRU cache whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, maxsize=CACHE_SIZE, ttl=CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._version = None
+
+    def get(self, key):
+        """Return (True, value) on a hit, (False, None) on a miss or expired entry."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def watch_version(self, version):
+        """
+        Clear every entry when the watched version (e.g. the reference
+        document's mtime/size) differs from the last one seen.
+        """
+        with self._lock:
+            if version == self._version:
+                return
+            self._version = version
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+            }
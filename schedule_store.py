@@ -0,0 +1,421 @@
+"""
+Publishing weekly schedules into new_schedule / changed_schedule.
+
+The optimizer and the employer portal both go through publish_schedule() /
+sync_new_to_changed() / apply_rows(). None of them truncate and reinsert.
+The new schedule is diffed against the live tables and only the difference
+is written, inside the caller's transaction:
+- changed cells as one batched UPDATE per table (execute_values),
+- new employees with a single COPY, removed ones with one DELETE.
+
+changed_schedule is merged three ways. A cell the optimizer didn't change
+(new == previous new_schedule) keeps its live value, so leave and swap
+edits made through the chatbot survive a re-publish.
+
+    with db.cursor() as cur:
+        report = schedule_store.publish_schedule(cur, rows)
+        report["changed_schedule"]  -> {"rows": 12, "cells": 19, "inserted": 0, ...}
+
+The week is stored as one 7-bit week_mask per employee (see
+week_schedule.py), so rows are (employee_id, employee_name, week_mask).
+Both tables hold one row per employee and calendar week (week_start, the
+Monday) and are range-partitioned by week_start, one partition per month.
+Every function works on a single week, the current one unless `week` is
+given, so lookups only touch that week's partition however much history
+accumulates. Old months can be dropped as whole partitions.
+
+Day changes in changed_schedule are carried into the shifts table (see
+shift_intervals.py): a day switched on gets a default shift, a day
+switched off loses its shifts.
+
+The tables themselves are created once by schema.ensure_schema(), which
+also migrates tables from the older layouts (per-day '0'/'1' columns, a
+single abstract week) into the current week.
+
+Employees whose preferences or limits changed since the last run are
+recorded in schedule_dirty by triggers (ensure_change_tracking()), so the
+optimizer can re-solve just those and apply their rows with apply_rows().
+"""
+import csv
+import io
+
+import threading
+from datetime import date
+
+from psycopg2 import sql
+from psycopg2.extras import execute_values
+
+import db
+import shift_intervals
+from week_schedule import DAYS, DAY_BITS, current_week, horizon_weeks
+
+SCHEDULE_TABLES = ("new_schedule", "changed_schedule")
+COLUMNS = ["employee_id", "employee_name", "week_mask"]
+COLUMN_LIST = ", ".join(COLUMNS)
+
+SCHEDULE_TABLE_DDL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        week_start DATE NOT NULL,
+        employee_id INT NOT NULL,
+        employee_name VARCHAR(100),
+        week_mask SMALLINT NOT NULL DEFAULT 0,
+        PRIMARY KEY (week_start, employee_id)
+    ) PARTITION BY RANGE (week_start);
+"""
+
+UPDATE_PAGE_SIZE = 1000
+
+
+def ensure_schedule_tables(cur):
+    """
+    Create new_schedule / changed_schedule and the partitions for the
+    planning horizon (run once, by schema.ensure_schema()).
+    """
+    for table in SCHEDULE_TABLES:
+        cur.execute("SELECT relkind FROM pg_class WHERE relname = %s", (table,))
+        row = cur.fetchone()
+        if row and row[0] == "r":
+            # A plain table from before calendar weeks
+            migrate_day_columns(cur, table)
+            migrate_to_weeks(cur, table)
+        else:
+            cur.execute(SCHEDULE_TABLE_DDL.format(table=table))
+        ensure_partitions(cur, table, horizon_weeks())
+
+
+# ---------------------------
+# Partitions
+# ---------------------------
+
+_partitions = set()  # partition names known to exist
+_partitions_lock = threading.Lock()
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(day):
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def ensure_partitions(cur, table, weeks):
+    """Create the monthly partitions of `table` that hold `weeks`, if missing."""
+    for month in sorted({month_start(week) for week in weeks}):
+        name = f"{table}_{month:%Y_%m}"
+        with _partitions_lock:
+            if name in _partitions:
+                continue
+        # Only create missing ones: CREATE ... PARTITION OF locks the parent
+        cur.execute("SELECT to_regclass(%s)", (name,))
+        if cur.fetchone()[0] is None:
+            cur.execute(sql.SQL("CREATE TABLE {} PARTITION OF {} FOR VALUES FROM (%s) TO (%s)").format(
+                sql.Identifier(name), sql.Identifier(table)
+            ), (month, next_month(month)))
+            # Not cached until committed; the next call re-checks
+            continue
+        with _partitions_lock:
+            _partitions.add(name)
+
+
+def migrate_to_weeks(cur, table):
+    """
+    Move a single-week table (employee_id primary key, no week_start) into
+    the partitioned layout; its rows become the current week.
+    """
+    legacy = f"{table}_single_week"
+    cur.execute(sql.SQL("ALTER TABLE {} RENAME TO {}").format(sql.Identifier(table), sql.Identifier(legacy)))
+    # The primary key index keeps its name; free it for the new table
+    cur.execute(sql.SQL("ALTER INDEX IF EXISTS {} RENAME TO {}").format(
+        sql.Identifier(f"{table}_pkey"), sql.Identifier(f"{legacy}_pkey")
+    ))
+    cur.execute(SCHEDULE_TABLE_DDL.format(table=table))
+    week = current_week()
+    ensure_partitions(cur, table, [week])
+    cur.execute(sql.SQL(f"""
+        INSERT INTO {{}} (week_start, {COLUMN_LIST})
+        SELECT %s, {COLUMN_LIST} FROM {{}}
+    """).format(sql.Identifier(table), sql.Identifier(legacy)), (week,))
+    cur.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(legacy)))
+    print(f"[Schema] Migrated {table} to calendar weeks (existing rows -> week of {week}).")
+
+
+def migrate_day_columns(cur, table):
+    """
+    Convert a table still using one '0'/'1' VARCHAR column per day into
+    week_mask, in place. Returns True if it migrated anything.
+    """
+    cur.execute("""
+        SELECT column_name
+          FROM information_schema.columns
+         WHERE table_name = %s AND column_name = ANY(%s)
+    """, (table, DAYS))
+    legacy = {row[0] for row in cur.fetchall()}
+    if not legacy:
+        return False
+
+    mask = " | ".join(
+        f"(CASE WHEN {day} = '1' THEN {DAY_BITS[day]} ELSE 0 END)" for day in DAYS if day in legacy
+    )
+    cur.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS week_mask SMALLINT NOT NULL DEFAULT 0")
+    cur.execute(f"UPDATE {table} SET week_mask = {mask}")
+    cur.execute(f"ALTER TABLE {table} " + ", ".join(f"DROP COLUMN {day}" for day in sorted(legacy)))
+    print(f"[Schema] Migrated {table} to week_mask.")
+    return True
+
+
+def fetch_schedule(cur, table, week=None):
+    """{employee_id: (employee_name, week_mask)} for one week of a schedule table."""
+    cur.execute(f"SELECT {COLUMN_LIST} FROM {table} WHERE week_start = %s", (week or current_week(),))
+    return {row[0]: tuple(row[1:]) for row in cur.fetchall()}
+
+
+def scheduled_weeks(cur, table, weeks):
+    """The weeks among `weeks` that have any rows in `table`."""
+    cur.execute(f"SELECT DISTINCT week_start FROM {table} WHERE week_start = ANY(%s)", (list(weeks),))
+    return {row[0] for row in cur.fetchall()}
+
+
+def as_schedule(rows):
+    """Rows (employee_id, employee_name, week_mask) -> {employee_id: (name, week_mask)}."""
+    return {row[0]: tuple(row[1:]) for row in rows}
+
+
+# ---------------------------
+# Differ
+# ---------------------------
+
+def diff_schedules(old, new):
+    """
+    Compare two {employee_id: (employee_name, week_mask)} schedules.
+
+    Returns {"inserts": [row, ...], "deletes": [employee_id, ...],
+             "updates": [(employee_id, values), ...], "cells": n}
+    where `values` has the new value for each changed column and None for
+    unchanged ones. "cells" counts the name and day cells written: changed
+    ones of updated rows plus all of inserted rows.
+    """
+    inserts, updates = [], []
+    cells = 0
+    for eid, new_row in new.items():
+        old_row = old.get(eid)
+        if old_row is None:
+            inserts.append((eid, *new_row))
+            cells += 1 + len(DAYS)
+            continue
+        if old_row == new_row:
+            continue
+        (old_name, old_mask), (new_name, new_mask) = old_row, new_row
+        values = (new_name if new_name != old_name else None,
+                  new_mask if new_mask != old_mask else None)
+        updates.append((eid, values))
+        cells += (new_name != old_name) + bin(old_mask ^ new_mask).count("1")
+    deletes = [eid for eid in old if eid not in new]
+    return {"inserts": inserts, "deletes": deletes, "updates": updates, "cells": cells}
+
+
+def merge_schedules(base, live, new):
+    """
+    Three-way merge for changed_schedule: a cell the optimizer changed
+    (new != base) takes the new value, any other cell keeps the live one.
+    Days are merged bit by bit.
+    """
+    merged = {}
+    for eid, new_row in new.items():
+        base_row = base.get(eid)
+        live_row = live.get(eid)
+        if base_row is None or live_row is None:
+            merged[eid] = new_row
+            continue
+        (base_name, base_mask), (live_name, live_mask), (new_name, new_mask) = base_row, live_row, new_row
+        changed = base_mask ^ new_mask
+        merged[eid] = (new_name if new_name != base_name else live_name,
+                       (new_mask & changed) | (live_mask & ~changed))
+    return merged
+
+
+def apply_diff(cur, table, diff, week=None):
+    """
+    Write a diff_schedules() result to one week of `table`. Returns
+    {"rows", "cells", "inserted", "updated", "deleted"}.
+    """
+    week = week or current_week()
+    if diff["deletes"]:
+        cur.execute(f"DELETE FROM {table} WHERE week_start = %s AND employee_id = ANY(%s)",
+                    (week, diff["deletes"]))
+
+    if diff["updates"]:
+        # Unchanged cells arrive as NULL and keep their current value. The
+        # week goes in as a literal so only its partition is planned.
+        assignments = ", ".join(f"{col} = COALESCE(v.{col}, t.{col})" for col in COLUMNS[1:])
+        template = "(%s::int, %s::varchar, %s::smallint)"
+        execute_values(cur, f"""
+            UPDATE {table} AS t
+               SET {assignments}
+              FROM (VALUES %s) AS v({COLUMN_LIST})
+             WHERE t.week_start = {sql.Literal(week).as_string(cur)}
+               AND t.employee_id = v.employee_id
+        """, [(eid, *values) for eid, values in diff["updates"]],
+            template=template, page_size=UPDATE_PAGE_SIZE)
+
+    if diff["inserts"]:
+        ensure_partitions(cur, table, [week])
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows((week, *row) for row in diff["inserts"])
+        buffer.seek(0)
+        cur.copy_expert(f"COPY {table} (week_start, {COLUMN_LIST}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+    return {
+        "rows": len(diff["inserts"]) + len(diff["updates"]) + len(diff["deletes"]),
+        "cells": diff["cells"],
+        "inserted": len(diff["inserts"]),
+        "updated": len(diff["updates"]),
+        "deleted": len(diff["deletes"]),
+    }
+
+
+# ---------------------------
+# Publishing
+# ---------------------------
+
+def _publish(cur, new, sync_changed, week):
+    base = fetch_schedule(cur, "new_schedule", week)
+    report = {"new_schedule": apply_diff(cur, "new_schedule", diff_schedules(base, new), week)}
+    if sync_changed:
+        live = fetch_schedule(cur, "changed_schedule", week)
+        merged = merge_schedules(base, live, new)
+        report["changed_schedule"] = apply_diff(cur, "changed_schedule", diff_schedules(live, merged), week)
+        sync_shifts(cur, live, merged, week)
+    # Tell the chatbot(s) the schedule changed; delivered on commit
+    db.notify(cur)
+    return report
+
+
+def sync_shifts(cur, old, new, week):
+    """Give days switched on in changed_schedule a default shift and drop the shifts of days switched off."""
+    shift_intervals.sync_masks(cur, week, {eid: row[1] for eid, row in old.items()},
+                               {eid: row[1] for eid, row in new.items()})
+
+
+def publish_schedule(cur, rows, sync_changed=True, week=None):
+    """
+    Make one week of new_schedule equal to `rows` (employee_id,
+    employee_name, week_mask) and, unless sync_changed=False, carry the
+    optimizer's changes into changed_schedule. Returns {table: apply_diff() report}.
+    """
+    return _publish(cur, as_schedule(rows), sync_changed, week or current_week())
+
+
+def apply_rows(cur, rows, employee_ids, sync_changed=True, week=None):
+    """
+    Incremental publish: replace only the employees in `employee_ids` with
+    `rows`, in one week. Listed employees without a row are removed;
+    everyone else is left as is. Returns {table: apply_diff() report}.
+    """
+    week = week or current_week()
+    new = fetch_schedule(cur, "new_schedule", week)
+    for eid in employee_ids:
+        new.pop(eid, None)
+    new.update(as_schedule(rows))
+    return _publish(cur, new, sync_changed, week)
+
+
+def sync_new_to_changed(cur, weeks=None):
+    """
+    Make changed_schedule equal to new_schedule (discarding chatbot edits)
+    for `weeks` (default: the planning horizon), writing only the cells
+    that differ. Earlier weeks are history and stay as they are.
+    Returns the apply_diff() reports summed over the weeks.
+    """
+    total = dict.fromkeys(["rows", "cells", "inserted", "updated", "deleted"], 0)
+    for week in weeks or horizon_weeks():
+        live = fetch_schedule(cur, "changed_schedule", week)
+        new = fetch_schedule(cur, "new_schedule", week)
+        for key, value in apply_diff(cur, "changed_schedule", diff_schedules(live, new), week).items():
+            total[key] += value
+        sync_shifts(cur, live, new, week)
+    db.notify(cur)
+    return total
+
+
+def free_on(cur, days, table="changed_schedule", week=None):
+    """[(employee_id, employee_name)] of everyone free on all of `days` in one week."""
+    mask = sum(DAY_BITS[day] for day in set(days))
+    cur.execute(f"""
+        SELECT employee_id, employee_name FROM {table}
+         WHERE week_start = %s AND week_mask & %s = 0
+    """, (week or current_week(), mask))
+    return cur.fetchall()
+
+
+def day_totals(cur, table="new_schedule", week=None):
+    """{day: employees scheduled} for one week of a schedule table."""
+    counts = ", ".join(f"COUNT(*) FILTER (WHERE week_mask & {DAY_BITS[day]} <> 0)" for day in DAYS)
+    cur.execute(f"SELECT {counts} FROM {table} WHERE week_start = %s", (week or current_week(),))
+    return dict(zip(DAYS, cur.fetchone()))
+
+
+# ---------------------------
+# Change tracking
+# ---------------------------
+# A row-level trigger on preferences and limits records every touched
+# employee_id in schedule_dirty. Whoever wrote the change (chatbot, employer
+# portal, a manual SQL fix), the next incremental optimization picks it up.
+
+TRACKED_TABLES = ("preferences", "limits")
+DIRTY_TRIGGER = "schedule_dirty_trigger"
+
+
+def ensure_change_tracking(cur):
+    """Create schedule_dirty and the triggers that fill it (idempotent)."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schedule_dirty (
+            employee_id INT PRIMARY KEY,
+            source VARCHAR(50),
+            marked_at TIMESTAMP DEFAULT now()
+        );
+    """)
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION mark_schedule_dirty() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP <> 'INSERT' THEN
+                INSERT INTO schedule_dirty (employee_id, source)
+                VALUES (OLD.employee_id, TG_TABLE_NAME)
+                ON CONFLICT (employee_id) DO NOTHING;
+            END IF;
+            IF TG_OP <> 'DELETE' THEN
+                INSERT INTO schedule_dirty (employee_id, source)
+                VALUES (NEW.employee_id, TG_TABLE_NAME)
+                ON CONFLICT (employee_id) DO NOTHING;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    # Only create missing triggers: CREATE TRIGGER locks the table
+    cur.execute("""
+        SELECT c.relname
+          FROM pg_trigger t
+          JOIN pg_class c ON c.oid = t.tgrelid
+         WHERE t.tgname = %s
+    """, (DIRTY_TRIGGER,))
+    installed = {row[0] for row in cur.fetchall()}
+    for table in TRACKED_TABLES:
+        cur.execute("SELECT to_regclass(%s)", (table,))
+        if table in installed or cur.fetchone()[0] is None:
+            continue
+        cur.execute(f"""
+            CREATE TRIGGER {DIRTY_TRIGGER}
+            AFTER INSERT OR UPDATE OR DELETE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION mark_schedule_dirty()
+        """)
+
+
+def claim_dirty(cur):
+    """
+    Remove and return the dirty employee IDs. The claim is part of the
+    caller's transaction, so if the re-optimization fails they stay dirty.
+    """
+    cur.execute("DELETE FROM schedule_dirty RETURNING employee_id")
+    return sorted(row[0] for row in cur.fetchall())
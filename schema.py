@@ -0,0 +1,210 @@
+"""
+One-time schema initialization for the fixed tables.
+
+Routes and scripts used to run CREATE TABLE IF NOT EXISTS on every request.
+The tables are now created once per process by ensure_schema(): the employer
+portal calls it before its first request, the optimizer at startup.
+
+school_employees is not created here. Its role columns are chosen by the
+employer, and /create_roles_table (create_dynamic_table) builds it.
+
+    python schema.py    # create everything up front
+
+It also caches the school_employees column metadata (the dynamic role
+columns), so employee pages and writes don't query information_schema on
+every request. /create_roles_table invalidates it.
+
+Employee IDs come from a sequence attached to school_employees; tables
+created before that get one (starting after their highest ID) the next
+time ensure_schema() runs.
+"""
+import threading
+
+from psycopg2 import sql
+
+import db
+import schedule_store
+import shift_intervals
+
+LIMITS_DDL = """
+    CREATE TABLE IF NOT EXISTS limits (
+        employee_id INTEGER PRIMARY KEY,
+        employee_name VARCHAR(100) UNIQUE NOT NULL,
+        designation VARCHAR(100),
+        min_hours INT DEFAULT 0,
+        max_hours INT DEFAULT 0
+    );
+"""
+
+CANDIDATE_CREDENTIALS_DDL = """
+    CREATE TABLE IF NOT EXISTS candidate_credentials (
+        employee_id INT PRIMARY KEY,
+        employee_name VARCHAR(100),
+        email VARCHAR(100),
+        phone VARCHAR(20)
+    );
+"""
+
+# Minimum headcount per (day, role) for the schedule solver
+COVERAGE_REQUIREMENTS_DDL = """
+    CREATE TABLE IF NOT EXISTS coverage_requirements (
+        day VARCHAR(3),
+        role VARCHAR(100),
+        required INT DEFAULT 0,
+        PRIMARY KEY (day, role)
+    );
+"""
+
+_initialized = False
+_lock = threading.Lock()
+
+
+def create_employee_indexes(cur, table=None):
+    """
+    Indexes for the keyset-paginated employee listing: Employee_ID is a
+    VARCHAR that is ordered numerically, so the index is on the cast.
+    Run after (re)creating the employees table.
+    """
+    table = table or EMPLOYEE_TABLE
+    id_num = sql.SQL('(CAST("Employee_ID" AS INT))')
+    for suffix, columns in (
+        ("id_num", id_num),
+        ("role_id_num", sql.SQL('"Role", ') + id_num),
+        ("designation_id_num", sql.SQL('"Designation", ') + id_num),
+    ):
+        cur.execute(sql.SQL("CREATE INDEX IF NOT EXISTS {} ON {} ({})").format(
+            sql.Identifier(f"{table}_{suffix}"), sql.Identifier(table), columns
+        ))
+
+
+def create_tables(cur):
+    cur.execute(LIMITS_DDL)
+    cur.execute(CANDIDATE_CREDENTIALS_DDL)
+    cur.execute(COVERAGE_REQUIREMENTS_DDL)
+    schedule_store.ensure_schedule_tables(cur)
+    shift_intervals.ensure_shifts_table(cur)
+    schedule_store.ensure_change_tracking(cur)
+    cur.execute("SELECT to_regclass(%s)", (EMPLOYEE_TABLE,))
+    if cur.fetchone()[0] is not None:
+        create_employee_indexes(cur)
+        create_employee_id_sequence(cur)
+
+
+def ensure_schema():
+    """Create the fixed tables once per process; later calls are a flag check."""
+    global _initialized
+    if _initialized:
+        return
+    with _lock:
+        if _initialized:
+            return
+        with db.cursor() as cur:
+            create_tables(cur)
+        _initialized = True
+
+
+# ---------------------------
+# school_employees metadata cache
+# ---------------------------
+EMPLOYEE_TABLE = "school_employees"
+
+# Employee_ID, Employee_name, Designation, Role; every later column is a role
+EMPLOYEE_BASE_COLUMNS = 4
+
+_employee_columns = None
+_employee_columns_lock = threading.Lock()
+# Other portal processes announce a recreated table on db.SCHEMA_CHANNEL
+_schema_listener = db.Listener(db.SCHEMA_CHANNEL)
+
+
+def load_employee_columns(cur):
+    cur.execute("""
+        SELECT column_name, data_type
+        FROM information_schema.columns
+        WHERE table_name = %s
+        ORDER BY ordinal_position
+    """, (EMPLOYEE_TABLE,))
+    rows = cur.fetchall()
+    columns = [name for name, _ in rows]
+    return {
+        "columns": columns,
+        "types": dict(rows),
+        "roles": columns[EMPLOYEE_BASE_COLUMNS:],
+    }
+
+
+def employee_columns():
+    """
+    Cached {"columns": [all, in table order], "types": {column: data_type},
+    "roles": [dynamic role columns]} for school_employees.
+    """
+    global _employee_columns
+    with _employee_columns_lock:
+        if _schema_listener.changed() or _employee_columns is None:
+            with db.cursor() as cur:
+                _employee_columns = load_employee_columns(cur)
+        return _employee_columns
+
+
+def invalidate_employee_columns(cur=None):
+    """
+    Drop the cached metadata after the table was recreated. Pass the cursor
+    of that transaction to also tell other processes when it commits.
+    """
+    global _employee_columns
+    with _employee_columns_lock:
+        _employee_columns = None
+    if cur is not None:
+        db.notify(cur, db.SCHEMA_CHANNEL)
+
+
+# ---------------------------
+# Employee ID allocation
+# ---------------------------
+# Employee_ID is a VARCHAR but IDs are handed out by a sequence, which is
+# safe under concurrent onboarding and needs no MAX() over the table. The
+# column default draws from it, and bulk loads reserve a batch up front.
+
+def employee_id_sequence(table=None):
+    return f"{table or EMPLOYEE_TABLE}_employee_id_seq"
+
+
+def create_employee_id_sequence(cur, table=None):
+    """
+    Attach an ID sequence to the employees table, starting after the highest
+    existing ID. Does nothing if the sequence already exists, so it doubles
+    as the migration for tables created before it (run by create_tables()).
+    """
+    table = table or EMPLOYEE_TABLE
+    sequence = employee_id_sequence(table)
+    cur.execute("SELECT to_regclass(%s)", (sequence,))
+    if cur.fetchone()[0] is not None:
+        return
+
+    # Hold off writers still using MAX + 1 until the sequence is in place
+    cur.execute(sql.SQL("LOCK TABLE {} IN SHARE ROW EXCLUSIVE MODE").format(sql.Identifier(table)))
+    cur.execute(sql.SQL("CREATE SEQUENCE {} OWNED BY {}.{}").format(
+        sql.Identifier(sequence), sql.Identifier(table), sql.Identifier("Employee_ID")
+    ))
+    cur.execute(sql.SQL("""
+        SELECT setval(%s, COALESCE(MAX(CAST("Employee_ID" AS INT)), 0) + 1, false) FROM {}
+    """).format(sql.Identifier(table)), (sequence,))
+    cur.execute(sql.SQL("ALTER TABLE {} ALTER COLUMN {} SET DEFAULT CAST(nextval({}) AS VARCHAR)").format(
+        sql.Identifier(table), sql.Identifier("Employee_ID"), sql.Literal(sequence)
+    ))
+
+
+def allocate_employee_ids(cur, count, table=None):
+    """
+    Reserve `count` new Employee_IDs for a bulk load, in one round trip.
+    Returns them as ints in ascending order. They are unique, but may
+    interleave with IDs taken by concurrent inserts.
+    """
+    cur.execute("SELECT nextval(%s) FROM generate_series(1, %s)",
+                (employee_id_sequence(table), count))
+    return [row[0] for row in cur.fetchall()]
+
+
+if __name__ == "__main__":
+    ensure_schema()
+    print("Schema ready.")
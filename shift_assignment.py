@@ -0,0 +1,346 @@
+"""
+Transactional leave and swap assignments on changed_schedule.
+
+The availability index only ranks candidates. The database decides who
+actually gets a shift, inside one transaction per request:
+- the requestor's changed_schedule row is locked (FOR UPDATE) and its
+  shifts re-checked,
+- candidates are claimed with FOR UPDATE SKIP LOCKED and re-checked under
+  the lock, so concurrent requests for the same day never pick the same
+  replacement and never double-book anyone. They move on to the next
+  candidate instead of waiting,
+- the shifts change hands with their real times (shift_intervals.py): a
+  replacement must have no shift overlapping them or within
+  MIN_REST_HOURS of them, and stay within max_hours counting real hours,
+- deadlocks, serialization failures and lock timeouts roll the
+  transaction back and retry it with a short, jittered backoff.
+
+    result = shift_assignment.leave("Alice", "mon")        # the next Monday
+    result = shift_assignment.leave("Alice", date(2026, 11, 2))
+    result["replacement_name"]  -> "Bob"
+
+Requests name a calendar date, or a weekday meaning its next occurrence
+(today included); only that week's rows are locked and changed.
+
+A request that can't be fulfilled raises AssignmentError with a message
+for the employee. The in-process availability index is updated after
+commit.
+
+Settings (environment variables):
+    ASSIGNMENT_RETRIES       attempts per request (default 5)
+    ASSIGNMENT_LOCK_TIMEOUT  how long to wait for the requestor's row
+                             (default "2s")
+"""
+import os
+import random
+import time
+from datetime import date
+
+from psycopg2 import errors, sql
+from psycopg2.extras import execute_values
+
+import availability_index
+import db
+import shift_intervals
+from week_schedule import DAYS, DAY_BITS, WeekSchedule, date_in_week, on_date, upcoming
+
+MAX_ATTEMPTS = int(os.environ.get("ASSIGNMENT_RETRIES", "5"))
+LOCK_TIMEOUT = os.environ.get("ASSIGNMENT_LOCK_TIMEOUT", "2s")
+# Index candidates tried per locking query before asking for more
+CANDIDATE_BATCH = 20
+RETRY_BASE_DELAY = 0.01
+
+RETRYABLE = (errors.SerializationFailure, errors.DeadlockDetected, errors.LockNotAvailable)
+
+
+class AssignmentError(Exception):
+    """The request can't be fulfilled; the message is meant for the employee."""
+
+
+class RetriesExhausted(Exception):
+    """Every attempt hit a lock conflict."""
+
+
+def run_transaction(work):
+    """
+    Run work(cur) in its own transaction, retrying on lock conflicts.
+    Returns what work returns.
+    """
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            with db.cursor() as cur:
+                cur.execute("SET LOCAL lock_timeout = %s", (LOCK_TIMEOUT,))
+                return work(cur)
+        except RETRYABLE as e:
+            if attempt == MAX_ATTEMPTS - 1:
+                raise RetriesExhausted(f"Gave up after {MAX_ATTEMPTS} attempts: {e}")
+            time.sleep(RETRY_BASE_DELAY * 2 ** attempt * random.uniform(0.5, 1.5))
+
+
+# ---------------------------
+# Row locking
+# ---------------------------
+
+def lock_requestor(cur, employee_name, week):
+    """
+    Lock the requestor's changed_schedule row for `week`; returns
+    (employee_id, role, WeekSchedule). Waits for a concurrent request by
+    the same employee.
+    """
+    cur.execute("""
+        SELECT employee_id, week_mask
+          FROM changed_schedule
+         WHERE week_start = %s AND employee_name = %s
+           FOR UPDATE
+    """, (week, employee_name))
+    row = cur.fetchone()
+    if not row:
+        raise AssignmentError(
+            f"Error: Employee '{employee_name}' has no schedule for the week of {week:%b %d}.")
+
+    cur.execute("""
+        SELECT "Role"
+          FROM school_employees
+         WHERE "Employee_name" = %s
+    """, (employee_name,))
+    role = cur.fetchone()
+    if not role:
+        raise AssignmentError(f"Error: Employee '{employee_name}' not found in school_employees.")
+    return row[0], role[0], WeekSchedule(row[1])
+
+
+def fits_filter(fit):
+    """SQL condition and parameters for shift_intervals.fit_params() `fit`, or none."""
+    if fit is None:
+        return "", {}
+    return "AND " + shift_intervals.FITS_SQL, fit
+
+
+def claim(cur, ranked_ids, week, day, working, fit=None):
+    """
+    Lock the first employee in `ranked_ids` who still works (or is still
+    free) on `day`, that no other transaction holds and, with `fit`, who
+    can take those shifts. Returns (employee_id, name) or None.
+    """
+    condition, params = fits_filter(fit)
+    # LIMIT 1 locks only the row that is returned, not the whole batch
+    query = f"""
+        SELECT c.employee_id, c.employee_name
+          FROM changed_schedule c
+         WHERE c.week_start = %(week)s AND c.employee_id = ANY(%(batch)s)
+           AND (c.week_mask & %(bit)s <> 0) = %(working)s
+           {condition}
+         ORDER BY array_position(%(batch)s, c.employee_id)
+         LIMIT 1
+           FOR UPDATE OF c SKIP LOCKED
+    """
+    ranked_ids = iter(ranked_ids)
+    while True:
+        batch = [emp_id for _, emp_id in zip(range(CANDIDATE_BATCH), ranked_ids)]
+        if not batch:
+            return None
+        cur.execute(query, {"week": week, "batch": batch, "bit": DAY_BITS[day], "working": working,
+                            **params})
+        row = cur.fetchone()
+        if row:
+            return row
+
+
+def claim_by_query(cur, role, week, day, working, exclude, best_first, fit=None):
+    """
+    Fallback when the index has no usable candidate (it may lag behind
+    writes from other processes): rank straight from the tables.
+    """
+    condition, params = fits_filter(fit)
+    cur.execute(sql.SQL("""
+        SELECT c.employee_id, c.employee_name
+          FROM changed_schedule c
+          JOIN school_employees e ON CAST(e."Employee_ID" AS INT) = c.employee_id
+         WHERE c.week_start = %(week)s AND (c.week_mask & %(bit)s <> 0) = %(working)s
+           AND c.employee_id <> %(exclude)s
+           {condition}
+         ORDER BY e.{role} {direction}, c.employee_id
+         LIMIT 1
+           FOR UPDATE OF c SKIP LOCKED
+    """).format(
+        condition=sql.SQL(condition),
+        role=sql.Identifier(role),
+        direction=sql.SQL("DESC NULLS LAST" if best_first else "ASC NULLS FIRST"),
+    ), {"week": week, "bit": DAY_BITS[day], "working": working, "exclude": exclude, **params})
+    return cur.fetchone()
+
+
+def claim_free(cur, index, role, week, day, exclude, fit=None):
+    """
+    Lock the highest-rated employee free on `day` of `week` (and, with
+    `fit`, able to take those shifts).
+    """
+    if role not in index.by_skill:
+        return None
+    return (claim(cur, index.free_by_skill(role, day, exclude), week, day, False, fit)
+            or claim_by_query(cur, role, week, day, False, exclude, best_first=True, fit=fit))
+
+
+def claim_working(cur, index, role, week, day, exclude):
+    """Lock the lowest-rated employee working on `day` of `week`."""
+    if role not in index.by_skill:
+        return None
+    return (claim(cur, index.working_by_skill(role, day, exclude), week, day, True)
+            or claim_by_query(cur, role, week, day, True, exclude, best_first=False))
+
+
+def set_shifts(cur, week, changes):
+    """Write (employee_id, day, working) changes to the locked rows, in one UPDATE."""
+    bits = {}  # employee_id -> [bits to set, bits to clear]
+    for emp_id, day, working in changes:
+        set_clear = bits.setdefault(emp_id, [0, 0])
+        set_clear[0 if working else 1] |= DAY_BITS[day]
+    execute_values(cur, f"""
+        UPDATE changed_schedule AS c
+           SET week_mask = (c.week_mask & ~v.clear_bits) | v.set_bits
+          FROM (VALUES %s) AS v(employee_id, set_bits, clear_bits)
+         WHERE c.week_start = {sql.Literal(week).as_string(cur)}
+           AND c.employee_id = v.employee_id
+    """, [(emp_id, set_bits, clear_bits) for emp_id, (set_bits, clear_bits) in bits.items()],
+        template="(%s::int, %s::smallint, %s::smallint)")
+
+
+def resolve_day(when):
+    """(week_start, weekday, date) for a date or a weekday name (its next occurrence)."""
+    if isinstance(when, str):
+        if when not in DAYS:
+            raise AssignmentError(f"Invalid day: {when}")
+        when = upcoming(when)
+    check_not_past(when)
+    week, day = on_date(when)
+    return week, day, when
+
+
+def check_not_past(day):
+    if day < date.today():
+        raise AssignmentError(f"{label(day)} is in the past.")
+
+
+def label(day):
+    """'Mon Nov 02' for a date."""
+    return day.strftime("%a %b %d")
+
+
+# ---------------------------
+# Requests
+# ---------------------------
+
+def leave(employee_name, when):
+    """
+    Give the requestor's shifts on `when` (a date or weekday name) to the
+    best free employee of the same role who has the rest and hours left
+    for them. Returns {"employee_id", "role", "date", "replacement_id",
+    "replacement_name"}.
+    """
+    week, day, on = resolve_day(when)
+    index = availability_index.get_index(week)
+
+    def work(cur):
+        requestor_id, role, shifts = lock_requestor(cur, employee_name, week)
+        if not shifts.works(day):
+            raise AssignmentError(f"You don't have a shift on {label(on)}.")
+
+        intervals = shift_intervals.day_intervals(cur, requestor_id, on)
+        replacement = claim_free(cur, index, role, week, day, requestor_id,
+                                 shift_intervals.fit_params(intervals, week))
+        if not replacement:
+            raise AssignmentError(
+                f"No employees are free on {label(on)} with enough rest and hours left "
+                f"to replace {employee_name}.")
+
+        changes = [(requestor_id, day, False), (replacement[0], day, True)]
+        set_shifts(cur, week, changes)
+        shift_intervals.move_day(cur, requestor_id, replacement[0], on)
+        db.notify(cur)
+        return {
+            "employee_id": requestor_id,
+            "role": role,
+            "date": on,
+            "replacement_id": replacement[0],
+            "replacement_name": replacement[1],
+            "changes": changes,
+        }
+
+    result = run_transaction(work)
+    availability_index.record_shift_changes(result.pop("changes"), week)
+    return result
+
+
+def swap(employee_name, from_when, to_day):
+    """
+    Move the requestor's shift from `from_when` (a date or weekday name) to
+    `to_day`, another day of the same week (a weekday name or date): the
+    best free employee who can take them covers the first day's shifts and
+    the least skilled one working the second hands theirs over, if they fit
+    the requestor's rest periods and max_hours. Returns {"employee_id",
+    "role", "from_date", "to_date", "replacement_id", "replacement_name",
+    "giver_id", "giver_name"}.
+    """
+    week, from_day, from_on = resolve_day(from_when)
+    if isinstance(to_day, date):
+        if on_date(to_day)[0] != week:
+            raise AssignmentError("Both days of a swap must be in the same week.")
+        to_day = on_date(to_day)[1]
+    elif to_day not in DAYS:
+        raise AssignmentError(f"Invalid day: {to_day}")
+    to_on = date_in_week(week, to_day)
+    check_not_past(to_on)
+    index = availability_index.get_index(week)
+
+    def work(cur):
+        requestor_id, role, shifts = lock_requestor(cur, employee_name, week)
+        if not shifts.works(from_day):
+            raise AssignmentError(f"You do not have a shift on {label(from_on)} to swap from.")
+        if shifts.works(to_day):
+            raise AssignmentError(f"You already have a shift on {label(to_on)} — no need to swap.")
+
+        intervals = shift_intervals.day_intervals(cur, requestor_id, from_on)
+        replacement = claim_free(cur, index, role, week, from_day, requestor_id,
+                                 shift_intervals.fit_params(intervals, week))
+        if not replacement:
+            raise AssignmentError(
+                f"No one is free on {label(from_on)} with enough rest and hours left to replace you.")
+
+        giver = claim_working(cur, index, role, week, to_day, requestor_id)
+        if not giver:
+            raise AssignmentError(
+                f"No one currently works on {label(to_on)} for your role. "
+                "So there is no shift to 'take over' there.")
+
+        # Checked once the requestor's first day is handed over, so those
+        # hours and that rest period no longer count
+        shift_intervals.move_day(cur, requestor_id, replacement[0], from_on)
+        reason = shift_intervals.unfit_reason(
+            cur, requestor_id, shift_intervals.day_intervals(cur, giver[0], to_on), week)
+        if reason:
+            raise AssignmentError(f"You can't take {giver[1]}'s shift on {label(to_on)}: {reason}.")
+        shift_intervals.move_day(cur, giver[0], requestor_id, to_on)
+
+        changes = [
+            (requestor_id, from_day, False),
+            (replacement[0], from_day, True),
+            (giver[0], to_day, False),
+            (requestor_id, to_day, True),
+        ]
+        set_shifts(cur, week, changes)
+        db.notify(cur)
+        return {
+            "employee_id": requestor_id,
+            "role": role,
+            "from_date": from_on,
+            "to_date": to_on,
+            "replacement_id": replacement[0],
+            "replacement_name": replacement[1],
+            "giver_id": giver[0],
+            "giver_name": giver[1],
+            "changes": changes,
+        }
+
+    result = run_transaction(work)
+    availability_index.record_shift_changes(result.pop("changes"), week)
+    return result
@@ -0,0 +1,384 @@
+"""
+Shift intervals: when, within a day, each scheduled employee works.
+
+week_mask (week_schedule.py) only says which days someone works. The
+shifts table holds the assignments themselves, one row per shift with
+starts_at / ends_at, so split shifts (two rows on one day), partial days
+and overnight shifts are ordinary rows. A shift belongs to the day it
+starts on. In the live schedule (changed_schedule) a week_mask bit is set
+exactly when the employee has a shift starting that day.
+
+    with db.cursor() as cur:
+        shift_intervals.add_shift(cur, 7, datetime(2026, 10, 19, 7), datetime(2026, 10, 19, 11))
+        shift_intervals.week_hours(cur, week)   -> {7: 4.0, ...}
+
+Overlap, rest-period and coverage checks are range queries on
+tsrange(starts_at, ends_at), answered by GiST indexes:
+- the per-employee exclusion constraint, which also guarantees nobody is
+  ever booked twice at the same time,
+- shifts_period over all shifts, for "who is on shift between A and B".
+
+A day switched on by a plain week_mask write (the optimizer, syncing
+new_schedule) gets a default shift; a day switched off loses its shifts.
+Hours checked against limits are the real lengths of the week's shifts.
+
+Settings (environment variables):
+    DEFAULT_SHIFT_START   start of a default shift (default "09:00")
+    DEFAULT_SHIFT_HOURS   its length in hours (default 10)
+    MIN_REST_HOURS        minimum time off between two shifts of one
+                          employee (default 11)
+"""
+import os
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from psycopg2.extras import execute_values
+
+import db
+from week_schedule import DAYS, DAY_BITS, current_week, date_in_week, on_date
+
+SHIFT_START = time.fromisoformat(os.environ.get("DEFAULT_SHIFT_START", "09:00"))
+SHIFT_HOURS = float(os.environ.get("DEFAULT_SHIFT_HOURS", "10"))
+MIN_REST_HOURS = float(os.environ.get("MIN_REST_HOURS", "11"))
+
+# int4range(id, id) = int4range(...) stands in for employee_id = ..., which
+# a GiST index can't take without the btree_gist extension
+SHIFTS_DDL = """
+    CREATE TABLE IF NOT EXISTS shifts (
+        shift_id BIGSERIAL PRIMARY KEY,
+        employee_id INT NOT NULL,
+        starts_at TIMESTAMP NOT NULL,
+        ends_at TIMESTAMP NOT NULL,
+        CONSTRAINT shifts_not_empty CHECK (ends_at > starts_at),
+        CONSTRAINT shifts_no_overlap EXCLUDE USING gist (
+            int4range(employee_id, employee_id, '[]') WITH =,
+            tsrange(starts_at, ends_at) WITH &&
+        )
+    );
+    CREATE INDEX IF NOT EXISTS shifts_period ON shifts USING gist (tsrange(starts_at, ends_at));
+    CREATE INDEX IF NOT EXISTS shifts_employee_start ON shifts (employee_id, starts_at);
+"""
+
+# Same expression as the exclusion constraint, so its index is used
+SAME_EMPLOYEE = "int4range({0}, {0}, '[]') = int4range({1}, {1}, '[]')"
+
+
+class ShiftConflict(Exception):
+    """The shift can't be booked; the message says why."""
+
+
+def ensure_shifts_table(cur):
+    """
+    Create shifts and its indexes (run once, by schema.ensure_schema(),
+    after the schedule tables). A new table is filled with default shifts
+    for the live schedule's working days from the current week on.
+    """
+    cur.execute("SELECT to_regclass('shifts')")
+    created = cur.fetchone()[0] is None
+    cur.execute(SHIFTS_DDL)
+    if created:
+        cur.execute("""
+            INSERT INTO shifts (employee_id, starts_at, ends_at)
+            SELECT c.employee_id, c.week_start + i + %(start)s, c.week_start + i + %(start)s + %(length)s
+              FROM changed_schedule c
+             CROSS JOIN generate_series(0, 6) AS i
+             WHERE c.week_start >= %(week)s AND c.week_mask & (1 << i) <> 0
+            ON CONFLICT DO NOTHING
+        """, {"start": SHIFT_START, "length": timedelta(hours=SHIFT_HOURS), "week": current_week()})
+        print(f"[Schema] Created shifts ({cur.rowcount} default shift(s) for the live schedule).")
+
+
+def default_shift(day):
+    """(starts_at, ends_at) of the default shift on the date `day`."""
+    start = datetime.combine(day, SHIFT_START)
+    return start, start + timedelta(hours=SHIFT_HOURS)
+
+
+def hours(start, end):
+    return (end - start).total_seconds() / 3600
+
+
+def rest_gap(rest=None):
+    return timedelta(hours=MIN_REST_HOURS if rest is None else rest)
+
+
+# ---------------------------
+# Reading
+# ---------------------------
+
+def on_day(cur, employee_id, day):
+    """[(shift_id, starts_at, ends_at)] the employee starts on the date `day`, earliest first."""
+    cur.execute("""
+        SELECT shift_id, starts_at, ends_at
+          FROM shifts
+         WHERE employee_id = %s AND starts_at >= %s AND starts_at < %s
+         ORDER BY starts_at
+    """, (employee_id, day, day + timedelta(days=1)))
+    return cur.fetchall()
+
+
+def day_intervals(cur, employee_id, day):
+    """
+    [(starts_at, ends_at)] the employee works on `day`; the default shift
+    if the day is on in week_mask but has no shift rows yet.
+    """
+    return [(start, end) for _, start, end in on_day(cur, employee_id, day)] or [default_shift(day)]
+
+
+def week_hours(cur, week, employee_ids=None):
+    """{employee_id: hours} of the shifts starting in `week`, for everyone or `employee_ids`."""
+    only = "" if employee_ids is None else "AND employee_id = ANY(%(ids)s)"
+    cur.execute(f"""
+        SELECT employee_id, SUM(EXTRACT(EPOCH FROM ends_at - starts_at))::float8 / 3600
+          FROM shifts
+         WHERE tsrange(starts_at, ends_at) && tsrange(%(start)s, %(end)s)
+           AND starts_at >= %(start)s AND starts_at < %(end)s
+           {only}
+         GROUP BY employee_id
+    """, {"start": week, "end": week + timedelta(days=7), "ids": list(employee_ids or [])})
+    return dict(cur.fetchall())
+
+
+def day_hours(cur, week):
+    """{day: staffed hours} of one week, by the day the shifts start on."""
+    cur.execute("""
+        SELECT starts_at::date, SUM(EXTRACT(EPOCH FROM ends_at - starts_at))::float8 / 3600
+          FROM shifts
+         WHERE tsrange(starts_at, ends_at) && tsrange(%(start)s, %(end)s)
+           AND starts_at >= %(start)s AND starts_at < %(end)s
+         GROUP BY 1
+    """, {"start": week, "end": week + timedelta(days=7)})
+    totals = dict.fromkeys(DAYS, 0.0)
+    for day, total in cur.fetchall():
+        totals[on_date(day)[1]] = total
+    return totals
+
+
+def on_shift(cur, start, end, role=None):
+    """
+    [(shift_id, employee_id, starts_at, ends_at)] of the shifts overlapping
+    [start, end), optionally only those of one role.
+    """
+    join, only = "", ""
+    if role is not None:
+        join = 'JOIN school_employees e ON e."Employee_ID" = CAST(s.employee_id AS VARCHAR)'
+        only = 'AND e."Role" = %(role)s'
+    cur.execute(f"""
+        SELECT s.shift_id, s.employee_id, s.starts_at, s.ends_at
+          FROM shifts s
+          {join}
+         WHERE tsrange(s.starts_at, s.ends_at) && tsrange(%(start)s, %(end)s)
+           {only}
+         ORDER BY s.starts_at
+    """, {"start": start, "end": end, "role": role})
+    return cur.fetchall()
+
+
+def headcount(cur, start, end, role=None):
+    """
+    Fewest employees on shift at any moment of [start, end): 0 means a gap
+    in coverage. Hand-overs (one shift ends as the next starts) count as
+    covered.
+    """
+    changes = defaultdict(int)
+    for _, _, shift_start, shift_end in on_shift(cur, start, end, role):
+        changes[max(shift_start, start)] += 1
+        changes[min(shift_end, end)] -= 1
+    count, lowest, since = 0, None, start
+    for moment in sorted(changes):
+        if moment > since:
+            lowest = count if lowest is None else min(lowest, count)
+        count += changes[moment]
+        since = moment
+    if since < end:
+        lowest = count if lowest is None else min(lowest, count)
+    return lowest or 0
+
+
+# ---------------------------
+# Overlap, rest and hours checks
+# ---------------------------
+
+def conflicts(cur, employee_id, start, end, rest=None):
+    """
+    The employee's shifts [(shift_id, starts_at, ends_at)] that overlap
+    [start, end) or start on another day and leave less than `rest` hours
+    (default MIN_REST_HOURS) off before or after it. The parts of a split
+    shift only must not overlap.
+    """
+    gap = rest_gap(rest)
+    cur.execute(f"""
+        SELECT shift_id, starts_at, ends_at
+          FROM shifts
+         WHERE {SAME_EMPLOYEE.format("employee_id", "%(employee_id)s")}
+           AND tsrange(starts_at, ends_at) && tsrange(%(start)s, %(end)s)
+         ORDER BY starts_at
+    """, {"employee_id": employee_id, "start": start - gap, "end": end + gap})
+    return [
+        (shift_id, other_start, other_end) for shift_id, other_start, other_end in cur.fetchall()
+        if other_start.date() != start.date() or (other_start < end and start < other_end)
+    ]
+
+
+def max_hours(cur, employee_id):
+    """The employee's max_hours, or None when it isn't set (no limits row or 0)."""
+    cur.execute("SELECT NULLIF(max_hours, 0) FROM limits WHERE employee_id = %s", (employee_id,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def unfit_reason(cur, employee_id, intervals, week, rest=None):
+    """
+    Why the employee can't also work `intervals` [(starts_at, ends_at)] of
+    `week` (overlap, too little rest or over max_hours), or None if they can.
+    """
+    for start, end in intervals:
+        for _, other_start, other_end in conflicts(cur, employee_id, start, end, rest):
+            if other_start < end and start < other_end:
+                return f"it overlaps the shift {other_start:%a %H:%M}-{other_end:%H:%M}"
+            return (f"it leaves less than {MIN_REST_HOURS if rest is None else rest:g} hours "
+                    f"of rest next to the shift {other_start:%a %H:%M}-{other_end:%H:%M}")
+    cap = max_hours(cur, employee_id)
+    if cap is not None:
+        total = week_hours(cur, week, [employee_id]).get(employee_id, 0) + sum(
+            hours(start, end) for start, end in intervals)
+        if total > cap:
+            return f"it makes {total:g} hours that week, over the limit of {cap}"
+    return None
+
+
+# Condition on a candidate changed_schedule row `c` taking one day's shifts
+# that lie within [fit_from, fit_to) (their span plus the rest period on
+# both sides) and last fit_hours in total: none of the candidate's shifts
+# reaches into that span, and their week stays within max_hours (0 or no
+# limits row: no cap). Candidates are free that day, so every shift found
+# is on another day and the rest period applies. Parameters come from
+# fit_params().
+FITS_SQL = f"""
+    NOT EXISTS (
+        SELECT 1 FROM shifts s
+         WHERE {SAME_EMPLOYEE.format("s.employee_id", "c.employee_id")}
+           AND tsrange(s.starts_at, s.ends_at) && tsrange(%(fit_from)s, %(fit_to)s)
+    )
+    AND COALESCE((
+        SELECT SUM(EXTRACT(EPOCH FROM s.ends_at - s.starts_at))::float8 / 3600
+          FROM shifts s
+         WHERE s.employee_id = c.employee_id
+           AND s.starts_at >= %(fit_week)s AND s.starts_at < %(fit_week_end)s
+    ), 0) + %(fit_hours)s <= COALESCE((
+        SELECT NULLIF(l.max_hours, 0)::float8 FROM limits l WHERE l.employee_id = c.employee_id
+    ), 'Infinity'::float8)
+"""
+
+
+def fit_params(intervals, week, rest=None):
+    """FITS_SQL parameters for taking `intervals` [(starts_at, ends_at)] of `week`."""
+    gap = rest_gap(rest)
+    return {
+        "fit_from": min(start for start, _ in intervals) - gap,
+        "fit_to": max(end for _, end in intervals) + gap,
+        "fit_hours": sum(hours(start, end) for start, end in intervals),
+        "fit_week": week,
+        "fit_week_end": week + timedelta(days=7),
+    }
+
+
+# ---------------------------
+# Writing
+# ---------------------------
+
+def move_day(cur, from_id, to_id, day):
+    """
+    Hand all of from_id's shifts starting on `day` to to_id (a leave or
+    swap). If from_id has none there yet, to_id gets the default shift.
+    The caller has checked that they fit and updates week_mask.
+    """
+    cur.execute("""
+        UPDATE shifts SET employee_id = %s
+         WHERE employee_id = %s AND starts_at >= %s AND starts_at < %s
+    """, (to_id, from_id, day, day + timedelta(days=1)))
+    if not cur.rowcount:
+        cur.execute("INSERT INTO shifts (employee_id, starts_at, ends_at) VALUES (%s, %s, %s)",
+                    (to_id, *default_shift(day)))
+
+
+def sync_masks(cur, week, old, new):
+    """
+    Follow a week_mask change of changed_schedule (old/new are
+    {employee_id: week_mask} for `week`): days switched off lose their
+    shifts, days switched on get a default shift. Returns (added, removed) days.
+    """
+    added, removed = [], []
+    for eid in old.keys() | new.keys():
+        before, after = old.get(eid, 0), new.get(eid, 0)
+        for day in DAYS:
+            if (before ^ after) & DAY_BITS[day]:
+                (added if after & DAY_BITS[day] else removed).append((eid, date_in_week(week, day)))
+
+    if removed:
+        cur.execute("""
+            DELETE FROM shifts s
+             USING unnest(%s::int[], %s::date[]) AS v(employee_id, day)
+             WHERE s.employee_id = v.employee_id
+               AND s.starts_at >= v.day AND s.starts_at < v.day + 1
+        """, ([eid for eid, _ in removed], [day for _, day in removed]))
+    if added:
+        # A default shift that would overlap one the employee already has
+        # (e.g. a night shift running into the morning) is skipped
+        execute_values(cur, """
+            INSERT INTO shifts (employee_id, starts_at, ends_at) VALUES %s
+            ON CONFLICT DO NOTHING
+        """, [(eid, *default_shift(day)) for eid, day in added], page_size=1000)
+    return len(added), len(removed)
+
+
+def add_shift(cur, employee_id, starts_at, ends_at, rest=None):
+    """
+    Book one shift in the live schedule (e.g. the second half of a split
+    shift) and switch its day on in week_mask. Raises ShiftConflict if it
+    overlaps, leaves too little rest or goes over max_hours. Returns the
+    new shift_id.
+    """
+    if ends_at <= starts_at:
+        raise ShiftConflict("A shift must end after it starts.")
+    week, day = on_date(starts_at.date())
+    # Locks the employee's week against concurrent leave/swap requests
+    cur.execute("""
+        UPDATE changed_schedule SET week_mask = week_mask | %s
+         WHERE week_start = %s AND employee_id = %s
+    """, (DAY_BITS[day], week, employee_id))
+    if not cur.rowcount:
+        raise ShiftConflict(f"Employee {employee_id} has no schedule for the week of {week:%b %d}.")
+
+    reason = unfit_reason(cur, employee_id, [(starts_at, ends_at)], week, rest)
+    if reason:
+        raise ShiftConflict(f"Can't book {starts_at:%a %b %d %H:%M}-{ends_at:%H:%M}: {reason}.")
+    cur.execute("""
+        INSERT INTO shifts (employee_id, starts_at, ends_at)
+        VALUES (%s, %s, %s)
+        RETURNING shift_id
+    """, (employee_id, starts_at, ends_at))
+    shift_id = cur.fetchone()[0]
+    db.notify(cur)
+    return shift_id
+
+
+def remove_shift(cur, shift_id):
+    """
+    Delete one shift; the day is switched off in week_mask once the
+    employee has no other shift starting that day. Returns False if there
+    was no such shift.
+    """
+    cur.execute("DELETE FROM shifts WHERE shift_id = %s RETURNING employee_id, starts_at", (shift_id,))
+    row = cur.fetchone()
+    if not row:
+        return False
+    employee_id, starts_at = row
+    if not on_day(cur, employee_id, starts_at.date()):
+        week, day = on_date(starts_at.date())
+        cur.execute("""
+            UPDATE changed_schedule SET week_mask = week_mask & ~%s::smallint
+             WHERE week_start = %s AND employee_id = %s
+        """, (DAY_BITS[day], week, employee_id))
+    db.notify(cur)
+    return True
@@ -0,0 +1,12 @@
+"""
+Tests for the pure-logic modules (parsers, scoring, schedule diffing, the
+solver's checks). They need no database: run them with
+
+    python -m pytest tests
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The root modules, and the employer portal's modules (optimization, solver)
+sys.path[:0] = [ROOT, os.path.join(ROOT, "Employer_website")]
@@ -0,0 +1,97 @@
+import datetime
+
+import pytest
+
+from day_parser import CONFIDENCE_THRESHOLD, parse_day
+
+# A Sunday
+TODAY = datetime.date(2026, 10, 18)
+# The next date of each weekday, today included
+NEXT = {code: TODAY + datetime.timedelta(days=offset)
+        for offset, code in enumerate(["sun", "mon", "tue", "wed", "thu", "fri", "sat"])}
+
+
+def trusted(text, today=TODAY):
+    """The date parse_day resolves `text` to, if confident enough to skip the LLM."""
+    day, confidence = parse_day(text, today=today)
+    return day if confidence >= CONFIDENCE_THRESHOLD else None
+
+
+@pytest.mark.parametrize("text, day", [
+    ("can I take leave on monday", "mon"),
+    ("Friday please", "fri"),
+    ("I work wednesdays", "wed"),
+])
+def test_full_names(text, day):
+    assert trusted(text) == NEXT[day]
+
+
+@pytest.mark.parametrize("text, day", [
+    ("leave on tues", "tue"),
+    ("thurs off", "thu"),
+    ("leave on sat", "sat"),
+    ("swap to sun", "sun"),
+])
+def test_abbreviations(text, day):
+    assert trusted(text) == NEXT[day]
+
+
+def test_a_weekday_counts_today():
+    assert trusted("leave on sunday") == TODAY
+    assert trusted("this sunday") == TODAY
+
+
+def test_next_skips_today():
+    assert trusted("leave next sunday") == datetime.date(2026, 10, 25)
+    friday = datetime.date(2026, 10, 23)
+    assert trusted("leave next friday", today=friday) == datetime.date(2026, 10, 30)
+    assert trusted("leave next fri", today=friday) == datetime.date(2026, 10, 30)
+    # On any other day "next" is simply the coming one
+    assert trusted("leave next friday") == friday
+
+
+@pytest.mark.parametrize("text, offset", [
+    ("today", 0),
+    ("tomorrow", 1),
+    ("day after tomorrow", 2),
+    ("yesterday", -1),
+    ("day before yesterday", -2),
+])
+def test_relative_words(text, offset):
+    assert trusted(f"leave {text}") == TODAY + datetime.timedelta(days=offset)
+
+
+def test_ambiguous_abbreviation_without_context_goes_to_llm():
+    assert trusted("I sat down with my manager") is None
+
+
+@pytest.mark.parametrize("text, day", [
+    ("leave on wensday", "wed"),
+    ("leave on fridy", "fri"),
+    ("next tusday", "tue"),
+    ("this thrusday", "thu"),
+    ("coming satarday", "sat"),
+])
+def test_typos_after_day_words(text, day):
+    assert trusted(text) == NEXT[day]
+
+
+@pytest.mark.parametrize("text", [
+    "i need leave for money reasons",
+    "i want a sundae",
+    "the monster under my desk",
+    "ask frida about my leave",
+    "send it to frida",
+    "fridy off",
+])
+def test_ordinary_words_are_not_trusted(text):
+    assert trusted(text) is None
+
+
+def test_several_days_are_ambiguous():
+    day, confidence = parse_day("leave on monday instead of friday", today=TODAY)
+    assert confidence < CONFIDENCE_THRESHOLD
+
+
+def test_nothing_day_like():
+    assert parse_day("what is the dress code", today=TODAY) == (None, 0.0)
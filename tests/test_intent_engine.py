@@ -0,0 +1,63 @@
+import intent_engine
+from intent_engine import DEFAULT_INTENT_TABLE, IntentEngine
+
+ENGINE = IntentEngine(DEFAULT_INTENT_TABLE)
+
+
+def ranked(text, engine=ENGINE):
+    return [(intent["name"], intent["score"]) for intent in engine.classify(text)["intents"]]
+
+
+def test_multi_word_phrases_score_per_word():
+    assert ranked("can i take leave on friday") == [("leave", 4.0)]
+
+
+def test_score_beats_priority():
+    # leave (priority 20) matched "need leave", schedule (priority 10) only "schedule"
+    assert ranked("i need leave on friday, what's my schedule") == [("leave", 2.0), ("schedule", 1.0)]
+
+
+def test_stronger_lower_priority_intent_wins():
+    # "preference" (priority 30) is one word; "do i have a shift" is four
+    names = [name for name, _ in ranked("preference aside, do i have a shift on monday")]
+    assert names == ["schedule", "preference"]
+
+
+def test_priority_breaks_ties():
+    assert ranked("my preferences: work on monday") == [("preference", 2.0), ("schedule", 2.0)]
+
+
+def test_weights_scale_the_score():
+    table = [
+        {"name": "leave", "priority": 20, "keywords": ["day off"]},
+        {"name": "schedule", "priority": 10, "weight": 3.0, "keywords": ["shift"]},
+    ]
+    engine = IntentEngine(table)
+    assert ranked("a day off from my shift", engine) == [("schedule", 3.0), ("leave", 2.0)]
+
+
+def test_keyword_boundaries():
+    # Long last words may inflect, short ones must match exactly
+    assert ranked("show my shifts") == [("schedule", 1.0)]
+    assert ranked("where is the office") == []
+
+
+def test_longest_phrase_wins_at_a_position():
+    result = ENGINE.classify("do i have a shift tomorrow")
+    assert result["intents"][0]["matched"] == ["do i have a shift"]
+
+
+def test_no_match():
+    assert ranked("hello there") == []
+
+
+def test_swap_slots():
+    slots = ENGINE.classify("swap from saturday to sunday")["slots"]
+    assert slots["swap_from"].weekday() == 5
+    assert slots["swap_to"] == "sun"
+    assert slots["days"] == ["sat", "sun"]
+
+
+def test_default_table_without_path(monkeypatch):
+    monkeypatch.delenv("INTENT_TABLE_PATH", raising=False)
+    assert intent_engine.load_intent_table() is DEFAULT_INTENT_TABLE
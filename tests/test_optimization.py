@@ -0,0 +1,83 @@
+import random
+
+import pytest
+
+import optimization
+from optimization import DAYS, greedy_schedule, schedule_rows, vectorized_schedule
+
+
+def random_inputs(seed, employees=300):
+    """
+    Seeded preferences and limits mixing the edge cases: employees at
+    exactly their max hours, over and under it, no preferred days, a day
+    nobody prefers, limits of 0 or below one day, missing limits and
+    repeated preference rows.
+    """
+    rng = random.Random(seed)
+    hours = optimization.HOURS_PER_DAY
+    quiet_day = rng.randrange(len(DAYS))
+    pref_rows, emp_limits = [], {}
+    for eid in range(1, employees + 1):
+        prefs = [int(rng.random() < 0.6) for _ in DAYS]
+        prefs[quiet_day] = 0
+        if rng.random() < 0.1:
+            prefs = [0] * len(DAYS)
+        pref_rows.append((eid, f"Emp {eid}", *prefs))
+
+        preferred = sum(prefs)
+        max_hours = rng.choice([
+            preferred * hours,                  # exactly at max
+            (preferred - 1) * hours,            # one day over
+            preferred * hours + hours / 2,      # between whole days
+            rng.randint(0, 7) * hours,
+            0,
+            int(hours / 2),
+            rng.randint(0, 90),
+        ])
+        if rng.random() < 0.05:
+            continue  # no limits row: skipped by both
+        emp_limits[eid] = {"name": f"Emp {eid}", "min": rng.choice([0, 10, 20]), "max": max_hours}
+
+    # Later rows for the same employee replace the earlier ones
+    for eid in rng.sample(range(1, employees + 1), employees // 20):
+        pref_rows.append((eid, f"Emp {eid} (renamed)", *(rng.randint(0, 1) for _ in DAYS)))
+    rng.shuffle(pref_rows)
+    return pref_rows, emp_limits
+
+
+def greedy_coverage(schedule):
+    return {day: sum(data["days"][day] for data in schedule.values()) for day in DAYS}
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_vectorized_matches_greedy(seed):
+    pref_rows, emp_limits = random_inputs(seed)
+    expected = greedy_schedule(pref_rows, emp_limits)
+
+    rows, coverage = vectorized_schedule(pref_rows, emp_limits)
+
+    assert rows == schedule_rows(expected)
+    assert coverage == greedy_coverage(expected)
+
+
+@pytest.mark.parametrize("hours", [7.5, 8, 12])
+def test_vectorized_matches_greedy_for_other_shift_lengths(monkeypatch, hours):
+    monkeypatch.setattr(optimization, "HOURS_PER_DAY", hours)
+    pref_rows, emp_limits = random_inputs(hours)
+    rows, _ = vectorized_schedule(pref_rows, emp_limits)
+    assert rows == schedule_rows(greedy_schedule(pref_rows, emp_limits))
+
+
+def test_empty_roster():
+    assert vectorized_schedule([], {}) == ([], dict.fromkeys(DAYS, 0))
+    assert vectorized_schedule([(1, "Emp 1", 1, 1, 1, 1, 1, 0, 0)], {}) == ([], dict.fromkeys(DAYS, 0))
+
+
+def test_drops_the_last_preferred_days():
+    rows, coverage = vectorized_schedule(
+        [(1, "Emp 1", 1, 0, 1, 1, 0, 1, 0)],
+        {1: {"name": "Emp 1", "min": 0, "max": 2 * optimization.HOURS_PER_DAY}},
+    )
+    # mon and wed kept: bits 0 and 2
+    assert rows == [(1, "Emp 1", 0b101)]
+    assert coverage == {"mon": 1, "tue": 0, "wed": 1, "thu": 0, "fri": 0, "sat": 0, "sun": 0}
@@ -0,0 +1,77 @@
+import random
+
+from schedule_store import diff_schedules, merge_schedules
+
+MON, TUE, WED, SUN = 1 << 0, 1 << 1, 1 << 2, 1 << 6
+
+
+def test_identical_schedules_have_no_diff():
+    schedule = {1: ("Ana", MON | TUE), 2: ("Ben", 0)}
+    assert diff_schedules(schedule, dict(schedule)) == {
+        "inserts": [], "deletes": [], "updates": [], "cells": 0}
+
+
+def test_inserts_and_deletes():
+    diff = diff_schedules({1: ("Ana", MON)}, {2: ("Ben", TUE | WED)})
+    assert diff["inserts"] == [(2, "Ben", TUE | WED)]
+    assert diff["deletes"] == [1]
+    assert diff["updates"] == []
+    # An inserted row writes its name and all seven days
+    assert diff["cells"] == 8
+
+
+def test_updates_only_carry_changed_columns():
+    old = {1: ("Ana", MON | TUE), 2: ("Ben", WED), 3: ("Cy", SUN)}
+    new = {1: ("Ana", MON | WED), 2: ("Benjamin", WED), 3: ("Cyd", 0)}
+    diff = diff_schedules(old, new)
+    assert diff["updates"] == [
+        (1, (None, MON | WED)),
+        (2, ("Benjamin", None)),
+        (3, ("Cyd", 0)),
+    ]
+    # tue/wed flipped, a name, a name and sun
+    assert diff["cells"] == 2 + 1 + 2
+
+
+def test_merge_keeps_live_edits_the_optimizer_did_not_touch():
+    base = {1: ("Ana", MON | TUE)}
+    # The chatbot moved Ana's Tuesday to Wednesday (a swap)
+    live = {1: ("Ana", MON | WED)}
+    # The optimizer now drops Monday and adds Sunday
+    new = {1: ("Ana", TUE | SUN)}
+    assert merge_schedules(base, live, new) == {1: ("Ana", WED | SUN)}
+
+
+def test_merge_names():
+    base = {1: ("Ana", MON), 2: ("Ben", MON)}
+    live = {1: ("Ana M.", MON), 2: ("Ben", MON)}
+    new = {1: ("Ana", MON), 2: ("Benjamin", MON)}
+    assert merge_schedules(base, live, new) == {1: ("Ana M.", MON), 2: ("Benjamin", MON)}
+
+
+def test_merge_new_and_removed_employees():
+    base = {1: ("Ana", MON), 3: ("Cy", SUN)}
+    live = {1: ("Ana", MON), 2: ("Ben", TUE), 3: ("Cy", SUN)}
+    new = {1: ("Ana", MON), 2: ("Ben", WED), 4: ("Dee", TUE)}
+    # No base (2) or no live row (4): the new row; dropped from new (3): gone
+    assert merge_schedules(base, live, new) == {
+        1: ("Ana", MON), 2: ("Ben", WED), 4: ("Dee", TUE)}
+
+
+def test_merge_bit_by_bit_on_random_schedules():
+    rng = random.Random(7)
+    for _ in range(500):
+        base_mask, live_mask, new_mask = (rng.randrange(128) for _ in range(3))
+        merged = merge_schedules({1: ("A", base_mask)}, {1: ("A", live_mask)},
+                                 {1: ("A", new_mask)})[1][1]
+        for bit in range(7):
+            day = 1 << bit
+            expected = new_mask & day if (base_mask ^ new_mask) & day else live_mask & day
+            assert merged & day == expected
+
+        # Unchanged live rows take the optimizer's schedule; an unchanged
+        # optimizer run keeps the live one
+        assert merge_schedules({1: ("A", base_mask)}, {1: ("A", base_mask)},
+                               {1: ("A", new_mask)}) == {1: ("A", new_mask)}
+        assert merge_schedules({1: ("A", base_mask)}, {1: ("A", live_mask)},
+                               {1: ("A", base_mask)}) == {1: ("A", live_mask)}
@@ -0,0 +1,67 @@
+import pytest
+
+import solver
+
+HOURS = 10
+
+
+def employee(emp_id, role="Teacher", min_hours=0, max_hours=70, prefs=(1, 1, 1, 1, 1, 0, 0), skill=5):
+    return {"id": emp_id, "name": f"Emp {emp_id}", "role": role, "skill": skill,
+            "min": min_hours, "max": max_hours, "prefs": list(prefs)}
+
+
+def test_feasible_problem_has_no_conflicts():
+    employees = [employee(1), employee(2), employee(3, role="Clerk")]
+    coverage = {("mon", "Teacher"): 2, ("tue", "Clerk"): 1}
+    assert solver.explain_infeasibility(employees, coverage, HOURS) == []
+
+
+def test_one_day_needs_more_employees_than_the_role_has():
+    employees = [employee(1), employee(2)]
+    reasons = solver.explain_infeasibility(employees, {("mon", "Teacher"): 3}, HOURS)
+    assert reasons == ["role 'Teacher': mon needs 3 employees, only 2 can work that day"]
+
+
+def test_busiest_days_exceed_the_roles_max_hours():
+    # Two teachers with one day each can't staff Monday and Tuesday twice
+    employees = [employee(1, max_hours=10), employee(2, max_hours=10)]
+    coverage = {("mon", "Teacher"): 2, ("tue", "Teacher"): 2}
+    reasons = solver.explain_infeasibility(employees, coverage, HOURS)
+    assert len(reasons) == 1
+    assert reasons[0].startswith("role 'Teacher': ")
+    assert "need 4 shifts in total" in reasons[0]
+
+
+def test_role_without_employees():
+    reasons = solver.explain_infeasibility([employee(1)], {("fri", "Nurse"): 1}, HOURS)
+    assert reasons == ["role 'Nurse': fri needs 1 employees, only 0 can work that day"]
+
+
+@pytest.mark.parametrize("min_hours, max_hours, bounds, adjusted", [
+    (20, 40, (2, 4), False),
+    (0, 5, (0, 0), False),
+    (25, 28, (2, 2), True),   # no whole number of days fits: keep max_hours
+    (90, 100, (7, 7), True),  # more than a week: capped to the week
+])
+def test_employee_day_bounds(min_hours, max_hours, bounds, adjusted):
+    result, messages = solver.employee_day_bounds(
+        [employee(1, min_hours=min_hours, max_hours=max_hours)], HOURS)
+    assert result == [bounds]
+    assert len(messages) == int(adjusted)
+
+
+def test_unworkable_limits_are_adjusted_not_infeasible():
+    employees = [employee(1, min_hours=25, max_hours=28), employee(2, min_hours=20, max_hours=40)]
+    result = solver.solve(employees, HOURS, {("mon", "Teacher"): 1})
+    assert result["adjusted"] == [
+        "Emp 1: no whole number of 10-hour days fits min_hours 25 / max_hours 28; "
+        "scheduled for at most 2 day(s)"
+    ]
+    assert sum(result["schedule"][1]["days"].values()) == 2
+    assert 2 <= sum(result["schedule"][2]["days"].values()) <= 4
+
+
+def test_unmeetable_coverage_raises():
+    with pytest.raises(solver.ScheduleInfeasible) as error:
+        solver.solve([employee(1)], HOURS, {("mon", "Teacher"): 2})
+    assert error.value.reasons == ["role 'Teacher': mon needs 2 employees, only 1 can work that day"]
@@ -0,0 +1,143 @@
+"""
+Compact weekly schedule: one 7-bit integer per employee-week.
+
+new_schedule and changed_schedule store the week in a single SMALLINT
+column, week_mask, instead of seven '0'/'1' VARCHAR columns. Bit i is set
+when the employee works DAYS[i] (mon = bit 0 ... sun = bit 6).
+
+    week = WeekSchedule.from_days(["mon", "wed"])
+    week.works("mon")            -> True
+    week.with_shift("mon", False).working_days()  -> ["wed"]
+    int(week)                    -> 5
+
+In SQL, "who is free on X" is a bitwise test:
+
+    WHERE week_mask & %(bit)s = 0      -- bit = DAY_BITS["mon"]
+
+Schedules are kept per calendar week: each row also has week_start, the
+Monday of its week. The optimizer plans a rolling horizon of
+SCHEDULE_HORIZON_WEEKS weeks (env, default 12) from the current week;
+earlier weeks stay as history.
+
+    on_date(date(2026, 10, 21))   -> (date(2026, 10, 19), "wed")
+    upcoming("mon")               -> the next Monday, today included
+"""
+import os
+from datetime import date, timedelta
+
+DAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+DAY_BITS = {day: 1 << position for position, day in enumerate(DAYS)}
+FULL_WEEK = (1 << len(DAYS)) - 1
+
+HORIZON_WEEKS = int(os.environ.get("SCHEDULE_HORIZON_WEEKS", "12"))
+
+
+# ---------------------------
+# Calendar weeks
+# ---------------------------
+
+def week_of(day):
+    """Monday of the week containing the date `day`."""
+    return day - timedelta(days=day.weekday())
+
+
+def current_week(today=None):
+    return week_of(today or date.today())
+
+
+def horizon_weeks(start=None, count=None):
+    """Week starts of the planning horizon, from `start` (default: this week)."""
+    start = week_of(start) if start else current_week()
+    return [start + timedelta(weeks=offset) for offset in range(count or HORIZON_WEEKS)]
+
+
+def on_date(day):
+    """(week_start, weekday name) for a calendar date."""
+    return week_of(day), DAYS[day.weekday()]
+
+
+def upcoming(weekday, today=None):
+    """Calendar date of the next `weekday` ("mon".."sun"), today included."""
+    today = today or date.today()
+    return today + timedelta(days=(DAYS.index(weekday) - today.weekday()) % 7)
+
+
+def date_in_week(week_start, weekday):
+    return week_start + timedelta(days=DAYS.index(weekday))
+
+
+def days_mask(days):
+    """Mask with the bits of the given day names set."""
+    mask = 0
+    for day in days:
+        mask |= DAY_BITS[day]
+    return mask
+
+
+def flags_mask(flags):
+    """Mask from mon..sun flags (1/0, '1'/'0' or booleans)."""
+    mask = 0
+    for position, flag in enumerate(flags):
+        if flag in (1, '1', True):
+            mask |= 1 << position
+    return mask
+
+
+class WeekSchedule:
+    """
+    Int-backed week; compares and hashes like its mask. Treat it as a value:
+    with_shift() returns a new one.
+    """
+
+    __slots__ = ("mask",)
+
+    def __init__(self, mask=0):
+        self.mask = int(mask or 0) & FULL_WEEK
+
+    @classmethod
+    def from_days(cls, days):
+        return cls(days_mask(days))
+
+    @classmethod
+    def from_flags(cls, flags):
+        return cls(flags_mask(flags))
+
+    def works(self, day):
+        return bool(self.mask & DAY_BITS[day])
+
+    def is_free(self, day):
+        return not self.mask & DAY_BITS[day]
+
+    def working_days(self):
+        return [day for day in DAYS if self.mask & DAY_BITS[day]]
+
+    def free_days(self):
+        return [day for day in DAYS if not self.mask & DAY_BITS[day]]
+
+    def flags(self):
+        """(0/1, ...) for mon..sun."""
+        return tuple(self.mask >> position & 1 for position in range(len(DAYS)))
+
+    def with_shift(self, day, working):
+        bit = DAY_BITS[day]
+        return WeekSchedule(self.mask | bit if working else self.mask & ~bit)
+
+    def __int__(self):
+        return self.mask
+
+    def __len__(self):
+        """Number of days worked."""
+        return bin(self.mask).count("1")
+
+    def __eq__(self, other):
+        if isinstance(other, WeekSchedule):
+            return self.mask == other.mask
+        if isinstance(other, int):
+            return self.mask == other
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.mask)
+
+    def __repr__(self):
+        return f"WeekSchedule({'|'.join(self.working_days()) or '-'})"